@@ -5,7 +5,8 @@ from .models import (
     User, HsCode, ClassificationRuling, OptimizationTip, ProductItem, ValidationIssue,
     Declaration, AuditResult, CalculationResult, HsCodePrediction, PriceRiskAnalysis,
     ChatMessage, DecisionTreeQuestion, IncotermRecommendation, TradeRouteOption, CurrencyRate,
-    HsCodePassport, UserTemplate, DocumentGeneration, ClassificationSearch
+    HsCodePassport, UserTemplate, DocumentGeneration, ClassificationSearch, ClassificationJob,
+    TariffRule
 )
 
 
@@ -127,6 +128,18 @@ class SimpleClassificationRulingAdmin(admin.ModelAdmin):
     search_fields = ['id', 'outcome_code']
 
 
+class SimpleClassificationJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'query', 'status', 'created_at', 'finished_at']
+    list_filter = ['status']
+    search_fields = ['id', 'query']
+
+
+class SimpleTariffRuleAdmin(admin.ModelAdmin):
+    list_display = ['name', 'code_prefix', 'priority', 'product_type', 'mode', 'origin', 'rate_type', 'duty_rate', 'is_active']
+    list_filter = ['is_active', 'rate_type', 'product_type', 'mode']
+    search_fields = ['name', 'code_prefix']
+
+
 # Register all models with simple admin classes
 admin.site.register(User, SimpleUserAdmin)
 admin.site.register(HsCode, SimpleHsCodeAdmin)
@@ -147,4 +160,6 @@ admin.site.register(IncotermRecommendation, SimpleIncotermRecommendationAdmin)
 admin.site.register(TradeRouteOption, SimpleTradeRouteOptionAdmin)
 admin.site.register(OptimizationTip, SimpleOptimizationTipAdmin)
 admin.site.register(ValidationIssue, SimpleValidationIssueAdmin)
-admin.site.register(ClassificationRuling, SimpleClassificationRulingAdmin)
\ No newline at end of file
+admin.site.register(ClassificationRuling, SimpleClassificationRulingAdmin)
+admin.site.register(ClassificationJob, SimpleClassificationJobAdmin)
+admin.site.register(TariffRule, SimpleTariffRuleAdmin)
@@ -0,0 +1,106 @@
+import copy
+import hashlib
+import re
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+KEY_PREFIX = 'hs-ai'
+COUNTERS = ('hits', 'misses', 'negative_hits', 'stores', 'failures')
+
+
+def normalize_query(query):
+    """
+    Normalize a product query so that trivially different spellings share a cache entry
+    (Unicode form, case, punctuation and whitespace)
+    """
+    query = unicodedata.normalize('NFKC', query or '').casefold()
+    query = re.sub(r'[^\w\s]', ' ', query)
+    return ' '.join(query.split())
+
+
+class ClassificationCache:
+    """
+    Result cache for AI (Gemini) HS code classifications.
+
+    Entries live in the Django cache configured by settings.HS_CLASSIFICATION_CACHE['ALIAS'].
+    The size bound comes from the cache backend's MAX_ENTRIES option; the local-memory
+    backend evicts least recently used entries first. Failed classifications are stored
+    with the shorter NEGATIVE_TTL so a broken or unconfigured model is not called on
+    every request. Hit/miss counters are kept in the same cache.
+    """
+
+    def _config(self):
+        return getattr(settings, 'HS_CLASSIFICATION_CACHE', {})
+
+    @property
+    def cache(self):
+        return caches[self._config().get('ALIAS', 'default')]
+
+    @property
+    def ttl(self):
+        return self._config().get('TTL', 60 * 60 * 24)
+
+    @property
+    def negative_ttl(self):
+        return self._config().get('NEGATIVE_TTL', 60 * 5)
+
+    def make_key(self, query):
+        digest = hashlib.sha1(normalize_query(query).encode('utf-8')).hexdigest()
+        return f'{KEY_PREFIX}:result:{digest}'
+
+    def get(self, query):
+        """
+        Return cached results for the query, or None on a miss
+        """
+        entry = self.cache.get(self.make_key(query))
+        if entry is None:
+            self._incr('misses')
+            return None
+        self._incr('negative_hits' if entry['failed'] else 'hits')
+        return copy.deepcopy(entry['results'])
+
+    def peek(self, query):
+        """
+        Like get(), but not counted in the stats. Used for the single-flight
+        re-check, so a coalesced miss is not counted twice.
+        """
+        entry = self.cache.get(self.make_key(query))
+        return None if entry is None else copy.deepcopy(entry['results'])
+
+    def set(self, query, results):
+        self.cache.set(self.make_key(query), {'results': results, 'failed': False}, self.ttl)
+        self._incr('stores')
+
+    def set_failure(self, query, fallback_results):
+        self.cache.set(self.make_key(query), {'results': fallback_results, 'failed': True}, self.negative_ttl)
+        self._incr('failures')
+
+    def delete(self, query):
+        self.cache.delete(self.make_key(query))
+
+    def stats(self):
+        keys = {f'{KEY_PREFIX}:stats:{name}': name for name in COUNTERS}
+        values = self.cache.get_many(list(keys))
+        stats = {name: values.get(key, 0) for key, name in keys.items()}
+        lookups = stats['hits'] + stats['negative_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['negative_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def reset_stats(self):
+        self.cache.delete_many([f'{KEY_PREFIX}:stats:{name}' for name in COUNTERS])
+
+    def _incr(self, name):
+        key = f'{KEY_PREFIX}:stats:{name}'
+        # add() is a no-op when the counter already exists; counters never expire
+        self.cache.add(key, 0, None)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # Counter was culled between add() and incr()
+            self.cache.set(key, 1, None)
+
+
+classification_cache = ClassificationCache()
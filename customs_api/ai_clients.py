@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class GeminiClient:
+    """
+    Google Gemini model client used for HS code classification
+    """
+
+    model_name = 'gemini-3-pro-preview'
+
+    def classify(self, query):
+        """
+        Return up to 10 formatted HS code candidates for the query.
+        Returns None when no API key is configured, raises on API/parse errors.
+        """
+        from google import genai
+
+        # Check if Gemini API key is available
+        api_key = os.environ.get('GEMINI_API_KEY')
+        if not api_key:
+            return None
+
+        client = genai.GenerativeModel(self.model_name)
+        response = client.generate_content(
+            f'Rol: Butunjahon Bojxona Eksperti. Vazifa: "{query}" uchun eng aniq 10 xonali TIF TN kodlarini topish. '
+            f'Internetdan Butunjahon Bojxona Tashkiloti (WCO), Yevropa Ittifoqi TARIC bazasi va O\'zbekiston Bojxona stavkalarini tekshiring. '
+            f'Natijani JSON formatida qaytaring: [{{code, description, descriptionRu, confidence, reasoning}}].'
+        )
+        return parse_model_response(response.text)
+
+
+class FakeModelClient:
+    """
+    Offline stand-in for the Gemini client (development and tests).
+    Returns deterministic candidates derived from the query, after an
+    optional delay (settings.AI_FAKE_MODEL_DELAY, seconds) to mimic model latency.
+    """
+
+    def classify(self, query):
+        delay = getattr(settings, 'AI_FAKE_MODEL_DELAY', 0)
+        if delay:
+            time.sleep(delay)
+
+        digest = int(hashlib.sha1(query.encode('utf-8')).hexdigest(), 16)
+        candidates = []
+        for i in range(3):
+            code = f'{(digest >> (i * 16)) % 10 ** 10:010d}'
+            candidates.append({
+                'code': code,
+                'description': f'{query} (test tasnifi {i + 1})',
+                'descriptionRu': f'{query} (тестовая классификация {i + 1})',
+                'confidence': 80 - i * 10,
+                'reasoning': 'Fake model client',
+            })
+        return parse_model_response(json.dumps(candidates))
+
+
+def parse_model_response(raw_text):
+    """
+    Extract the JSON array from a model response and normalize its fields
+    """
+    raw_text = raw_text or "[]"
+    json_start = raw_text.find('[')
+    json_end = raw_text.rfind(']') + 1
+    if json_start != -1 and json_end > 0:
+        raw_text = raw_text[json_start:json_end]
+
+    ai_results = json.loads(raw_text)
+
+    formatted_results = []
+    for r in ai_results[:10]:  # Limit to 10 results
+        formatted_results.append({
+            'code': r.get('code', ''),
+            'description': r.get('description', 'Tovar tavsifi'),
+            'description_ru': r.get('descriptionRu', r.get('description', 'Описание товара')),
+            'confidence': float(r.get('confidence', 70)),
+            'reasoning': r.get('reasoning', 'AI tahlili'),
+            'sources': r.get('sources', [])
+        })
+    return formatted_results
+
+
+_client = None
+
+
+def get_model_client():
+    """
+    Return the model client configured by settings.AI_MODEL_CLIENT (dotted path)
+    """
+    global _client
+    if _client is None:
+        _client = import_string(getattr(settings, 'AI_MODEL_CLIENT', 'customs_api.ai_clients.GeminiClient'))()
+    return _client
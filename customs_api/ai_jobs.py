@@ -0,0 +1,145 @@
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ClassificationJob, HsCodePrediction
+
+
+class JobQueueFull(Exception):
+    """Raised when the background queue has no room for another job"""
+
+
+class ClassificationFailed(Exception):
+    """Raised when the AI model returned no classification for a job"""
+
+
+def _jobs_config():
+    return getattr(settings, 'HS_CLASSIFICATION_JOBS', {})
+
+
+class ThreadPoolJobQueue:
+    """
+    Runs classification jobs on a bounded in-process thread pool.
+    At most MAX_WORKERS jobs run at once and at most MAX_PENDING are accepted
+    (running + waiting); further submissions raise JobQueueFull.
+    """
+
+    def __init__(self):
+        config = _jobs_config()
+        self.max_pending = config.get('MAX_PENDING', 100)
+        self._executor = ThreadPoolExecutor(
+            max_workers=config.get('MAX_WORKERS', 4),
+            thread_name_prefix='hs-classification'
+        )
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def submit(self, job_id):
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFull(f'More than {self.max_pending} classification jobs are pending')
+        future = self._executor.submit(self._run, job_id)
+        future.add_done_callback(lambda f: self._slots.release())
+
+    @staticmethod
+    def _run(job_id):
+        # Worker threads own their DB connection
+        close_old_connections()
+        try:
+            run_classification_job(job_id)
+        finally:
+            connection.close()
+
+
+class ImmediateJobQueue:
+    """
+    Runs jobs synchronously in the calling thread (tests, management commands)
+    """
+
+    def submit(self, job_id):
+        run_classification_job(job_id)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """
+    Return the job queue configured by settings.HS_CLASSIFICATION_JOBS['QUEUE'] (dotted path)
+    """
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                path = _jobs_config().get('QUEUE', 'customs_api.ai_jobs.ThreadPoolJobQueue')
+                _queue = import_string(path)()
+    return _queue
+
+
+def enqueue_classification_job(query, user=None):
+    """
+    Create a ClassificationJob for the query and hand it to the job queue
+    """
+    job = ClassificationJob.objects.create(
+        id=uuid.uuid4().hex,
+        query=query,
+        user=user if user is not None and user.is_authenticated else None
+    )
+    try:
+        get_job_queue().submit(job.id)
+    except JobQueueFull as e:
+        job.status = 'FAILED'
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        raise
+    return job
+
+
+def run_classification_job(job_id):
+    """
+    Worker entry point: run the AI classification for a job and store the
+    results on the job and, for authenticated users, as HsCodePrediction rows
+    """
+    from .utils import classify_hs_code_with_ai, FALLBACK_CLASSIFICATIONS
+
+    updated = ClassificationJob.objects.filter(id=job_id, status='PENDING').update(status='RUNNING')
+    if not updated:
+        return
+    job = ClassificationJob.objects.get(id=job_id)
+
+    try:
+        results = classify_hs_code_with_ai(job.query)
+        if results == FALLBACK_CLASSIFICATIONS:
+            # The classifier does not raise: API errors and a missing key
+            # come back as the generic fallback, which is not a prediction
+            raise ClassificationFailed('AI classification failed or is not configured')
+
+        job.status = 'DONE'
+        job.results = results
+        job.finished_at = timezone.now()
+        with transaction.atomic():
+            if job.user_id:
+                HsCodePrediction.objects.bulk_create([
+                    HsCodePrediction(
+                        code=r.get('code', ''),
+                        description=r.get('description', ''),
+                        description_ru=r.get('description_ru'),
+                        confidence=Decimal(str(r.get('confidence', 0))),
+                        reasoning=r.get('reasoning', ''),
+                        sources=r.get('sources', []),
+                        user_id=job.user_id
+                    )
+                    for r in results
+                ])
+            job.save(update_fields=['status', 'results', 'error', 'finished_at'])
+    except Exception as e:
+        # Also covers failed writes above, so a job never stays RUNNING
+        ClassificationJob.objects.filter(id=job_id).update(
+            status='FAILED', results=[], error=str(e), finished_at=timezone.now()
+        )
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class CustomsApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'customs_api'
\ No newline at end of file
+    name = 'customs_api'
+
+    def ready(self):
+        # Register model signal handlers
+        from . import signals  # noqa: F401
@@ -0,0 +1,102 @@
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .models import Declaration, ProductItem
+
+
+def _decimal(value):
+    return None if value is None else f'{value:f}'
+
+
+def _date(value):
+    return None if value is None else value.isoformat()
+
+
+def _datetime_converter(tz):
+    # Same output as DRF's DateTimeField: current time zone, 'Z' for UTC.
+    # The time zone is resolved once per page, not per value.
+    def convert(value):
+        if value is None:
+            return None
+        if value.tzinfo is not None:
+            value = value.astimezone(tz)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+CONVERTERS = {
+    'DecimalField': lambda tz: _decimal,
+    'DateField': lambda tz: _date,
+    'DateTimeField': _datetime_converter,
+}
+
+
+class CompactRows:
+    """
+    Flat list rows built straight from values() dicts.
+
+    The converter of every field is looked up once, when the row set is
+    declared, so rendering a row is a dict copy plus the few conversions
+    instead of running a serializer field per value. Values match the full serializer's output
+    (decimals as strings, ISO dates), only nested objects are left out.
+    """
+
+    def __init__(self, model, fields, annotations=None):
+        self.model = model
+        self.annotations = annotations or {}
+        self.names = tuple(fields) + tuple(self.annotations)
+        self.converters = tuple(
+            (name, CONVERTERS[model._meta.get_field(name).get_internal_type()])
+            for name in fields
+            if model._meta.get_field(name).get_internal_type() in CONVERTERS
+        )
+
+    def queryset(self, queryset):
+        if self.annotations:
+            queryset = queryset.annotate(**self.annotations)
+        return queryset.values(*self.names)
+
+    def rows(self, values):
+        # New dicts: cursor pagination reads its position from the raw values
+        tz = timezone.get_current_timezone()
+        converters = [(name, factory(tz)) for name, factory in self.converters]
+        rows = []
+        for row in values:
+            row = dict(row)
+            for name, convert in converters:
+                row[name] = convert(row[name])
+            rows.append(row)
+        return rows
+
+
+DECLARATION_ROWS = CompactRows(
+    Declaration,
+    ['id', 'contract_number', 'invoice_number', 'invoice_date', 'partner_name', 'status', 'mode',
+     'total_value', 'currency', 'transport_type', 'created_at', 'updated_at'],
+    {'product_count': Count('products')},
+)
+
+PRODUCT_ITEM_ROWS = CompactRows(
+    ProductItem,
+    ['id', 'name', 'hs_code', 'quantity', 'unit', 'netto', 'brutto', 'price', 'currency',
+     'origin_country', 'risk_level', 'created_at', 'updated_at'],
+)
+
+
+def wants_compact(request):
+    return request.query_params.get('view') == 'compact'
+
+
+def compact_list_response(view, row_set, queryset):
+    """
+    Paginated ?view=compact list response of a viewset
+    """
+    values = row_set.queryset(view.filter_queryset(queryset))
+    page = view.paginate_queryset(values)
+    if page is not None:
+        return view.get_paginated_response(row_set.rows(page))
+    return Response(row_set.rows(values))
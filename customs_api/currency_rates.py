@@ -0,0 +1,124 @@
+import threading
+from bisect import bisect_right
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+
+
+# Bumped on every CurrencyRate change so that other processes reload their copy
+VERSION_CACHE_KEY = 'currency-rates:version'
+# Seconds between version stamp checks
+VERSION_CHECK_INTERVAL = 1.0
+
+
+class _RateTable:
+    __slots__ = ('latest', 'dates', 'rates', 'latest_rows')
+
+    def __init__(self):
+        self.latest = {}  # code -> Decimal rate on the most recent date
+        self.dates = {}  # code -> sorted list of rate dates
+        self.rates = {}  # code -> Decimal rates, parallel to dates
+        self.latest_rows = []  # Serialized rows of the most recent date
+
+
+class CurrencyRateCache:
+    """
+    Process-local copy of the CurrencyRate table: the latest rate per currency,
+    the dated history of every currency (sorted arrays for as-of lookups) and the serialized rows of the most
+    recent date (what /api/currency-rates/ returns).
+
+    Rates change once a day, so lookups are served from memory. The copy is
+    dropped once a CurrencyRate save/delete is committed in this process; other
+    processes notice the version stamp in the default cache (checked at most
+    every VERSION_CHECK_INTERVAL seconds). Code that writes rates without
+    signals (bulk_create, update) must call changed() itself.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._table = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def load(self):
+        from .models import CurrencyRate
+        from .serializers import CurrencyRateSerializer
+
+        version = cache.get(VERSION_CACHE_KEY, 0)
+        table = _RateTable()
+        for code, date, rate in CurrencyRate.objects.order_by('code', 'date').values_list('code', 'date', 'rate'):
+            table.dates.setdefault(code, []).append(date)
+            table.rates.setdefault(code, []).append(Decimal(str(rate)))
+        for code, rates in table.rates.items():
+            table.latest[code] = rates[-1]
+
+        latest = CurrencyRate.objects.order_by('-date').values_list('date', flat=True).first()
+        if latest is not None:
+            table.latest_rows = list(CurrencyRateSerializer(CurrencyRate.objects.filter(date=latest), many=True).data)
+
+        with self._lock:
+            self._table = table
+            self._version = version
+            self._checked_at = time.monotonic()
+        return table
+
+    def invalidate(self):
+        with self._lock:
+            self._table = None
+
+    def changed(self):
+        """
+        Drop the copy here and tell other processes to do the same
+        """
+        self.invalidate()
+        try:
+            cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            cache.set(VERSION_CACHE_KEY, 1, None)
+
+    def _get_table(self):
+        table = self._table
+        if table is not None and time.monotonic() - self._checked_at < VERSION_CHECK_INTERVAL:
+            return table
+        if table is None or cache.get(VERSION_CACHE_KEY, 0) != self._version:
+            # Return the table built here: self._table may be invalidated again meanwhile
+            return self.load()
+        self._checked_at = time.monotonic()
+        return table
+
+    def get_rate(self, code):
+        """
+        Latest rate of a currency, None if there is none
+        """
+        return self._get_table().latest.get(code)
+
+    def get_rate_on(self, code, on_date):
+        """
+        Rate of a currency in effect on a date: the rate of the latest rate date
+        not after it (binary search), None if the currency has no rate by then
+        """
+        entry = self.get_rate_entry(code, on_date)
+        return entry[1] if entry is not None else None
+
+    def get_rate_entry(self, code, on_date=None):
+        """
+        (rate date, rate) of the rate get_rate_on() picks for a date, or of the
+        latest rate when on_date is None; None if there is no such rate
+        """
+        table = self._get_table()
+        dates = table.dates.get(code)
+        if not dates:
+            return None
+        index = len(dates) if on_date is None else bisect_right(dates, on_date)
+        return (dates[index - 1], table.rates[code][index - 1]) if index else None
+
+    def history(self, code):
+        table = self._get_table()
+        return list(zip(table.dates.get(code, []), table.rates.get(code, [])))
+
+    def latest_rows(self):
+        return self._get_table().latest_rows
+
+
+currency_rate_cache = CurrencyRateCache()
@@ -0,0 +1,168 @@
+import threading
+from datetime import date
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import User, Declaration, ProductItem, CalculationResult, DashboardSnapshot
+
+
+CHART_MONTHS = 6
+
+# User ids with a snapshot refresh scheduled and not yet run in this thread
+_scheduled = threading.local()
+
+
+def _month_key(value):
+    return value.strftime('%Y-%m')
+
+
+def _chart_months(today=None):
+    """
+    First day of each of the last CHART_MONTHS calendar months, oldest first
+    """
+    today = today or timezone.localdate()
+    months = []
+    year, month = today.year, today.month
+    for _ in range(CHART_MONTHS):
+        months.append(date(year, month, 1))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return list(reversed(months))
+
+
+def compute_dashboard_summary(user_id, since=None):
+    """
+    KPIs and per-month import value/duty totals for a user using aggregate
+    queries only (no per-declaration or per-product iteration)
+    """
+    declarations = Declaration.objects.filter(user_id=user_id)
+    kpis = declarations.aggregate(
+        total_declarations=Count('id'),
+        pending_declarations=Count('id', filter=Q(status='QORALAMA')),
+    )
+    kpis['total_products'] = ProductItem.objects.filter(user_id=user_id).count()
+
+    # One filter() call, so the user and date conditions apply to the same
+    # declaration join and a calculation is not counted once per declaration pair
+    declaration_filter = {'product_item__declarations__user_id': user_id}
+    if since is not None:
+        declarations = declarations.filter(created_at__gte=since)
+        declaration_filter['product_item__declarations__created_at__gte'] = since
+    calculations = CalculationResult.objects.filter(**declaration_filter)
+
+    months = {}
+    value_rows = (
+        declarations.annotate(month=TruncMonth('created_at'))
+        .values('month').annotate(value=Sum('total_value')).order_by()
+    )
+    for row in value_rows:
+        months.setdefault(_month_key(row['month']), {'value': 0.0, 'duty': 0.0})['value'] = float(row['value'] or 0)
+
+    duty_rows = (
+        calculations.annotate(month=TruncMonth('product_item__declarations__created_at'))
+        .values('month').annotate(duty=Sum('customs_duty')).order_by()
+    )
+    for row in duty_rows:
+        months.setdefault(_month_key(row['month']), {'value': 0.0, 'duty': 0.0})['duty'] = float(row['duty'] or 0)
+
+    return {'kpis': kpis, 'months': months}
+
+
+def build_monthly_data(months, today=None):
+    """
+    Chart series for the last CHART_MONTHS months from {'YYYY-MM': {'value', 'duty'}}
+    """
+    monthly_data = []
+    for i, month_start in enumerate(_chart_months(today)):
+        totals = months.get(_month_key(month_start), {})
+        monthly_data.append({
+            'name': month_start.strftime('%b'),
+            'value': totals.get('value', 0.0),
+            'duty': totals.get('duty', 0.0),
+            'speed': 24 - i * 2  # Simulated speed improvement
+        })
+    return monthly_data
+
+
+def snapshots_enabled():
+    return getattr(settings, 'DASHBOARD_SNAPSHOTS', False)
+
+
+def get_dashboard_summary(user):
+    """
+    Dashboard KPIs and monthly totals, read from the user's DashboardSnapshot
+    when snapshots are enabled, otherwise aggregated on the fly
+    """
+    if not snapshots_enabled():
+        return compute_dashboard_summary(user.id, since=_chart_months()[0])
+
+    snapshot = DashboardSnapshot.objects.filter(user=user).first()
+    if snapshot is None:
+        snapshot = refresh_dashboard_snapshot(user.id)
+    return {
+        'kpis': {
+            'total_declarations': snapshot.total_declarations,
+            'pending_declarations': snapshot.pending_declarations,
+            'total_products': snapshot.total_products,
+        },
+        'months': snapshot.monthly_totals,
+    }
+
+
+def refresh_dashboard_snapshot(user_id):
+    """
+    Recompute and store the DashboardSnapshot of one user.
+    This is a full recompute of the user's aggregates (the queries of
+    compute_dashboard_summary), not a delta: a delta would need the old
+    status, total and product membership of every changed row.
+    """
+    summary = compute_dashboard_summary(user_id)
+    snapshot, _ = DashboardSnapshot.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'total_declarations': summary['kpis']['total_declarations'],
+            'pending_declarations': summary['kpis']['pending_declarations'],
+            'total_products': summary['kpis']['total_products'],
+            'monthly_totals': summary['months'],
+        }
+    )
+    return snapshot
+
+
+def schedule_snapshot_refresh(user_id):
+    """
+    Refresh a user's snapshot once the current transaction commits.
+    A callback is registered for every change, so one dropped with a rolled
+    back savepoint cannot hide a later change; the callbacks of one commit
+    share the pending set and only the first one refreshes.
+    """
+    if not snapshots_enabled() or user_id is None:
+        return
+
+    if not transaction.get_connection().in_atomic_block:
+        _refresh_if_user_exists(user_id)
+        return
+
+    pending = getattr(_scheduled, 'user_ids', None)
+    if pending is None:
+        pending = _scheduled.user_ids = set()
+    pending.add(user_id)
+
+    def refresh():
+        # Ids left over from a rolled back transaction are refreshed by the
+        # next commit that schedules the same user, which is still correct
+        if user_id in pending:
+            pending.discard(user_id)
+            _refresh_if_user_exists(user_id)
+
+    transaction.on_commit(refresh)
+
+
+def _refresh_if_user_exists(user_id):
+    # Deleting a user cascades to their declarations, whose signals schedule
+    # a refresh that must not recreate a snapshot for the deleted user
+    if User.objects.filter(pk=user_id).exists():
+        refresh_dashboard_snapshot(user_id)
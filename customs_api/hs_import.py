@@ -0,0 +1,319 @@
+import ast
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import HsCode
+
+
+# HsCode fields written by the importer, compared to decide whether a row changed
+IMPORT_FIELDS = ('description_uz', 'description_ru', 'duty_rate', 'vat_rate', 'excise_rate',
+                 'required_certs', 'version_status', 'sources')
+
+RATE_QUANT = Decimal('0.01')
+
+
+def parse_rate(value):
+    """
+    Percentage rate as a 2-place Decimal; blanks and text rates ('Maxsus stavka') become 0.00
+    """
+    try:
+        return Decimal(str(value).strip() or '0').quantize(RATE_QUANT)
+    except (InvalidOperation, ValueError):
+        return Decimal('0.00')
+
+
+def parse_certificates(value):
+    """
+    Required certificates from a list, a JSON/Python list literal or a single name
+    """
+    if isinstance(value, list):
+        return [str(cert).strip() for cert in value if str(cert).strip()]
+    value = str(value or '').strip()
+    if not value:
+        return []
+    if value.startswith('['):
+        try:
+            certs = json.loads(value)
+        except ValueError:
+            try:
+                certs = ast.literal_eval(value)
+            except (ValueError, SyntaxError):
+                # Unquoted list such as [Veterinariya sertifikati, CITES]
+                certs = value.strip('[]').split(',')
+        if not isinstance(certs, (list, tuple)):
+            certs = [certs]
+        return [str(cert).strip() for cert in certs if str(cert).strip()]
+    return [value]
+
+
+def normalize_code(code):
+    return str(code or '').replace(' ', '').replace('.', '').strip()
+
+
+def iter_json_records(f, read_size=64 * 1024):
+    """
+    Yield the objects of a top-level JSON array one at a time without decoding
+    the whole document at once
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+    while True:
+        # Skip whitespace and the separators between array items
+        while position < len(buffer) and buffer[position] in ' \t\r\n,\ufeff':
+            position += 1
+
+        if position >= len(buffer):
+            if eof:
+                if started:
+                    raise ValueError('Truncated JSON array')
+                return
+            chunk = f.read(read_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+
+        if not started:
+            if buffer[position] != '[':
+                raise ValueError('Expected a JSON array of HS code objects')
+            started = True
+            position += 1
+            continue
+        if buffer[position] == ']':
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except ValueError:
+            if eof:
+                raise ValueError('Truncated or invalid JSON array')
+            # The item continues in the next chunk
+            chunk = f.read(read_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+        position = end
+
+
+def iter_jsonl_records(f):
+    """
+    Yield the objects of a JSON Lines file (one HS code object per line, as written by pdf_extract.py)
+    """
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            raise ValueError(f'Line {line_number}: {e}')
+
+
+def parse_info_txt_line(line):
+    """
+    Split one info.txt data line into an HS code record.
+
+    Columns: code, name_uz, name_ru, category, subcategory, keywords, duty, VAT,
+    excise, certificates[, confidence, search frequency]. Some lines have runs
+    of tabs; when the exact split does not give 10 or 12 columns the empty cells
+    are collapsed and the layout is picked by column count (9 columns = no
+    excise column), as in load_all_hs_codes_final. Raises ValueError for lines
+    that fit no layout.
+    """
+    parts = [part.strip() for part in line.split('\t')]
+    if len(parts) not in (10, 12) or not parts[1]:
+        parts = [part for part in parts if part]
+        if len(parts) == 9:
+            parts.insert(8, '')
+    if len(parts) < 10:
+        if len(parts) >= 3:
+            # Lines with rates/certificates missing altogether
+            parts.extend([''] * (10 - len(parts)))
+        else:
+            raise ValueError(f'Line has only {len(parts)} columns')
+
+    return {
+        'code': normalize_code(parts[0]),
+        'description_uz': parts[1],
+        'description_ru': parts[2],
+        'category': parts[3],
+        'subcategory': parts[4],
+        'keywords': parts[5],
+        'duty_rate': parse_rate(parts[6]),
+        'vat_rate': parse_rate(parts[7]),
+        'excise_rate': parse_rate(parts[8]),
+        'required_certs': parse_certificates(parts[9]),
+    }
+
+
+def iter_info_txt_records(f, on_error=None):
+    """
+    Yield validated HS code records from an info.txt file object one line at a
+    time, so memory use does not depend on the file size.
+    Lines that do not start with a code are skipped; code lines that are not a
+    valid 8 or 10 digit record are passed to on_error(line_number, message).
+    """
+    for line_number, line in enumerate(f, 1):
+        line = line.strip('\r\n\ufeff')
+        stripped = line.strip()
+        if not stripped or stripped.startswith(('HS Code', 'TIF TN', '#')):
+            continue
+        code = normalize_code(line.split('\t', 1)[0])
+        if not code.isdigit():
+            # Section titles and wrapped description lines
+            continue
+        if len(code) not in (8, 10):
+            if on_error is not None:
+                on_error(line_number, f'Invalid code {code[:20]!r}')
+            continue
+        try:
+            yield parse_info_txt_line(line)
+        except ValueError as e:
+            if on_error is not None:
+                on_error(line_number, f'{code}: {e}')
+
+
+def build_values(item, source):
+    """
+    HsCode field values for one input record (JSON batch files, TSV rows and
+    PDF extraction output share this). Rates, certificates and the Russian
+    description are only returned when the record has them, so sources without
+    them (PDF text) do not overwrite stored values.
+    """
+    code = normalize_code(item.get('code'))
+    if not code.isdigit() or len(code) not in (8, 10):
+        raise ValueError(f'Invalid code format: {item.get("code")!r}')
+    description_uz = str(item.get('description_uz') or '').strip()
+    if not description_uz:
+        raise ValueError(f'Missing description_uz for {code}')
+    
+    values = {
+        'description_uz': description_uz,
+        'version_status': 'ACTIVE',
+        'sources': [source] if source else [],
+    }
+    if 'description_ru' in item:
+        values['description_ru'] = str(item.get('description_ru') or '').strip() or None
+    for field in ('duty_rate', 'vat_rate', 'excise_rate'):
+        if field in item:
+            values[field] = parse_rate(item[field])
+    if 'required_certs' in item or 'required_certificates' in item:
+        values['required_certs'] = parse_certificates(item.get('required_certs', item.get('required_certificates')))
+    return code, values
+
+
+class HsCodeImporter:
+    """
+    Applies a stream of HS code records to the HsCode table.
+
+    Existing rows are read once into memory; the records are merged per code
+    (the last occurrence of a duplicated code wins), compared with their rows
+    and only new or changed codes are written, with bulk_create/bulk_update
+    in chunks of `chunk_size`. The whole import runs in one transaction, so a
+    failure leaves the table untouched.
+    """
+
+    def __init__(self, source='', chunk_size=1000, dry_run=False):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.stats = {'read': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'duplicates': 0, 'errors': 0, 'elapsed': 0.0}
+        self.errors = []
+
+    def record_error(self, line_number, message):
+        """
+        Error callback for the parsers: counted and reported with the import stats
+        """
+        self.stats['errors'] += 1
+        self.errors.append(f'Line {line_number}: {message}')
+
+    def _load_existing(self):
+        existing = {}
+        for row in HsCode.objects.values('id', 'code', *IMPORT_FIELDS).iterator(chunk_size=5000):
+            existing[row['code']] = row
+        return existing
+
+    def _merge_sources(self, current, values):
+        # Keep the sources a code already has and add this import's
+        sources = list(current.get('sources') or [])
+        for source in values['sources']:
+            if source not in sources:
+                sources.append(source)
+        values['sources'] = sources
+
+    def run(self, records):
+        started = time.time()
+        with transaction.atomic():
+            existing = self._load_existing()
+            incoming = self._collect(records)
+            to_create = []
+            to_update = []
+            now = timezone.now()
+
+            for code, values in incoming.items():
+                current = existing.get(code)
+                if current is None:
+                    to_create.append(HsCode(code=code, **values))
+                    self.stats['created'] += 1
+                else:
+                    self._merge_sources(current, values)
+                    values = {**{field: current[field] for field in IMPORT_FIELDS}, **values}
+                    if all(current[field] == values[field] for field in IMPORT_FIELDS):
+                        self.stats['unchanged'] += 1
+                        continue
+                    to_update.append(HsCode(id=current['id'], code=code, updated_at=now, **values))
+                    self.stats['updated'] += 1
+
+                if len(to_create) >= self.chunk_size:
+                    self._flush_creates(to_create)
+                if len(to_update) >= self.chunk_size:
+                    self._flush_updates(to_update)
+
+            self._flush_creates(to_create)
+            self._flush_updates(to_update)
+
+            if self.dry_run:
+                transaction.set_rollback(True)
+
+        self.stats['elapsed'] = time.time() - started
+        return self.stats
+
+    def _collect(self, records):
+        """
+        Validated field values per code. A duplicated code keeps the fields of
+        its last occurrence, on top of what earlier occurrences set, as the
+        update_or_create based loaders did.
+        """
+        incoming = {}
+        for item in records:
+            self.stats['read'] += 1
+            try:
+                code, values = build_values(item, self.source)
+            except (ValueError, TypeError, AttributeError) as e:
+                self.stats['errors'] += 1
+                self.errors.append(str(e))
+                continue
+            if code in incoming:
+                self.stats['duplicates'] += 1
+                values = {**incoming[code], **values}
+            incoming[code] = values
+        return incoming
+
+    def _flush_creates(self, objects):
+        if objects:
+            HsCode.objects.bulk_create(objects, batch_size=self.chunk_size)
+            objects.clear()
+
+    def _flush_updates(self, objects):
+        if objects:
+            HsCode.objects.bulk_update(objects, list(IMPORT_FIELDS) + ['updated_at'], batch_size=self.chunk_size)
+            objects.clear()
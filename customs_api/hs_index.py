@@ -0,0 +1,261 @@
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left
+
+from .models import HsCode
+
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+CODE_QUERY_RE = re.compile(r'^[\d\s.]+$')
+
+# BM25 parameters (term frequency is always 1 since tokens are stored as sets)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    """
+    Split text into lowercase word tokens (works for both UZ and RU descriptions)
+    """
+    if not text:
+        return []
+    return TOKEN_RE.findall(str(text).lower())
+
+
+class _TrieNode:
+    __slots__ = ('children', 'pk')
+
+    def __init__(self):
+        self.children = {}
+        self.pk = None
+
+
+class HsCodeIndex:
+    """
+    Process-wide in-memory index over the HsCode table.
+
+    Holds a prefix trie keyed by code digits and an inverted token index over
+    description_uz, description_ru and required_certs. Text matches are ranked
+    with BM25 (see MemorySearchBackend in hs_search.py). The index is loaded
+    lazily on the first search and then kept in sync through the HsCode
+    post_save/post_delete signals once their transaction commits (see signals.py).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        self._root = _TrieNode()
+        self._records = {}       # pk -> result record
+        self._pk_tokens = {}     # pk -> set of indexed tokens
+        self._postings = {}      # token -> set of pks
+        self._vocabulary = []    # sorted list of tokens for prefix lookups
+        self._total_length = 0   # sum of indexed token counts, for BM25 length normalisation
+
+    @property
+    def is_loaded(self):
+        return self._loaded
+
+    def load(self):
+        """
+        (Re)build the whole index from the database
+        """
+        fields = ('pk', 'code', 'description_uz', 'description_ru', 'required_certs', 'sources')
+        with self._lock:
+            self._reset()
+            for row in HsCode.objects.values_list(*fields).iterator(chunk_size=2000):
+                self._add(*row)
+            self._vocabulary = sorted(self._postings)
+            self._loaded = True
+
+    def invalidate(self):
+        """
+        Drop the index so that the next search rebuilds it from the database.
+        Use after bulk_create/update() calls, which do not send model signals.
+        """
+        with self._lock:
+            self._reset()
+            self._loaded = False
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load()
+
+    def update(self, instance):
+        """
+        Re-index a single saved HsCode instance
+        """
+        with self._lock:
+            if not self._loaded:
+                return
+            self._remove(instance.pk)
+            new_tokens = self._add(
+                instance.pk, instance.code, instance.description_uz,
+                instance.description_ru, instance.required_certs, instance.sources
+            )
+            for token in new_tokens:
+                i = bisect_left(self._vocabulary, token)
+                if i == len(self._vocabulary) or self._vocabulary[i] != token:
+                    self._vocabulary.insert(i, token)
+
+    def remove(self, pk):
+        """
+        Remove a deleted HsCode from the index
+        """
+        with self._lock:
+            if self._loaded:
+                self._remove(pk)
+
+    def search(self, query, limit=10):
+        """
+        Return up to `limit` (record, score) pairs, best match first.
+
+        Digit-only queries are answered from the code trie (prefix match, scored
+        by how much of the code the prefix covers). Text queries require every
+        query token to prefix-match a token of the description/certificates and
+        are ranked by BM25.
+        """
+        query = (query or '').strip()
+        if not query:
+            return []
+
+        self.ensure_loaded()
+        with self._lock:
+            if CODE_QUERY_RE.match(query):
+                prefix = re.sub(r'\D', '', query)
+                pks = self._code_prefix(prefix, limit)
+                if pks:
+                    return [
+                        (self._records[pk], len(prefix) / max(len(self._records[pk]['code']), 1))
+                        for pk in pks
+                    ]
+
+            scores = None
+            for token in set(tokenize(query)):
+                weights = self._token_prefix(token)
+                if scores is None:
+                    scores = weights
+                else:
+                    scores = {pk: score + weights[pk] for pk, score in scores.items() if pk in weights}
+                if not scores:
+                    return []
+            if not scores:
+                return []
+
+            avg_length = (self._total_length / len(self._records)) or 1
+
+            def bm25(pk):
+                length = len(self._pk_tokens[pk])
+                norm = (BM25_K1 + 1) / (1 + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+                return scores[pk] * norm
+
+            ranked = heapq.nsmallest(limit, scores, key=lambda pk: (-bm25(pk), self._records[pk]['code']))
+            return [(self._records[pk], bm25(pk)) for pk in ranked]
+
+    # Internal helpers (callers must hold the lock)
+
+    def _add(self, pk, code, description_uz, description_ru, required_certs, sources):
+        self._records[pk] = {
+            'pk': pk,
+            'code': code,
+            'description_uz': description_uz,
+            'description_ru': description_ru,
+            'sources': sources or [],
+        }
+
+        node = self._root
+        for ch in code or '':
+            node = node.children.setdefault(ch, _TrieNode())
+        node.pk = pk
+
+        certs = ' '.join(str(c) for c in required_certs) if isinstance(required_certs, list) else required_certs
+        tokens = set(tokenize(description_uz)) | set(tokenize(description_ru)) | set(tokenize(certs))
+        new_tokens = []
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                new_tokens.append(token)
+            postings.add(pk)
+        self._pk_tokens[pk] = tokens
+        self._total_length += len(tokens)
+        return new_tokens
+
+    def _remove(self, pk):
+        record = self._records.pop(pk, None)
+        if record is None:
+            return
+
+        # Unlink the code from the trie, pruning empty branches
+        code = record['code'] or ''
+        path = [self._root]
+        for ch in code:
+            node = path[-1].children.get(ch)
+            if node is None:
+                break
+            path.append(node)
+        else:
+            if path[-1].pk == pk:
+                path[-1].pk = None
+            for depth in range(len(code), 0, -1):
+                node = path[depth]
+                if node.pk is not None or node.children:
+                    break
+                del path[depth - 1].children[code[depth - 1]]
+
+        tokens = self._pk_tokens.pop(pk, ())
+        self._total_length -= len(tokens)
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.discard(pk)
+            if not postings:
+                del self._postings[token]
+                i = bisect_left(self._vocabulary, token)
+                if i < len(self._vocabulary) and self._vocabulary[i] == token:
+                    del self._vocabulary[i]
+
+    def _code_prefix(self, prefix, limit):
+        node = self._root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+
+        pks = []
+        stack = [node]
+        while stack and len(pks) < limit:
+            current = stack.pop()
+            if current.pk is not None:
+                pks.append(current.pk)
+            # Push in reverse order so the smallest digit is visited first
+            for ch in sorted(current.children, reverse=True):
+                stack.append(current.children[ch])
+        return pks
+
+    def _token_prefix(self, token):
+        """
+        Map every pk having an indexed token that starts with `token` to the
+        highest IDF among its matching tokens
+        """
+        weights = {}
+        total = len(self._records)
+        i = bisect_left(self._vocabulary, token)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(token):
+            postings = self._postings[self._vocabulary[i]]
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for pk in postings:
+                if weights.get(pk, 0) < idf:
+                    weights[pk] = idf
+            i += 1
+        return weights
+
+
+hs_code_index = HsCodeIndex()
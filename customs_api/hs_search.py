@@ -0,0 +1,240 @@
+import json
+import re
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, When, IntegerField
+
+from .hs_index import hs_code_index, tokenize, CODE_QUERY_RE
+
+
+FTS_TABLE = 'customs_api_hscode_fts'
+
+# Must match the expression of the GIN index created in migration 0003
+PG_DOCUMENT_SQL = (
+    "to_tsvector('simple', coalesce(h.code, '') || ' ' || coalesce(h.description_uz, '') || ' ' || "
+    "coalesce(h.description_ru, '') || ' ' || coalesce(h.required_certs::text, ''))"
+)
+
+
+def _code_prefix(query):
+    """
+    Digits of a code-only query ("0101 21", "0101.21"), None for text queries.
+    Codes are indexed as one token, so the digits are matched as one prefix.
+    """
+    query = (query or '').strip()
+    if query and CODE_QUERY_RE.match(query):
+        return re.sub(r'\D', '', query) or None
+    return None
+
+
+def _load_json(value):
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return []
+    return value or []
+
+
+class BaseSearchBackend:
+    """
+    Full-text search engine over HsCode.
+
+    search() returns up to `limit` (record, score) pairs ordered best first,
+    where record is a dict with pk, code, description_uz, description_ru and
+    sources, and a higher score means a better match.
+    """
+
+    name = None
+
+    def search(self, query, limit=10):
+        raise NotImplementedError
+
+    def index(self, instance):
+        """Called from post_save on HsCode"""
+
+    def remove(self, pk):
+        """Called from post_delete on HsCode"""
+
+    def rebuild(self):
+        """Re-index every HsCode row (after bulk loads that skip signals)"""
+
+
+class MemorySearchBackend(BaseSearchBackend):
+    """In-process trie + inverted index (see hs_index.py), BM25 ranked"""
+
+    name = 'memory'
+
+    def search(self, query, limit=10):
+        return hs_code_index.search(query, limit=limit)
+
+    def index(self, instance):
+        hs_code_index.update(instance)
+
+    def remove(self, pk):
+        hs_code_index.remove(pk)
+
+    def rebuild(self):
+        hs_code_index.load()
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    """SQLite FTS5 virtual table kept in sync through model signals, BM25 ranked"""
+
+    name = 'sqlite'
+
+    # bm25() column weights: code, description_uz, description_ru, required_certs
+    COLUMN_WEIGHTS = (10.0, 1.0, 1.0, 0.5)
+
+    def search(self, query, limit=10):
+        # Code-only queries match the code column as one prefix, falling back
+        # to a token search when no code starts with it (like the memory backend)
+        code_prefix = _code_prefix(query)
+        if code_prefix:
+            results = self._match(f'code : "{code_prefix}"*', limit, order='h.code')
+            if results:
+                return results
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        return self._match(' AND '.join(f'"{token}"*' for token in dict.fromkeys(tokens)), limit)
+
+    def _match(self, match, limit, order='score DESC, h.code'):
+        weights = ', '.join(str(w) for w in self.COLUMN_WEIGHTS)
+        sql = (
+            f"SELECT h.id, h.code, h.description_uz, h.description_ru, h.sources, "
+            f"-bm25({FTS_TABLE}, {weights}) AS score "
+            f"FROM {FTS_TABLE} JOIN customs_api_hscode h ON h.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s ORDER BY {order} LIMIT %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [match, limit])
+            rows = cursor.fetchall()
+        return [
+            ({
+                'pk': pk,
+                'code': code,
+                'description_uz': description_uz,
+                'description_ru': description_ru,
+                'sources': _load_json(sources),
+            }, score)
+            for pk, code, description_uz, description_ru, sources, score in rows
+        ]
+
+    def index(self, instance):
+        certs = instance.required_certs
+        if isinstance(certs, list):
+            certs = ' '.join(str(c) for c in certs)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [instance.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, code, description_uz, description_ru, required_certs) "
+                f"VALUES (%s, %s, %s, %s, %s)",
+                [instance.pk, instance.code, instance.description_uz, instance.description_ru or '', certs or '']
+            )
+
+    def remove(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pk])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, code, description_uz, description_ru, required_certs) "
+                f"SELECT id, code, description_uz, COALESCE(description_ru, ''), required_certs "
+                f"FROM customs_api_hscode"
+            )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    PostgreSQL tsvector search backed by a GIN expression index.
+    The index is maintained by PostgreSQL itself, so index()/remove() are no-ops.
+    Ranking uses ts_rank_cd (PostgreSQL has no built-in BM25).
+    """
+
+    name = 'postgresql'
+
+    def search(self, query, limit=10):
+        code_prefix = _code_prefix(query)
+        tokens = [code_prefix] if code_prefix else tokenize(query)
+        if not tokens:
+            return []
+        tsquery = ' & '.join(f'{token}:*' for token in dict.fromkeys(tokens))
+        sql = (
+            f"SELECT h.id, h.code, h.description_uz, h.description_ru, h.sources, "
+            f"ts_rank_cd({PG_DOCUMENT_SQL}, q) AS score "
+            f"FROM customs_api_hscode h, to_tsquery('simple', %s) q "
+            f"WHERE {PG_DOCUMENT_SQL} @@ q ORDER BY score DESC, h.code LIMIT %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [tsquery, limit])
+            rows = cursor.fetchall()
+        return [
+            ({
+                'pk': pk,
+                'code': code,
+                'description_uz': description_uz,
+                'description_ru': description_ru,
+                'sources': _load_json(sources),
+            }, float(score))
+            for pk, code, description_uz, description_ru, sources, score in rows
+        ]
+
+
+BACKENDS = {
+    MemorySearchBackend.name: MemorySearchBackend,
+    SQLiteFTS5Backend.name: SQLiteFTS5Backend,
+    PostgresSearchBackend.name: PostgresSearchBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _auto_backend_name():
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend.name
+    if connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+        return SQLiteFTS5Backend.name
+    return MemorySearchBackend.name
+
+
+def get_search_backend():
+    """
+    Return the configured HS code search backend.
+    settings.HS_CODE_SEARCH_BACKEND: 'auto' (default), 'sqlite', 'postgresql' or 'memory'.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = getattr(settings, 'HS_CODE_SEARCH_BACKEND', 'auto')
+                if name == 'auto':
+                    name = _auto_backend_name()
+                _backend = BACKENDS[name]()
+    return _backend
+
+
+def search_hs_codes(query, limit=10):
+    """
+    Ranked full-text search over HsCode, returns (record, score) pairs
+    """
+    return get_search_backend().search(query, limit=limit)
+
+
+def ranked_hs_code_queryset(queryset, query, limit=None):
+    """
+    Restrict an HsCode queryset to the full-text matches of `query`,
+    ordered by relevance
+    """
+    if limit is None:
+        limit = getattr(settings, 'HS_CODE_SEARCH_MAX_RESULTS', 500)
+    pks = [record['pk'] for record, score in search_hs_codes(query, limit=limit)]
+    if not pks:
+        return queryset.none()
+    ordering = Case(*[When(pk=pk, then=position) for position, pk in enumerate(pks)], output_field=IntegerField())
+    return queryset.filter(pk__in=pks).order_by(ordering)
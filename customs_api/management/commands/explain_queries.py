@@ -0,0 +1,117 @@
+import time
+from datetime import date, timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+
+from customs_api.models import User, ProductItem, CurrencyRate
+from customs_api.query_shapes import QUERY_SHAPES
+
+
+class Command(BaseCommand):
+    help = ('Replay the recorded query shapes and print their query plans (EXPLAIN) and timings '
+            'without and with the indexes declared in Meta.indexes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shape', action='append', help='Only shapes whose name starts with this (repeatable)')
+        parser.add_argument('--user', help='Sample user phone (default: the user with the most products)')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query for the timing (0 = no timing)')
+        parser.add_argument('--after-only', action='store_true', help='Only explain with the current indexes')
+
+    def handle(self, *args, **options):
+        if not options['after_only'] and not connection.features.can_rollback_ddl:
+            # DROP INDEX would commit implicitly (MySQL) and lose the indexes for good
+            raise CommandError(f'{connection.vendor} cannot roll back DDL; use --after-only')
+
+        shapes = QUERY_SHAPES
+        if options['shape']:
+            shapes = [shape for shape in shapes if shape.name.startswith(tuple(options['shape']))]
+            if not shapes:
+                raise CommandError(f"No query shape matches {', '.join(options['shape'])}")
+        sample = self.sample(options['user'])
+        self.stdout.write(f"Sample: {', '.join(f'{key}={value}' for key, value in sample.items())}")
+
+        after = self.explain(shapes, sample, options['repeat'], 'after')
+        before = None
+        if not options['after_only']:
+            before = self.explain_without_indexes(shapes, sample, options['repeat'])
+
+        for shape in shapes:
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{shape.name}  ({shape.source})'))
+            if before is not None:
+                self.write_plan('before', *before[shape.name])
+            self.write_plan('after', *after[shape.name])
+
+    def sample(self, phone):
+        if phone:
+            try:
+                user = User.objects.get(phone=phone)
+            except User.DoesNotExist:
+                raise CommandError(f'User not found: {phone}')
+        else:
+            user = User.objects.annotate(products=Count('product_items')).order_by('-products', 'pk').first()
+        hs_code = ProductItem.objects.values_list('hs_code', flat=True).first()
+        latest = CurrencyRate.objects.order_by('-date').values_list('date', flat=True).first()
+        return {
+            'user_id': user.pk if user else 0,
+            'hs_code': hs_code or '0000000000',
+            'rate_date': latest or date.today(),
+            'since': date.today() - timedelta(days=90),
+        }
+
+    def custom_indexes(self):
+        for model in apps.get_app_config('customs_api').get_models():
+            for index in model._meta.indexes:
+                yield model, index
+
+    def explain_without_indexes(self, shapes, sample, repeat):
+        """
+        Drop the Meta.indexes inside a transaction, explain, and roll back.
+        Only called on databases that can roll back DDL (SQLite, PostgreSQL).
+        """
+        editor = connection.schema_editor(collect_sql=True)
+        dropped = []
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for model, index in self.custom_indexes():
+                    cursor.execute(editor.sql_delete_index % {
+                        'name': editor.quote_name(index.name),
+                        'table': editor.quote_name(model._meta.db_table),
+                    })
+                    dropped.append(index.name)
+            results = self.explain(shapes, sample, repeat, 'before')
+            transaction.set_rollback(True)
+        self.stdout.write(f"Before = without {len(dropped)} indexes: {', '.join(dropped)}")
+        return results
+
+    def explain_plan(self, queryset, label):
+        # The label keeps the SQL text apart between the runs: SQLite reuses a
+        # cached EXPLAIN statement without noticing the dropped indexes
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql} /* {label} */', params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+    def explain(self, shapes, sample, repeat, label):
+        results = {}
+        for shape in shapes:
+            queryset = shape.queryset(sample)
+            plan = self.explain_plan(queryset, label)
+            elapsed = None
+            if repeat > 0:
+                list(queryset.all())  # Warm up
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    list(queryset.all())
+                elapsed = (time.perf_counter() - started) / repeat * 1000
+            results[shape.name] = (plan, elapsed)
+        return results
+
+    def write_plan(self, label, plan, elapsed):
+        timing = f' {elapsed:.2f} ms' if elapsed is not None else ''
+        self.stdout.write(f'  {label}:{timing}')
+        for line in plan.splitlines():
+            self.stdout.write(f'    {line}')
@@ -0,0 +1,71 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from customs_api.hs_import import HsCodeImporter, iter_json_records, iter_jsonl_records, iter_info_txt_records
+from customs_api.hs_search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Import HS codes from info.txt (tab separated) or a JSON batch file with chunked bulk writes in one transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='info.txt style TSV file, JSON array or JSON Lines file of HS code objects')
+        parser.add_argument('--format', choices=['auto', 'tsv', 'json', 'jsonl'], default='auto')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per bulk_create/bulk_update')
+        parser.add_argument('--source', help='Value recorded in HsCode.sources (default: file name)')
+        parser.add_argument('--encoding', default='utf-8')
+        parser.add_argument('--dry-run', action='store_true', help='Report the changes and roll them back')
+        parser.add_argument('--no-reindex', action='store_true', help='Skip the search index rebuild')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'File not found: {path}')
+
+        file_format = options['format']
+        if file_format == 'auto':
+            extension = os.path.splitext(path)[1].lower()
+            file_format = {'.json': 'json', '.jsonl': 'jsonl'}.get(extension, 'tsv')
+
+        importer = HsCodeImporter(
+            source=options['source'] or os.path.basename(path),
+            chunk_size=max(1, options['chunk_size']),
+            dry_run=options['dry_run'],
+        )
+        self.stdout.write(f'Importing HS codes from {path} ({file_format})...')
+
+        with open(path, 'r', encoding=options['encoding'], newline='') as f:
+            if file_format == 'json':
+                records = iter_json_records(f)
+            elif file_format == 'jsonl':
+                records = iter_jsonl_records(f)
+            else:
+                records = iter_info_txt_records(f, on_error=importer.record_error)
+            try:
+                stats = importer.run(records)
+            except ValueError as e:
+                raise CommandError(f'Import aborted, nothing was written: {e}')
+
+        for error in importer.errors[:10]:
+            self.stdout.write(self.style.WARNING(f'  {error}'))
+        if len(importer.errors) > 10:
+            self.stdout.write(self.style.WARNING(f'  ... and {len(importer.errors) - 10} more'))
+
+        rate = stats['read'] / max(stats['elapsed'], 0.001)
+        self.stdout.write(
+            f"Read {stats['read']} rows in {stats['elapsed']:.2f}s ({rate:.0f} rows/s): "
+            f"{stats['created']} created, {stats['updated']} updated, {stats['unchanged']} unchanged, "
+            f"{stats['duplicates']} duplicates, {stats['errors']} errors"
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run, changes rolled back'))
+            return
+
+        # Bulk writes send no post_save signals, so the search index is rebuilt once
+        if not options['no_reindex'] and (stats['created'] or stats['updated']):
+            get_search_backend().rebuild()
+            self.stdout.write('Search index rebuilt')
+
+        self.stdout.write(self.style.SUCCESS('Import finished'))
@@ -0,0 +1,14 @@
+import time
+from django.core.management.base import BaseCommand
+from customs_api.hs_search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the HS code full-text search index (run after bulk loads)'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        self.stdout.write(f'Rebuilding HS code search index ({backend.name})...')
+        started = time.time()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt in {time.time() - started:.2f}s'))
@@ -0,0 +1,166 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from customs_api.currency_rates import currency_rate_cache
+from customs_api.models import CurrencyRate
+
+
+DEFAULT_URL = 'https://cbu.uz/uz/arkhiv-kursov-valyut/json/'
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def parse_cbu_records(records, name_field='CcyNm_UZ'):
+    """
+    Turn CBU feed records into {(code, date): {'name', 'rate', 'feed_diff'}}.
+    Rates are stored per one unit of currency (CBU quotes some per Nominal units).
+    """
+    rates = {}
+    for record in records:
+        try:
+            code = record['Ccy']
+            rate_date = datetime.strptime(record['Date'], '%d.%m.%Y').date()
+            nominal = Decimal(str(record.get('Nominal') or 1))
+            rate = (Decimal(str(record['Rate'])) / nominal).quantize(Decimal('0.0001'))
+            feed_diff = (Decimal(str(record.get('Diff') or 0)) / nominal).quantize(Decimal('0.0001'))
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            continue
+        rates[(code, rate_date)] = {
+            'name': record.get(name_field) or record.get('CcyNm_EN') or code,
+            'rate': rate,
+            'feed_diff': feed_diff,
+        }
+    return rates
+
+
+class Command(BaseCommand):
+    help = 'Import Central Bank of Uzbekistan currency rates (today, one date, a date range or a JSON file)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=getattr(settings, 'CBU_RATES_URL', DEFAULT_URL),
+                            help='CBU JSON feed base URL')
+        parser.add_argument('--file', help='Read the CBU JSON feed from a local file instead')
+        parser.add_argument('--date', type=parse_date, help='Rates of one date (YYYY-MM-DD)')
+        parser.add_argument('--from', dest='date_from', type=parse_date, help='Backfill start date (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', type=parse_date, help='Backfill end date, default today')
+        parser.add_argument('--workers', type=int, default=8, help='Parallel requests while backfilling')
+        parser.add_argument('--timeout', type=int, default=30)
+        parser.add_argument('--lang', default='UZ', choices=['UZ', 'UZC', 'RU', 'EN'], help='Currency name language')
+        parser.add_argument('--dry-run', action='store_true', help='Parse and compare, but do not write')
+
+    def handle(self, *args, **options):
+        started = time.time()
+        name_field = f"CcyNm_{options['lang']}"
+
+        if options['file']:
+            try:
+                with open(options['file'], 'r', encoding='utf-8') as f:
+                    records = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read {options['file']}: {e}")
+        else:
+            records = self.fetch(options)
+        if not isinstance(records, list):
+            raise CommandError('Unexpected feed format: a JSON list of rate records is required')
+
+        rates = parse_cbu_records(records, name_field)
+        if not rates:
+            self.stdout.write(self.style.WARNING('No rates found in the feed'))
+            return
+
+        objects = self.build_rates(rates)
+        self.stdout.write(
+            f'Parsed {len(objects)} rates for {len({r.code for r in objects})} currencies '
+            f'({min(r.date for r in objects)} .. {max(r.date for r in objects)})'
+        )
+        if options['dry_run']:
+            return
+
+        with transaction.atomic():
+            CurrencyRate.objects.bulk_create(
+                objects,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['code', 'date'],
+                update_fields=['name', 'rate', 'diff', 'trend'],
+            )
+        # bulk_create sends no post_save signals
+        currency_rate_cache.changed()
+
+        elapsed = time.time() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {len(objects)} rates in {elapsed:.2f}s ({len(objects) / max(elapsed, 0.001):.0f} rows/s)'
+        ))
+
+    def fetch(self, options):
+        """
+        Download the feed: today's rates, one date, or every date of a range in parallel
+        """
+        base_url = options['url'].rstrip('/')
+        if options['date_from']:
+            end = options['date_to'] or date.today()
+            days = (end - options['date_from']).days
+            if days < 0:
+                raise CommandError('--from must not be after --to')
+            dates = [options['date_from'] + timedelta(days=i) for i in range(days + 1)]
+        elif options['date']:
+            dates = [options['date']]
+        else:
+            dates = [None]
+
+        session = requests.Session()
+
+        def get(day):
+            url = f'{base_url}/' if day is None else f'{base_url}/all/{day.isoformat()}/'
+            response = session.get(url, timeout=options['timeout'])
+            response.raise_for_status()
+            return response.json()
+
+        records = []
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+                for day_records in pool.map(get, dates):
+                    records.extend(day_records)
+        except (requests.RequestException, ValueError) as e:
+            raise CommandError(f'Failed to download rates: {e}')
+        return records
+
+    def build_rates(self, rates):
+        """
+        CurrencyRate objects with diff/trend against the previous known rate of
+        the same currency, in one pass over the rates sorted by (code, date)
+        """
+        codes = {code for code, _ in rates}
+        first_date = min(rate_date for _, rate_date in rates)
+
+        # Last stored rate before the imported period, one query for all currencies
+        previous_date = CurrencyRate.objects.filter(
+            code=OuterRef('code'), date__lt=first_date
+        ).order_by('-date').values('date')[:1]
+        previous = dict(
+            CurrencyRate.objects.filter(code__in=codes, date=Subquery(previous_date)).values_list('code', 'rate')
+        )
+
+        objects = []
+        for code, rate_date in sorted(rates):
+            data = rates[(code, rate_date)]
+            rate = data['rate']
+            if code in previous:
+                diff = rate - previous[code]
+            else:
+                diff = data['feed_diff']
+            trend = 'up' if diff > 0 else 'down' if diff < 0 else 'stable'
+            objects.append(CurrencyRate(code=code, name=data['name'], rate=rate, diff=diff, trend=trend, date=rate_date))
+            previous[code] = rate
+        return objects
@@ -0,0 +1,56 @@
+# Full-text search index for HsCode (SQLite FTS5 / PostgreSQL GIN)
+
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS customs_api_hscode_fts USING fts5("
+    "code, description_uz, description_ru, required_certs, "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "INSERT INTO customs_api_hscode_fts (rowid, code, description_uz, description_ru, required_certs) "
+    "SELECT id, code, description_uz, COALESCE(description_ru, ''), required_certs FROM customs_api_hscode",
+]
+SQLITE_DROP = ["DROP TABLE IF EXISTS customs_api_hscode_fts"]
+
+POSTGRES_CREATE = [
+    "CREATE INDEX IF NOT EXISTS customs_api_hscode_fts_gin ON customs_api_hscode h USING GIN ("
+    "(to_tsvector('simple', coalesce(h.code, '') || ' ' || coalesce(h.description_uz, '') || ' ' || "
+    "coalesce(h.description_ru, '') || ' ' || coalesce(h.required_certs::text, ''))))",
+]
+POSTGRES_DROP = ["DROP INDEX IF EXISTS customs_api_hscode_fts_gin"]
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            for sql in SQLITE_CREATE:
+                schema_editor.execute(sql)
+        except OperationalError:
+            # SQLite built without FTS5: the in-memory search backend is used instead
+            pass
+    elif vendor == 'postgresql':
+        for sql in POSTGRES_CREATE:
+            schema_editor.execute(sql)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for sql in SQLITE_DROP:
+            schema_editor.execute(sql)
+    elif vendor == 'postgresql':
+        for sql in POSTGRES_DROP:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customs_api', '0002_usertemplate_hscodepassport_documentgeneration_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customs_api', '0003_hscode_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassificationJob',
+            fields=[
+                ('id', models.CharField(max_length=50, primary_key=True, serialize=False, unique=True)),
+                ('query', models.TextField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('results', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='classification_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
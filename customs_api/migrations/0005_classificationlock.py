@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customs_api', '0004_classificationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassificationLock',
+            fields=[
+                ('key', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
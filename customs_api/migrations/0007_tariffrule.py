@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:18
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+# Rules previously hard-coded in calculate_customs_duties
+INITIAL_RULES = [
+    {'name': 'auto-used', 'product_type': 'AUTO', 'min_age': 4, 'rate_type': 'COMBINED',
+     'duty_rate': Decimal('40.00'), 'specific_rate': Decimal('3.00'),
+     'notes': 'Cars older than 3 years: 40% or 3 per cm3, whichever is greater'},
+    {'name': 'auto-new', 'product_type': 'AUTO', 'max_age': 3, 'duty_rate': Decimal('15.00')},
+    {'name': 'auto-new-large-engine', 'product_type': 'AUTO', 'max_age': 3,
+     'min_engine_volume': Decimal('3000.01'), 'duty_rate': Decimal('30.00'), 'excise_rate': Decimal('20.00'),
+     'notes': 'New cars above 3000 cm3 (luxury tax)'},
+    {'name': 'auto-electric', 'code_prefix': '870380', 'product_type': 'AUTO',
+     'duty_rate': Decimal('0.00'), 'excise_rate': Decimal('0.00'), 'vat_rate': Decimal('0.00')},
+    {'name': 'cis-st1', 'priority': 100, 'origin': 'CIS', 'has_certificate': True, 'mode': 'IM_40',
+     'duty_rate': Decimal('0.00'), 'notes': 'CIS origin with ST-1 certificate'},
+    {'name': 'export-ek10', 'priority': 100, 'mode': 'EK_10', 'duty_rate': Decimal('0.00'),
+     'excise_rate': Decimal('0.00'), 'vat_rate': Decimal('0.00'), 'customs_fee_rate': Decimal('0.10')},
+]
+
+
+def create_initial_rules(apps, schema_editor):
+    TariffRule = apps.get_model('customs_api', 'TariffRule')
+    for rule in INITIAL_RULES:
+        TariffRule.objects.get_or_create(name=rule['name'], defaults=rule)
+
+
+def delete_initial_rules(apps, schema_editor):
+    TariffRule = apps.get_model('customs_api', 'TariffRule')
+    TariffRule.objects.filter(name__in=[rule['name'] for rule in INITIAL_RULES]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customs_api', '0006_dashboardsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TariffRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('code_prefix', models.CharField(blank=True, max_length=20)),
+                ('priority', models.IntegerField(default=0)),
+                ('product_type', models.CharField(blank=True, max_length=20)),
+                ('mode', models.CharField(blank=True, max_length=20)),
+                ('origin', models.CharField(blank=True, max_length=20)),
+                ('has_certificate', models.BooleanField(blank=True, null=True)),
+                ('min_engine_volume', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('max_engine_volume', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('min_age', models.IntegerField(blank=True, null=True)),
+                ('max_age', models.IntegerField(blank=True, null=True)),
+                ('rate_type', models.CharField(choices=[('AD_VALOREM', 'Ad valorem'), ('SPECIFIC', 'Specific'), ('COMBINED', 'Combined')], default='AD_VALOREM', max_length=10)),
+                ('duty_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('specific_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('excise_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('vat_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('customs_fee_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('notes', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_initial_rules, delete_initial_rules),
+    ]
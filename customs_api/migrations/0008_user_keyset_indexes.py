@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customs_api', '0007_tariffrule'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['user', 'timestamp', 'id'], name='chatmessage_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='classificationsearch',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='clssearch_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='declaration',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='declaration_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hscodeprediction',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='hsprediction_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productitem',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='productitem_user_created_idx'),
+        ),
+    ]
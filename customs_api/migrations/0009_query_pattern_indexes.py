@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customs_api', '0008_user_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='currencyrate',
+            index=models.Index(fields=['date', 'code'], name='currencyrate_date_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='declaration',
+            index=models.Index(fields=['user', 'status', 'created_at'], name='declaration_user_status_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from decimal import Decimal
+
+from django.db import migrations
+
+
+# min_engine_volume became an exclusive bound; 3000.01 was the inclusive
+# stand-in for "above 3000 cm3" and missed volumes between 3000 and 3000.01
+def make_bound_exclusive(apps, schema_editor):
+    TariffRule = apps.get_model('customs_api', 'TariffRule')
+    TariffRule.objects.filter(
+        name='auto-new-large-engine', min_engine_volume=Decimal('3000.01')
+    ).update(min_engine_volume=Decimal('3000.00'))
+
+
+def make_bound_inclusive(apps, schema_editor):
+    TariffRule = apps.get_model('customs_api', 'TariffRule')
+    TariffRule.objects.filter(
+        name='auto-new-large-engine', min_engine_volume=Decimal('3000.00')
+    ).update(min_engine_volume=Decimal('3000.01'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customs_api', '0009_query_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(make_bound_exclusive, make_bound_inclusive),
+    ]
@@ -135,6 +135,11 @@ class ProductItem(models.Model):
     class Meta:
         verbose_name = "Product Item"
         verbose_name_plural = "Product Items"
+        # Chosen from customs_api.query_shapes; compare plans with manage.py explain_queries
+        indexes = [
+            # Keyset pagination of a user's list (pagination.UserCursorPagination)
+            models.Index(fields=['user', 'created_at', 'id'], name='productitem_user_created_idx'),
+        ]
 
 
 class ValidationIssue(models.Model):
@@ -197,6 +202,11 @@ class Declaration(models.Model):
     class Meta:
         verbose_name = "Declaration"
         verbose_name_plural = "Declarations"
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='declaration_user_created_idx'),
+            # Dashboard pending list and export filters by status
+            models.Index(fields=['user', 'status', 'created_at'], name='declaration_user_status_idx'),
+        ]
 
 
 class AuditResult(models.Model):
@@ -245,6 +255,11 @@ class HsCodePrediction(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='hs_predictions')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='hsprediction_user_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.code} - {self.confidence}%"
 
@@ -283,6 +298,11 @@ class ChatMessage(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_messages')
     is_thinking = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'timestamp', 'id'], name='chatmessage_user_time_idx'),
+        ]
+
     def __str__(self):
         return f"{self.role}: {self.content[:50]}..."
 
@@ -345,6 +365,11 @@ class CurrencyRate(models.Model):
     class Meta:
         unique_together = ('code', 'date')
         ordering = ['-date', 'code']
+        indexes = [
+            # Latest date and the rates of one date in the default ordering;
+            # (code, -date) lookups use the unique_together index
+            models.Index(fields=['date', 'code'], name='currencyrate_date_code_idx'),
+        ]
 
     def __str__(self):
         return f"{self.code} - {self.rate}"
@@ -433,5 +458,93 @@ class ClassificationSearch(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='classification_searches')
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='clssearch_user_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.search_query[:30]}... - {self.user.phone}"
+
+class ClassificationJob(models.Model):
+    """Background AI classification job for HS code search"""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    id = models.CharField(max_length=50, unique=True, primary_key=True)
+    query = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    results = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True, null=True)
+
+    # Relations (search is public, so anonymous jobs have no user)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='classification_jobs', null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.id} - {self.status}"
+
+
+class ClassificationLock(models.Model):
+    """Row used as a cross-process lock for single-flight AI lookups"""
+    key = models.CharField(max_length=100, primary_key=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.key
+
+
+class DashboardSnapshot(models.Model):
+    """Per-user materialized dashboard KPIs, refreshed when declarations/calculations change"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='dashboard_snapshot')
+    total_declarations = models.IntegerField(default=0)
+    pending_declarations = models.IntegerField(default=0)
+    total_products = models.IntegerField(default=0)
+    monthly_totals = models.JSONField(default=dict)  # {'YYYY-MM': {'value': ..., 'duty': ...}}
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Dashboard snapshot for {self.user.phone}"
+
+
+class TariffRule(models.Model):
+    """Declarative tariff rule: HS code prefix + conditions -> duty/excise/VAT rates"""
+    RATE_TYPE_CHOICES = [
+        ('AD_VALOREM', 'Ad valorem'),  # % of customs value
+        ('SPECIFIC', 'Specific'),  # amount per cm3 of engine volume
+        ('COMBINED', 'Combined'),  # the greater of the two
+    ]
+
+    name = models.CharField(max_length=100, unique=True)
+    code_prefix = models.CharField(max_length=20, blank=True)  # Empty prefix matches every code
+    priority = models.IntegerField(default=0)  # Higher priority wins over a longer prefix
+
+    # Conditions (empty/null = any)
+    product_type = models.CharField(max_length=20, blank=True)
+    mode = models.CharField(max_length=20, blank=True)
+    origin = models.CharField(max_length=20, blank=True)
+    has_certificate = models.BooleanField(null=True, blank=True)
+    min_engine_volume = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)  # cm3, exclusive
+    max_engine_volume = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)  # cm3, inclusive
+    min_age = models.IntegerField(null=True, blank=True)  # Years since manufacture
+    max_age = models.IntegerField(null=True, blank=True)
+
+    # Rates (null = inherited from lower rules, the HS code or the defaults)
+    rate_type = models.CharField(max_length=10, choices=RATE_TYPE_CHOICES, default='AD_VALOREM')
+    duty_rate = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)  # %
+    specific_rate = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)  # per cm3
+    excise_rate = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)  # %
+    vat_rate = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)  # %
+    customs_fee_rate = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)  # %
+
+    is_active = models.BooleanField(default=True)
+    notes = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
-        return f"{self.search_query[:30]}... - {self.user.phone}"
\ No newline at end of file
+        return f"{self.name} ({self.code_prefix or '*'})"
@@ -0,0 +1,65 @@
+import json
+
+from django.db import connection
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+def approximate_count(queryset, limit):
+    """
+    (count, exact) of a queryset at a bounded cost.
+
+    Up to `limit` rows are counted exactly with COUNT over a LIMIT subquery, so
+    the scan stops after limit + 1 index entries. Above that PostgreSQL's
+    planner estimate is returned; other databases report the limit itself.
+    """
+    queryset = queryset.order_by()
+    count = queryset[:limit + 1].count()
+    if count <= limit:
+        return count, True
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.values('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return max(int(plan[0]['Plan']['Plan Rows']), limit + 1), False
+    return limit, False
+
+
+class UserCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the per-user list endpoints.
+
+    Pages are read by position in (user, created_at, id) order through the
+    matching composite index, so a deep page costs the same as the first one
+    and no COUNT(*) is run. ?count=approx adds a bounded count (see
+    approximate_count) with a count_exact flag. Views whose timestamp field is
+    not created_at set `cursor_ordering`.
+    """
+
+    ordering = ('-created_at', '-id')
+    approx_count_limit = 1000
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, 'cursor_ordering', self.ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get('count') == 'approx':
+            self.count = approximate_count(queryset, self.approx_count_limit)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.count is not None:
+            response['count'], response['count_exact'] = self.count
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema['properties']['count'] = {'type': 'integer', 'nullable': True}
+        schema['properties']['count_exact'] = {'type': 'boolean', 'nullable': True}
+        return schema
@@ -0,0 +1,73 @@
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def _plan(model, serializer):
+    """
+    (select_related paths, [(prefetch path, related model, nested plan)]) that
+    cover the relations a serializer renders.
+
+    Nested serializers over forward or reverse one-to-one / foreign keys are
+    joined, nested list serializers and primary key lists over many-valued
+    relations are prefetched. Relations read by SerializerMethodFields are
+    not seen, so render them with a nested serializer instead.
+    """
+    select = []
+    prefetch = []
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*' or '.' in field.source:
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.is_relation:
+            continue
+        name = field.source
+        related_model = model_field.related_model
+
+        if isinstance(field, serializers.ListSerializer):
+            prefetch.append((name, related_model, _plan(related_model, field.child)))
+        elif isinstance(field, serializers.BaseSerializer):
+            # Single nested object: join it, and reach its own relations through it
+            child_select, child_prefetch = _plan(related_model, field)
+            select.append(name)
+            select.extend(f'{name}__{path}' for path in child_select)
+            prefetch.extend((f'{name}__{path}', child_model, child_plan)
+                            for path, child_model, child_plan in child_prefetch)
+        elif isinstance(field, serializers.ManyRelatedField):
+            prefetch.append((name, None, None))
+    return select, prefetch
+
+
+@lru_cache(maxsize=None)
+def _serializer_plan(model, serializer_class):
+    return _plan(model, serializer_class())
+
+
+def _apply(queryset, plan):
+    select, prefetch = plan
+    if select:
+        queryset = queryset.select_related(*select)
+    for path, related_model, child_plan in prefetch:
+        if related_model is None:
+            queryset = queryset.prefetch_related(path)
+        else:
+            # Prefetch querysets are built per call, so nothing is shared between requests
+            queryset = queryset.prefetch_related(
+                Prefetch(path, queryset=_apply(related_model._default_manager.all(), child_plan))
+            )
+    return queryset
+
+
+def optimized_queryset(queryset, serializer_class):
+    """
+    The queryset with the select_related/Prefetch lookups needed to render it
+    with serializer_class, so a list page costs a fixed number of queries
+    however many rows and nested objects it has
+    """
+    return _apply(queryset, _serializer_plan(queryset.model, serializer_class))
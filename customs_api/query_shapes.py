@@ -0,0 +1,90 @@
+from django.db.models import Count, Q
+
+from .models import (
+    Declaration, ProductItem, CalculationResult, ClassificationSearch, HsCodePrediction, ChatMessage,
+    CurrencyRate, HsCode, UserTemplate
+)
+
+
+class QueryShape:
+    """
+    One query the application runs, copied from the code path named in
+    `source` and filled in from a sample (the busiest user, a stored HS code,
+    ...). The shapes are kept in step with those code paths by hand. The
+    models' Meta.indexes are chosen from their plans; the explain_queries
+    command replays them with and without those indexes.
+    """
+
+    def __init__(self, name, source, build):
+        self.name = name
+        self.source = source
+        self.build = build
+
+    def queryset(self, sample):
+        return self.build(sample)
+
+
+QUERY_SHAPES = [
+    QueryShape(
+        'declarations.page', 'DeclarationViewSet (UserCursorPagination)',
+        lambda s: Declaration.objects.filter(user_id=s['user_id']).order_by('-created_at', '-id')[:21],
+    ),
+    QueryShape(
+        'declarations.pending', 'get_dashboard_data urgent tasks',
+        lambda s: Declaration.objects.filter(user_id=s['user_id'], status='QORALAMA')[:3],
+    ),
+    QueryShape(
+        'declarations.bulk_export', 'BulkExportXmlView.export (status and date filter)',
+        lambda s: Declaration.objects.filter(
+            user_id=s['user_id'], created_at__date__gte=s['since'], status='TASDIQLANGAN'
+        ).order_by('created_at', 'id').values_list('id', flat=True),
+    ),
+    QueryShape(
+        'declarations.kpis', 'dashboard.compute_dashboard_summary',
+        lambda s: Declaration.objects.filter(user_id=s['user_id']).values('user_id').annotate(
+            total=Count('id'), pending=Count('id', filter=Q(status='QORALAMA'))
+        ),
+    ),
+    QueryShape(
+        'product_items.page', 'ProductItemViewSet (UserCursorPagination)',
+        lambda s: ProductItem.objects.filter(user_id=s['user_id']).order_by('-created_at', '-id')[:21],
+    ),
+    QueryShape(
+        'hs_codes.rates', 'utils.get_hs_code_rates (duty calculation)',
+        lambda s: HsCode.objects.filter(code__in=[s['hs_code']]).values_list(
+            'code', 'duty_rate', 'vat_rate', 'excise_rate'
+        ),
+    ),
+    QueryShape(
+        'calculations.recent', 'get_dashboard_data recent calculations',
+        lambda s: CalculationResult.objects.filter(product_item__user_id=s['user_id']).order_by('-calculated_at')[:5],
+    ),
+    QueryShape(
+        'classification_searches.recent', 'get_dashboard_data recent searches',
+        lambda s: ClassificationSearch.objects.filter(user_id=s['user_id']).order_by('-created_at')[:5],
+    ),
+    QueryShape(
+        'hs_predictions.page', 'HsCodePredictionViewSet (UserCursorPagination)',
+        lambda s: HsCodePrediction.objects.filter(user_id=s['user_id']).order_by('-created_at', '-id')[:21],
+    ),
+    QueryShape(
+        'chat_messages.page', 'ChatMessageViewSet (UserCursorPagination)',
+        lambda s: ChatMessage.objects.filter(user_id=s['user_id']).order_by('-timestamp', '-id')[:21],
+    ),
+    QueryShape(
+        'currency_rates.load', 'currency_rates.CurrencyRateCache rate table load',
+        lambda s: CurrencyRate.objects.order_by('code', 'date').values_list('code', 'date', 'rate'),
+    ),
+    QueryShape(
+        'currency_rates.latest_date', 'CurrencyRateViewSet.get_queryset and CurrencyRateCache',
+        lambda s: CurrencyRate.objects.order_by('-date')[:1],
+    ),
+    QueryShape(
+        'currency_rates.latest', 'currency_rates.CurrencyRateCache latest rows',
+        lambda s: CurrencyRate.objects.filter(date=s['rate_date']),
+    ),
+    QueryShape(
+        'user_templates.available', 'get_user_templates (own + public)',
+        lambda s: UserTemplate.objects.filter(Q(user_id=s['user_id']) | Q(is_public=True)),
+    ),
+]
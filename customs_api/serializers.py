@@ -1,9 +1,13 @@
+import uuid
+
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 from .models import (
     User, HsCode, ClassificationRuling, OptimizationTip, ProductItem, ValidationIssue,
     Declaration, AuditResult, CalculationResult, HsCodePrediction, PriceRiskAnalysis,
     ChatMessage, DecisionTreeQuestion, IncotermRecommendation, TradeRouteOption, CurrencyRate,
-    HsCodePassport, UserTemplate, DocumentGeneration, ClassificationSearch
+    HsCodePassport, UserTemplate, DocumentGeneration, ClassificationSearch, ClassificationJob
 )
 
 
@@ -64,55 +68,113 @@ class ProductItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'created_at', 'updated_at']
 
 
+class DeclarationProductSerializer(ProductItemSerializer):
+    """
+    Product line of a declaration. The id is writable so that saving a
+    declaration can match its products; lines without one are new products
+    and get a generated id.
+    """
+    id = serializers.CharField(max_length=50, required=False)
+
+
+class DeclarationAuditSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AuditResult
+        fields = ['id', 'score', 'risk_level', 'summary', 'created_at']
+
+
 class DeclarationSerializer(serializers.ModelSerializer):
-    products = ProductItemSerializer(many=True)
+    products = DeclarationProductSerializer(many=True)
     validation_issues = ValidationIssueSerializer(many=True, read_only=True)
-    audit = serializers.SerializerMethodField()
+    audit = DeclarationAuditSerializer(read_only=True, allow_null=True)  # None until the declaration is audited
 
     class Meta:
         model = Declaration
         fields = '__all__'
         read_only_fields = ['id', 'user', 'created_at', 'updated_at']
 
-    def get_audit(self, obj):
-        try:
-            audit = obj.audit
-            return {
-                'id': audit.id,
-                'score': audit.score,
-                'risk_level': audit.risk_level,
-                'summary': audit.summary,
-                'created_at': audit.created_at
-            }
-        except AuditResult.DoesNotExist:
-            return None
-
     def create(self, validated_data):
         products_data = validated_data.pop('products', [])
-        declaration = Declaration.objects.create(**validated_data)
-        
-        for product_data in products_data:
-            product = ProductItem.objects.create(user=declaration.user, **product_data)
-            declaration.products.add(product)
-        
-        return declaration
+        with transaction.atomic():
+            declaration = Declaration.objects.create(id=uuid.uuid4().hex, **validated_data)
+            self._save_products(declaration, products_data, current={})
+        return self._reload(declaration)
 
     def update(self, instance, validated_data):
         products_data = validated_data.pop('products', None)
         
-        # Update declaration fields
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
+        with transaction.atomic():
+            # Update declaration fields
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+            
+            # Update products if provided
+            if products_data is not None:
+                current = {product.pk: product for product in instance.products.all()}
+                self._save_products(instance, products_data, current)
+        
+        return self._reload(instance)
+
+    def _save_products(self, declaration, products_data, current):
+        """
+        Apply the submitted product lines to the declaration with bulk queries.
+
+        Lines are matched to the declaration's `current` products by id (other
+        ids are rejected): changed products are bulk-updated, new ones
+        bulk-created and linked with one insert into the M2M table, and
+        products left out are unlinked and deleted unless another declaration
+        still uses them.
+        """
+        ids = [data['id'] for data in products_data if data.get('id')]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError({'products': 'Product ids must be unique'})
+        # Ids name this declaration's products; new lines get generated ids.
+        # The error does not say which ids exist elsewhere.
+        if any(product_id not in current for product_id in ids):
+            raise serializers.ValidationError({'products': 'Unknown product id: leave id out for new products'})
         
-        # Update products if provided
-        if products_data is not None:
-            instance.products.clear()
-            for product_data in products_data:
-                product = ProductItem.objects.create(user=instance.user, **product_data)
-                instance.products.add(product)
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        update_fields = set()
+        kept = set()
+        for data in products_data:
+            data = dict(data)
+            product_id = data.pop('id', None)
+            product = current.get(product_id)
+            if product is None:
+                to_create.append(ProductItem(id=uuid.uuid4().hex, user_id=declaration.user_id, **data))
+                continue
+            kept.add(product.pk)
+            changed = [field for field, value in data.items() if getattr(product, field) != value]
+            if changed:
+                for field in changed:
+                    setattr(product, field, data[field])
+                # bulk_update does not apply auto_now
+                product.updated_at = now
+                update_fields.update(changed)
+                to_update.append(product)
         
-        return instance
+        through = Declaration.products.through
+        removed = [pk for pk in current if pk not in kept]
+        if removed:
+            through.objects.filter(declaration_id=declaration.pk, productitem_id__in=removed).delete()
+            ProductItem.objects.filter(pk__in=removed, declarations__isnull=True).delete()
+        if to_update:
+            ProductItem.objects.bulk_update(to_update, sorted(update_fields) + ['updated_at'], batch_size=500)
+        if to_create:
+            ProductItem.objects.bulk_create(to_create, batch_size=500)
+            through.objects.bulk_create(
+                [through(declaration_id=declaration.pk, productitem_id=product.pk) for product in to_create],
+                batch_size=500,
+            )
+
+    def _reload(self, declaration):
+        # Fresh instance with its relations prefetched for the response
+        from .prefetching import optimized_queryset
+
+        return optimized_queryset(Declaration.objects.filter(pk=declaration.pk), type(self)).get()
 
 
 class AuditResultSerializer(serializers.ModelSerializer):
@@ -129,6 +191,13 @@ class HsCodePredictionSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class ClassificationJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ClassificationJob
+        fields = ['id', 'query', 'status', 'results', 'error', 'created_at', 'finished_at']
+        read_only_fields = fields
+
+
 class ChatMessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ChatMessage
@@ -0,0 +1,62 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import HsCode, Declaration, ProductItem, CalculationResult, TariffRule, CurrencyRate
+from .hs_search import get_search_backend
+from .dashboard import schedule_snapshot_refresh, snapshots_enabled
+from .tariff import tariff_engine
+from .currency_rates import currency_rate_cache
+
+
+@receiver(post_save, sender=HsCode)
+def update_hs_code_search_index(sender, instance, **kwargs):
+    """Keep the HS code full-text index in sync with saved rows (once committed)"""
+    transaction.on_commit(lambda: get_search_backend().index(instance))
+
+
+@receiver(post_delete, sender=HsCode)
+def remove_from_hs_code_search_index(sender, instance, **kwargs):
+    """Drop deleted HS codes from the full-text index (once committed)"""
+    pk = instance.pk
+    transaction.on_commit(lambda: get_search_backend().remove(pk))
+
+
+@receiver(post_save, sender=TariffRule)
+@receiver(post_delete, sender=TariffRule)
+def reload_tariff_rules(sender, instance, **kwargs):
+    """Recompile the tariff rule table after any rule change (once committed)"""
+    transaction.on_commit(tariff_engine.changed)
+
+
+@receiver(post_save, sender=CurrencyRate)
+@receiver(post_delete, sender=CurrencyRate)
+def reload_currency_rates(sender, instance, **kwargs):
+    """Drop the in-process currency rate cache after any rate change (once committed)"""
+    transaction.on_commit(currency_rate_cache.changed)
+
+
+@receiver(post_save, sender=Declaration)
+@receiver(post_delete, sender=Declaration)
+@receiver(post_save, sender=ProductItem)
+@receiver(post_delete, sender=ProductItem)
+def refresh_dashboard_on_change(sender, instance, **kwargs):
+    """Keep the owner's DashboardSnapshot up to date"""
+    schedule_snapshot_refresh(instance.user_id)
+
+
+@receiver(post_save, sender=CalculationResult)
+@receiver(post_delete, sender=CalculationResult)
+def refresh_dashboard_on_calculation_change(sender, instance, **kwargs):
+    """Duty totals on the dashboard come from calculation results"""
+    if not snapshots_enabled():
+        return
+    user_id = ProductItem.objects.filter(pk=instance.product_item_id).values_list('user_id', flat=True).first()
+    schedule_snapshot_refresh(user_id)
+
+
+@receiver(m2m_changed, sender=Declaration.products.through)
+def refresh_dashboard_on_products_change(sender, instance, action, **kwargs):
+    """Products added to/removed from a declaration change its monthly duty total"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        schedule_snapshot_refresh(instance.user_id)
@@ -0,0 +1,154 @@
+import copy
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls that share a key: the first caller (leader)
+    runs the function, the others wait for it and receive its result.
+
+    settings.HS_CLASSIFICATION_SINGLE_FLIGHT['MODE'] selects how far the
+    deduplication reaches:
+        'process' - threads of this process only
+        'file'    - also across processes on one host (fcntl lock files)
+        'db'      - also across hosts (row lock on ClassificationLock; needs a
+                    database with SELECT ... FOR UPDATE such as PostgreSQL or
+                    MySQL and is refused on SQLite). The leader keeps a
+                    transaction, and so a connection, open for the whole
+                    model call.
+    The cross-process modes hash keys onto a fixed set of LOCK_STRIPES lock
+    files/rows, so their number stays bounded; different keys that share a
+    stripe wait for each other. The leader re-checks `recheck()` (normally
+    the shared result cache) after acquiring the lock, so a lookup finished
+    by another process is not repeated.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._counters = {'calls': 0, 'executions': 0, 'coalesced': 0, 'lock_rechecks': 0, 'timeouts': 0}
+
+    def _config(self):
+        return getattr(settings, 'HS_CLASSIFICATION_SINGLE_FLIGHT', {})
+
+    def do(self, key, fn, recheck=None):
+        with self._lock:
+            self._counters['calls'] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._counters['coalesced'] += 1
+
+        if not leader:
+            if call.event.wait(self._config().get('TIMEOUT', 60)):
+                if call.error is not None:
+                    raise call.error
+                return copy.deepcopy(call.result)
+            # The leader is taking too long, do the work ourselves
+            with self._lock:
+                self._counters['timeouts'] += 1
+            return self._execute(key, fn, recheck)
+
+        try:
+            call.result = self._execute(key, fn, recheck)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['in_flight'] = len(self._calls)
+        stats['mode'] = self._mode()
+        return stats
+
+    def _mode(self):
+        mode = self._config().get('MODE', 'process')
+        if mode == 'file' and fcntl is None:
+            return 'process'
+        return mode
+
+    def _execute(self, key, fn, recheck):
+        mode = self._mode()
+        if mode == 'file':
+            lock = self._file_lock(key)
+        elif mode == 'db':
+            lock = self._db_lock(key)
+        else:
+            lock = None
+
+        if lock is None:
+            return self._run(fn)
+
+        with lock:
+            if recheck is not None:
+                result = recheck()
+                if result is not None:
+                    with self._lock:
+                        self._counters['lock_rechecks'] += 1
+                    return result
+            return self._run(fn)
+
+    def _run(self, fn):
+        with self._lock:
+            self._counters['executions'] += 1
+        return fn()
+
+    def _stripe(self, key):
+        stripes = self._config().get('LOCK_STRIPES', 256)
+        return int(hashlib.sha1(key.encode('utf-8')).hexdigest(), 16) % stripes
+
+    @contextmanager
+    def _file_lock(self, key):
+        lock_dir = self._config().get('LOCK_DIR') or os.path.join(settings.BASE_DIR, 'cache', 'locks')
+        os.makedirs(lock_dir, exist_ok=True)
+        with open(os.path.join(lock_dir, f'stripe-{self._stripe(key)}.lock'), 'a+') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def _db_lock(self, key):
+        from .models import ClassificationLock
+
+        if connection.vendor == 'sqlite':
+            # SQLite ignores SELECT ... FOR UPDATE, so nothing would be locked
+            raise ImproperlyConfigured("Single-flight 'db' mode needs PostgreSQL or MySQL; use 'file' on SQLite")
+        lock_key = f'stripe-{self._stripe(key)}'
+        ClassificationLock.objects.get_or_create(key=lock_key)
+        with transaction.atomic():
+            ClassificationLock.objects.select_for_update().get(key=lock_key)
+            yield
+
+
+single_flight = SingleFlight()
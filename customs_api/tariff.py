@@ -0,0 +1,202 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+
+
+# Rates used when neither a tariff rule nor the HS code sets them
+DEFAULT_RATES = {
+    'duty_rate': Decimal('10.00'),
+    'vat_rate': Decimal('12.00'),
+    'excise_rate': Decimal('0.00'),
+    'customs_fee_rate': Decimal('0.20'),
+}
+
+# Bumped on every TariffRule change so that other processes reload their table
+VERSION_CACHE_KEY = 'tariff-rules:version'
+# Seconds between version stamp checks
+VERSION_CHECK_INTERVAL = 1.0
+
+# Fields a rule may set independently of each other. The duty is one unit
+# (rate type + ad valorem + specific rate), so a rule that zeroes the duty also
+# drops a specific rate set by a lower rule.
+_RATE_FIELDS = ('excise_rate', 'vat_rate', 'customs_fee_rate')
+
+
+def normalize_code(code):
+    return ''.join(ch for ch in str(code or '') if ch.isdigit())
+
+
+class _CompiledRule:
+    __slots__ = ('name', 'code_prefix', 'precedence', 'conditions', 'sets_duty', 'rate_type',
+                 'duty_rate', 'specific_rate', 'rates')
+
+    def __init__(self, rule):
+        self.name = rule.name
+        self.code_prefix = normalize_code(rule.code_prefix)
+
+        conditions = []
+        if rule.product_type:
+            conditions.append(lambda c, v=rule.product_type: c['product_type'] == v)
+        if rule.mode:
+            conditions.append(lambda c, v=rule.mode: c['mode'] == v)
+        if rule.origin:
+            conditions.append(lambda c, v=rule.origin: c['origin'] == v)
+        if rule.has_certificate is not None:
+            conditions.append(lambda c, v=rule.has_certificate: bool(c['has_certificate']) == v)
+        if rule.min_engine_volume is not None:
+            # Exclusive: "above 3000 cm3" is min_engine_volume=3000, and (min, max] ranges chain without gaps
+            conditions.append(lambda c, v=rule.min_engine_volume: c['engine_volume'] > v)
+        if rule.max_engine_volume is not None:
+            conditions.append(lambda c, v=rule.max_engine_volume: c['engine_volume'] <= v)
+        if rule.min_age is not None:
+            conditions.append(lambda c, v=rule.min_age: c['age'] is not None and c['age'] >= v)
+        if rule.max_age is not None:
+            conditions.append(lambda c, v=rule.max_age: c['age'] is not None and c['age'] <= v)
+        self.conditions = tuple(conditions)
+
+        # Higher priority first, then the longer prefix, then the more specific rule
+        self.precedence = (rule.priority, len(self.code_prefix), len(conditions))
+
+        self.sets_duty = rule.duty_rate is not None or rule.specific_rate is not None
+        self.rate_type = rule.rate_type
+        self.duty_rate = rule.duty_rate if rule.duty_rate is not None else Decimal('0.00')
+        self.specific_rate = rule.specific_rate if rule.specific_rate is not None else Decimal('0.00')
+        self.rates = {field: getattr(rule, field) for field in _RATE_FIELDS if getattr(rule, field) is not None}
+
+    def matches(self, context):
+        return all(condition(context) for condition in self.conditions)
+
+
+class _Node:
+    __slots__ = ('children', 'rules')
+
+    def __init__(self):
+        self.children = {}
+        self.rules = []
+
+
+class TariffMatch:
+    """
+    Outcome of a tariff lookup: the resolved rates, the rule that fired (the
+    highest-precedence matching rule) and every rule that contributed a rate
+    """
+
+    __slots__ = ('rule', 'applied_rules', 'rate_type', 'duty_rate', 'specific_rate',
+                 'excise_rate', 'vat_rate', 'customs_fee_rate')
+
+    def __init__(self, rule, applied_rules, rates):
+        self.rule = rule
+        self.applied_rules = applied_rules
+        for field, value in rates.items():
+            setattr(self, field, value)
+
+
+class TariffEngine:
+    """
+    TariffRule table compiled into a trie keyed on HS code digits.
+
+    A lookup walks the code once, collecting the rules stored on the prefixes
+    it passes whose conditions match. Matching rules are ranked by (priority,
+    prefix length, number of conditions); each rate comes from the best rule
+    that sets it, then from the HS code, then from DEFAULT_RATES.
+
+    The table is reloaded after any TariffRule change: in this process through
+    the model signals, in other processes through the version stamp kept in
+    the default cache (checked at most every VERSION_CHECK_INTERVAL seconds).
+    The stamp only reaches other processes when CACHES['default'] is shared
+    (Redis, Memcached, database); with the per-process LocMemCache a worker
+    sees rule changes made elsewhere only after a restart.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._root = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def load(self):
+        from .models import TariffRule
+
+        version = cache.get(VERSION_CACHE_KEY, 0)
+        root = _Node()
+        for rule in TariffRule.objects.filter(is_active=True):
+            compiled = _CompiledRule(rule)
+            node = root
+            for digit in compiled.code_prefix:
+                node = node.children.setdefault(digit, _Node())
+            node.rules.append(compiled)
+
+        with self._lock:
+            self._root = root
+            self._version = version
+            self._checked_at = time.monotonic()
+        return root
+
+    def invalidate(self):
+        with self._lock:
+            self._root = None
+
+    def changed(self):
+        """
+        Drop the compiled table here and tell other processes to do the same
+        """
+        self.invalidate()
+        try:
+            cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            cache.set(VERSION_CACHE_KEY, 1, None)
+
+    def ensure_loaded(self):
+        root = self._root
+        if root is not None and time.monotonic() - self._checked_at < VERSION_CHECK_INTERVAL:
+            return root
+        if root is None or cache.get(VERSION_CACHE_KEY, 0) != self._version:
+            # Return the trie built here: self._root may be invalidated again meanwhile
+            return self.load()
+        self._checked_at = time.monotonic()
+        return root
+
+    def lookup(self, hs_code, context, base_rates=None):
+        """
+        Resolve the rates for one product line.
+
+        context: product_type, mode, origin, has_certificate, engine_volume (Decimal), age (int or None)
+        base_rates: the HS code's duty_rate/vat_rate/excise_rate, if the code is known
+        """
+        node = self.ensure_loaded()
+
+        matched = [rule for rule in node.rules if rule.matches(context)]
+        for digit in normalize_code(hs_code):
+            node = node.children.get(digit)
+            if node is None:
+                break
+            matched.extend(rule for rule in node.rules if rule.matches(context))
+        matched.sort(key=lambda rule: rule.precedence, reverse=True)
+
+        rates = dict(DEFAULT_RATES)
+        if base_rates:
+            rates.update({field: value for field, value in base_rates.items() if value is not None})
+        rates['rate_type'] = 'AD_VALOREM'
+        rates['specific_rate'] = Decimal('0.00')
+
+        applied = []
+        duty_rule = next((rule for rule in matched if rule.sets_duty), None)
+        if duty_rule is not None:
+            rates['rate_type'] = duty_rule.rate_type
+            rates['duty_rate'] = duty_rule.duty_rate
+            rates['specific_rate'] = duty_rule.specific_rate
+            applied.append(duty_rule.name)
+        for field in _RATE_FIELDS:
+            rule = next((rule for rule in matched if field in rule.rates), None)
+            if rule is not None:
+                rates[field] = rule.rates[field]
+                if rule.name not in applied:
+                    applied.append(rule.name)
+
+        fired = matched[0].name if matched else None
+        return TariffMatch(fired, applied, rates)
+
+
+tariff_engine = TariffEngine()
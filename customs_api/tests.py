@@ -0,0 +1,767 @@
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .dashboard import compute_dashboard_summary
+from .single_flight import SingleFlight
+from .tariff import TariffEngine
+from .models import (
+    User, ProductItem, ValidationIssue, Declaration, AuditResult, CalculationResult, PriceRiskAnalysis,
+    CurrencyRate, HsCode, ClassificationJob, HsCodePrediction, DashboardSnapshot, TariffRule
+)
+from .ai_cache import classification_cache
+from .currency_rates import currency_rate_cache
+from .ai_jobs import ImmediateJobQueue, ThreadPoolJobQueue
+from .ai_clients import FakeModelClient
+from .hs_import import (
+    HsCodeImporter, iter_info_txt_records, iter_json_records, parse_certificates, parse_rate
+)
+from .hs_index import hs_code_index
+from .hs_search import FTS_TABLE, SQLiteFTS5Backend, MemorySearchBackend
+from .xml_export import generate_declarations_zip, get_export_progress
+from .utils import (
+    calculate_customs_duties, calculate_customs_duties_batch, classify_hs_code_with_ai, DEFAULT_EXCHANGE_RATE
+)
+
+
+class ListQueryCountTests(TestCase):
+    """
+    List pages are built with prefetching.optimized_queryset, so a page costs
+    the same number of queries however many rows and nested objects it has
+    """
+
+    # Page query (with the audit joined), products with their calculation and
+    # price risk analysis, the products' validation issues, the declarations'
+    # validation issues
+    DECLARATION_LIST_QUERIES = 4
+    # Page query (with calculation and price risk analysis joined), validation issues
+    PRODUCT_ITEM_LIST_QUERIES = 2
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='lister', phone='+998900000001', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.created = 0
+
+    def create_declarations(self, count, products_per_declaration=3):
+        for _ in range(count):
+            self.created += 1
+            declaration = Declaration.objects.create(
+                id=f'D{self.created}',
+                contract_number=f'C-{self.created}',
+                invoice_date=date(2024, 1, 1),
+                partner_name='Partner',
+                user=self.user
+            )
+            products = ProductItem.objects.bulk_create([
+                ProductItem(id=f'D{self.created}P{i}', name='Product', hs_code='0101210000', user=self.user)
+                for i in range(products_per_declaration)
+            ])
+            declaration.products.add(*products)
+            for product in products:
+                CalculationResult.objects.create(product_item=product)
+                PriceRiskAnalysis.objects.create(product_item=product, risk_level='LOW', average_price=1, message='OK')
+                product.validation_issues.create(type='INFO', message='Checked')
+            AuditResult.objects.create(declaration=declaration, score=90, risk_level='LOW', summary='OK')
+            declaration.validation_issues.add(ValidationIssue.objects.create(type='INFO', message='Checked'))
+
+    def test_declaration_list_query_count(self):
+        self.create_declarations(2)
+        with self.assertNumQueries(self.DECLARATION_LIST_QUERIES):
+            response = self.client.get('/api/declarations/')
+        self.assertEqual(len(response.json()['results']), 2)
+
+        self.create_declarations(18, products_per_declaration=10)
+        with self.assertNumQueries(self.DECLARATION_LIST_QUERIES):
+            response = self.client.get('/api/declarations/')
+        results = response.json()['results']
+        self.assertEqual(len(results), 20)
+        self.assertIsNotNone(results[0]['audit'])
+        self.assertEqual(len(results[0]['products']), 10)
+
+    def test_product_item_list_query_count(self):
+        self.create_declarations(1)
+        with self.assertNumQueries(self.PRODUCT_ITEM_LIST_QUERIES):
+            response = self.client.get('/api/product-items/')
+        self.assertEqual(len(response.json()['results']), 3)
+
+        self.create_declarations(5, products_per_declaration=10)
+        with self.assertNumQueries(self.PRODUCT_ITEM_LIST_QUERIES):
+            response = self.client.get('/api/product-items/')
+        results = response.json()['results']
+        self.assertEqual(len(results), 20)
+        self.assertIsNotNone(results[0]['calculation'])
+        self.assertEqual(len(results[0]['validation_issues']), 1)
+
+    def assert_compact_matches_full(self, url):
+        full = self.client.get(url).json()['results']
+        compact = self.client.get(url, {'view': 'compact'}).json()['results']
+        self.assertEqual(len(compact), len(full))
+        for compact_row, full_row in zip(compact, full):
+            if 'product_count' in compact_row:
+                self.assertEqual(compact_row.pop('product_count'), len(full_row['products']))
+            self.assertEqual(compact_row, {name: full_row[name] for name in compact_row})
+
+    def test_compact_rows_match_the_serializers(self):
+        self.create_declarations(2)
+        ProductItem.objects.filter(user=self.user).update(
+            quantity=Decimal('2.5'), netto=Decimal('10.125'), price=Decimal('1999.99'), origin_country='CN'
+        )
+        Declaration.objects.filter(user=self.user).update(total_value=Decimal('1234.50'), invoice_number='INV-1')
+        self.assert_compact_matches_full('/api/declarations/')
+        self.assert_compact_matches_full('/api/product-items/')
+        # Datetimes are rendered in the current time zone
+        with override_settings(TIME_ZONE='Asia/Tashkent'):
+            self.assert_compact_matches_full('/api/declarations/')
+            self.assert_compact_matches_full('/api/product-items/')
+
+
+class DeclarationProductsWriteTests(TestCase):
+    """
+    Nested product lines are written with bulk queries and matched by id
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', phone='+998900000006', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def payload(self, products):
+        return {'contract_number': 'C-1', 'invoice_date': '2024-01-01', 'partner_name': 'Partner', 'products': products}
+
+    def line(self, name, **fields):
+        return {'name': name, 'hs_code': '0101210000', **fields}
+
+    def create(self, count):
+        response = self.client.post(
+            '/api/declarations/', self.payload([self.line(f'Product {i}') for i in range(count)]), format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+    def put(self, declaration, products):
+        return self.client.put(f"/api/declarations/{declaration['id']}/", self.payload(products), format='json')
+
+    def test_create_generates_product_ids(self):
+        declaration = self.create(2)
+        ids = [product['id'] for product in declaration['products']]
+        self.assertEqual(len(set(ids)), 2)
+        self.assertEqual(set(ProductItem.objects.filter(user=self.user).values_list('pk', flat=True)), set(ids))
+
+    def test_update_changes_adds_and_removes_products(self):
+        declaration = self.create(3)
+        kept, removed, _ = declaration['products']
+        response = self.put(declaration, [
+            {'id': kept['id'], **self.line('Renamed')},
+            self.line('New product'),
+        ])
+        self.assertEqual(response.status_code, 200, response.content)
+        names = sorted(product['name'] for product in response.json()['products'])
+        self.assertEqual(names, ['New product', 'Renamed'])
+        self.assertFalse(ProductItem.objects.filter(pk=removed['id']).exists())
+
+    def test_removed_product_shared_with_another_declaration_is_kept(self):
+        declaration = self.create(2)
+        shared = declaration['products'][0]['id']
+        other = Declaration.objects.create(
+            id='OTHER', contract_number='C-2', invoice_date=date(2024, 1, 1), partner_name='Partner', user=self.user
+        )
+        other.products.add(shared)
+        response = self.put(declaration, [self.line('Only product')])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(list(other.products.values_list('pk', flat=True)), [shared])
+        self.assertEqual(ProductItem.objects.filter(user=self.user).count(), 2)
+
+    def test_ids_of_other_products_are_rejected_without_listing_them(self):
+        stranger = User.objects.create_user(username='stranger', phone='+998900000007', password='secret')
+        ProductItem.objects.create(id='FOREIGN', name='Theirs', hs_code='0101210000', user=stranger)
+        declaration = self.create(1)
+        for product_id in ('FOREIGN', 'MISSING'):
+            response = self.put(declaration, [{'id': product_id, **self.line('Mine')}])
+            self.assertEqual(response.status_code, 400)
+            self.assertNotIn(product_id, response.content.decode())
+        self.assertEqual(ProductItem.objects.get(pk='FOREIGN').name, 'Theirs')
+
+    def test_update_query_count_does_not_grow_with_products(self):
+        def queries_for_update(count):
+            declaration = self.create(count)
+            products = [{'id': product['id'], **self.line('Renamed')} for product in declaration['products'][1:]]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.put(declaration, products + [self.line('New')] * count)
+            self.assertEqual(response.status_code, 200, response.content)
+            return len(queries)
+
+        self.assertEqual(queries_for_update(2), queries_for_update(30))
+
+
+class CbuFixtureHandler(BaseHTTPRequestHandler):
+    """
+    Stands in for the CBU JSON feed: `/` is today's rates (FIXTURE_TODAY) and
+    `/all/YYYY-MM-DD/` the rates of a date. Rates rise by 10 per day; IRR is
+    quoted per 10 units like the real feed.
+    """
+
+    FIXTURE_TODAY = date(2025, 1, 10)
+    CURRENCIES = [('USD', '840', 12000, 1), ('EUR', '978', 13000, 1), ('IRR', '364', 3, 10)]
+
+    def do_GET(self):
+        match = re.fullmatch(r'/all/(\d{4}-\d{2}-\d{2})/', self.path)
+        if match is None and self.path != '/':
+            self.send_error(404)
+            return
+        day = date.fromisoformat(match.group(1)) if match else self.FIXTURE_TODAY
+        offset = (day - date(2025, 1, 1)).days
+        records = [
+            {
+                'Ccy': code, 'Code': number, 'CcyNm_UZ': f'{code} (uz)', 'CcyNm_EN': code,
+                'Nominal': str(nominal), 'Rate': f'{base + offset * 10:.2f}', 'Diff': '10.00',
+                'Date': day.strftime('%d.%m.%Y'),
+            }
+            for code, number, base, nominal in self.CURRENCIES
+        ]
+        body = json.dumps(records).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SyncCurrencyRatesTests(TestCase):
+    """
+    sync_currency_rates against a local fixture server instead of cbu.uz
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), CbuFixtureHandler)
+        cls.url = f'http://127.0.0.1:{cls.server.server_address[1]}/'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def sync(self, *args):
+        call_command('sync_currency_rates', '--url', self.url, *args, stdout=StringIO())
+
+    def test_sync_today(self):
+        self.sync()
+        rates = {rate.code: rate for rate in CurrencyRate.objects.all()}
+        self.assertEqual(set(rates), {'USD', 'EUR', 'IRR'})
+        self.assertEqual(rates['USD'].date, CbuFixtureHandler.FIXTURE_TODAY)
+        self.assertEqual(rates['USD'].rate, Decimal('12090.0000'))
+        self.assertEqual(rates['USD'].name, 'USD (uz)')
+        # Quoted per 10 units, stored per unit
+        self.assertEqual(rates['IRR'].rate, Decimal('9.3000'))
+        # No earlier stored rate: the feed's own Diff is used
+        self.assertEqual(rates['USD'].diff, Decimal('10.0000'))
+        self.assertEqual(rates['USD'].trend, 'up')
+
+    def test_backfill_range_computes_diff_against_previous_day(self):
+        CurrencyRate.objects.create(code='USD', name='USD', rate=Decimal('12100'), date=date(2024, 12, 31))
+        self.sync('--from', '2025-01-01', '--to', '2025-01-03', '--workers', '2')
+
+        usd = list(CurrencyRate.objects.filter(code='USD', date__gte=date(2025, 1, 1)).order_by('date'))
+        self.assertEqual([rate.date.day for rate in usd], [1, 2, 3])
+        self.assertEqual([rate.rate for rate in usd], [Decimal('12000'), Decimal('12010'), Decimal('12020')])
+        # The first imported day is compared with the last stored rate before the range
+        self.assertEqual(usd[0].diff, Decimal('-100'))
+        self.assertEqual(usd[0].trend, 'down')
+        self.assertEqual(usd[1].diff, Decimal('10'))
+        self.assertEqual(usd[1].trend, 'up')
+        self.assertEqual(CurrencyRate.objects.filter(date__gte=date(2025, 1, 1)).count(), 9)
+
+    def test_rerun_is_idempotent(self):
+        self.sync('--date', '2025-01-05')
+        self.sync('--date', '2025-01-05')
+        self.assertEqual(CurrencyRate.objects.count(), 3)
+        self.assertEqual(CurrencyRate.objects.get(code='EUR').rate, Decimal('13040'))
+
+    def test_dry_run_writes_nothing(self):
+        self.sync('--dry-run')
+        self.assertFalse(CurrencyRate.objects.exists())
+
+
+class SQLiteFTS5BackendTests(TestCase):
+    def setUp(self):
+        if connection.vendor != 'sqlite' or FTS_TABLE not in connection.introspection.table_names():
+            self.skipTest('SQLite FTS5 table is not available')
+        for code, description in [
+            ('0101210000', 'Naslli toza otlar'),
+            ('0101290000', 'Boshqa otlar'),
+            ('0102210000', 'Naslli toza qoramol'),
+        ]:
+            HsCode.objects.create(code=code, description_uz=description)
+        SQLiteFTS5Backend().rebuild()
+
+    def search(self, query):
+        return [record['code'] for record, score in SQLiteFTS5Backend().search(query)]
+
+    def test_code_query_with_separators_is_one_prefix(self):
+        self.assertEqual(self.search('0101 21'), ['0101210000'])
+        self.assertEqual(self.search('0101.2'), ['0101210000', '0101290000'])
+        self.assertEqual(self.search('01'), ['0101210000', '0101290000', '0102210000'])
+
+    def test_text_query_matches_every_token(self):
+        self.assertEqual(self.search('naslli ot'), ['0101210000'])
+
+
+class HsCodeIndexSignalTests(TestCase):
+    """
+    The in-memory index follows HsCode saves and deletes only once they commit
+    """
+
+    def setUp(self):
+        patcher = mock.patch('customs_api.hs_search._backend', MemorySearchBackend())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(hs_code_index.invalidate)
+        hs_code_index.load()
+
+    def search(self, query):
+        return [record['code'] for record, score in hs_code_index.search(query)]
+
+    def test_committed_save_and_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            hs_code = HsCode.objects.create(code='0101210000', description_uz='Naslli toza otlar')
+        self.assertEqual(self.search('naslli'), ['0101210000'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            hs_code.delete()
+        self.assertEqual(self.search('naslli'), [])
+
+    def test_rolled_back_save_is_not_indexed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    HsCode.objects.create(code='0101210000', description_uz='Naslli toza otlar')
+                    raise RuntimeError('rollback')
+        self.assertEqual(self.search('naslli'), [])
+        self.assertEqual(self.search('0101'), [])
+
+
+class BatchExchangeRateTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for day, rate in [(1, '12000'), (5, '12100')]:
+                CurrencyRate.objects.create(code='USD', name='USD', rate=Decimal(rate), date=date(2025, 1, day))
+
+    def calculate(self, **line):
+        line = {'hs_code': '0101210000', 'price': '100', 'quantity': '1', 'currency': 'USD', **line}
+        return calculate_customs_duties_batch([line])['lines'][0]
+
+    def test_rate_date_is_the_date_of_the_rate_used(self):
+        result = self.calculate(invoice_date='2025-01-03')
+        self.assertEqual(result['exchange_rate'], 12000.0)
+        self.assertEqual(result['rate_date'], '2025-01-01')
+
+        result = self.calculate()
+        self.assertEqual(result['exchange_rate'], 12100.0)
+        self.assertEqual(result['rate_date'], '2025-01-05')
+
+    def test_no_rate_by_the_invoice_date_uses_the_default(self):
+        result = self.calculate(invoice_date='2024-12-31')
+        self.assertFalse(result['exchange_rate_found'])
+        self.assertEqual(result['exchange_rate'], float(DEFAULT_EXCHANGE_RATE))
+        self.assertIsNone(result['rate_date'])
+
+    def test_rate_change_is_picked_up_once_committed(self):
+        self.assertEqual(currency_rate_cache.get_rate('USD'), Decimal('12100'))
+        with self.captureOnCommitCallbacks(execute=True):
+            CurrencyRate.objects.create(code='USD', name='USD', rate=Decimal('12200'), date=date(2025, 1, 9))
+            # Not committed yet: lookups keep using the cached table
+            self.assertEqual(currency_rate_cache.get_rate('USD'), Decimal('12100'))
+        self.assertEqual(currency_rate_cache.get_rate('USD'), Decimal('12200'))
+
+
+class TariffRuleTests(TestCase):
+    """
+    Rules seeded by migration 0007 reproduce the rates that used to be hard-coded
+    """
+
+    def duty(self, engine_volume):
+        result = calculate_customs_duties({
+            'hs_code': '8703230000', 'price': '10000', 'quantity': '1', 'currency': 'USD',
+            'product_type': 'AUTO', 'engine_volume': engine_volume, 'manufacture_year': date.today().year,
+        })
+        return result['tariff_rule'], result['duty_rate'], result['excise_rate']
+
+    def test_large_engine_rule_starts_above_3000(self):
+        self.assertEqual(self.duty('3000'), ('auto-new', 15.0, 0.0))
+        self.assertEqual(self.duty('3000.005'), ('auto-new-large-engine', 30.0, 20.0))
+        self.assertEqual(self.duty('3500'), ('auto-new-large-engine', 30.0, 20.0))
+
+    def test_rule_change_is_picked_up_once_committed(self):
+        self.duty('3500')
+        with self.captureOnCommitCallbacks(execute=True):
+            TariffRule.objects.filter(name='auto-new-large-engine').update(duty_rate=Decimal('35.00'))
+            TariffRule.objects.get(name='auto-new-large-engine').save()
+            # Not committed yet: the compiled table is still in use
+            self.assertEqual(self.duty('3500'), ('auto-new-large-engine', 30.0, 20.0))
+        self.assertEqual(self.duty('3500'), ('auto-new-large-engine', 35.0, 20.0))
+
+    def test_ensure_loaded_returns_the_trie_it_built(self):
+        engine = TariffEngine()
+        original_load = engine.load
+
+        def load_then_invalidate():
+            root = original_load()
+            engine.invalidate()  # A concurrent change lands right after the load
+            return root
+
+        with mock.patch.object(engine, 'load', load_then_invalidate):
+            self.assertIsNotNone(engine.ensure_loaded())
+
+
+class HsImportTests(TestCase):
+    INFO_TXT = (
+        'HS Code\tNomi\tНазвание\tKategoriya\tSubkategoriya\tKalit so\'zlar\tBoj\tQQS\tAksiz\tSertifikatlar\n'
+        '01 BO\'LIM. TIRIK HAYVONLAR\n'
+        '0101 21 000 0\tOtlar\tЛошади\tHayvonlar\tOtlar\tot\t5\t12\t0\t["Veterinariya sertifikati"]\n'
+        '0101290000\t\tEshaklar\tОслы\tHayvonlar\tEshaklar\teshak\t10\t12\t[CITES]\n'
+        '01012\tQisqa kod\n'
+    )
+
+    def parse_info_txt(self, text):
+        errors = []
+        records = list(iter_info_txt_records(StringIO(text), on_error=lambda line, message: errors.append(line)))
+        return records, errors
+
+    def test_info_txt_layouts(self):
+        records, errors = self.parse_info_txt(self.INFO_TXT)
+        self.assertEqual(errors, [5])
+        horses, donkeys = records
+        self.assertEqual(horses['code'], '0101210000')
+        self.assertEqual((horses['duty_rate'], horses['vat_rate']), (Decimal('5.00'), Decimal('12.00')))
+        self.assertEqual(horses['required_certs'], ['Veterinariya sertifikati'])
+        # Runs of tabs collapse; 9 columns means there is no excise column
+        self.assertEqual((donkeys['description_uz'], donkeys['description_ru']), ('Eshaklar', 'Ослы'))
+        self.assertEqual((donkeys['excise_rate'], donkeys['required_certs']), (Decimal('0.00'), ['CITES']))
+
+    def test_rates_and_certificates(self):
+        self.assertEqual(parse_rate('Maxsus stavka'), Decimal('0.00'))
+        self.assertEqual(parse_rate(' 7.5 '), Decimal('7.50'))
+        self.assertEqual(parse_certificates("['A', 'B']"), ['A', 'B'])
+        self.assertEqual(parse_certificates('Sertifikat'), ['Sertifikat'])
+        self.assertEqual(parse_certificates(''), [])
+
+    def test_json_array_is_read_across_chunks(self):
+        items = [{'code': f'01012{i:05d}', 'description_uz': 'Ot ' * 10} for i in range(20)]
+        self.assertEqual(list(iter_json_records(StringIO(json.dumps(items)), read_size=16)), items)
+        with self.assertRaises(ValueError):
+            list(iter_json_records(StringIO(json.dumps(items)[:-20]), read_size=16))
+
+    def test_duplicate_codes_last_wins(self):
+        importer = HsCodeImporter(source='test', chunk_size=1)
+        stats = importer.run([
+            {'code': '0101210000', 'description_uz': 'Otlar', 'duty_rate': '5'},
+            {'code': '0101290000', 'description_uz': 'Eshaklar'},
+            {'code': '0101210000', 'description_uz': 'Zotli otlar'},
+        ])
+        self.assertEqual((stats['created'], stats['duplicates']), (2, 1))
+        horses = HsCode.objects.get(code='0101210000')
+        self.assertEqual((horses.description_uz, horses.duty_rate), ('Zotli otlar', Decimal('5.00')))
+
+    def test_dry_run_reports_changes_and_rolls_back(self):
+        HsCode.objects.create(code='0101210000', description_uz='Otlar', duty_rate=Decimal('5.00'), sources=['test'])
+        records = [
+            {'code': '0101210000', 'description_uz': 'Otlar', 'duty_rate': '5'},
+            {'code': '0101290000', 'description_uz': 'Eshaklar'},
+            {'code': '123', 'description_uz': 'Invalid'},
+        ]
+        stats = HsCodeImporter(source='test', dry_run=True).run(records)
+        self.assertEqual((stats['created'], stats['unchanged'], stats['errors']), (1, 1, 1))
+        self.assertEqual(list(HsCode.objects.values_list('code', flat=True)), ['0101210000'])
+
+
+class OfflineModelMixin:
+    """
+    Runs the AI lookups against FakeModelClient with an empty classification cache
+    """
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('customs_api.ai_clients._client', FakeModelClient())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        classification_cache.cache.clear()
+        self.addCleanup(classification_cache.cache.clear)
+
+
+class ClassificationCacheTests(OfflineModelMixin, TestCase):
+    def test_hit_and_miss_counters(self):
+        first = classify_hs_code_with_ai('Paxta ip')
+        second = classify_hs_code_with_ai('  paxta IP! ')
+        self.assertEqual(first, second)
+        stats = classification_cache.stats()
+        self.assertEqual((stats['misses'], stats['hits'], stats['stores']), (1, 1, 1))
+        self.assertEqual(stats['hit_ratio'], 0.5)
+
+    def test_cross_process_recheck_is_not_counted(self):
+        # In 'file' mode the leader re-checks the cache after taking the lock
+        with tempfile.TemporaryDirectory() as lock_dir:
+            with override_settings(HS_CLASSIFICATION_SINGLE_FLIGHT={'MODE': 'file', 'LOCK_DIR': lock_dir}):
+                classify_hs_code_with_ai('Paxta ip')
+        stats = classification_cache.stats()
+        self.assertEqual((stats['misses'], stats['hits'], stats['stores']), (1, 0, 1))
+
+
+class ClassificationJobTests(OfflineModelMixin, TestCase):
+    """
+    /api/search-hs-codes/?async=1 with the jobs run in the request thread
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.queue_patcher = mock.patch('customs_api.ai_jobs._queue', ImmediateJobQueue())
+        self.queue_patcher.start()
+        self.addCleanup(self.queue_patcher.stop)
+        self.user = User.objects.create_user(username='searcher', phone='+998900000002', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, query='Paxta ip'):
+        return self.client.get('/api/search-hs-codes/', {'q': query, 'async': '1'})
+
+    def poll(self, response):
+        return self.client.get(f"/api/classification-jobs/{response.json()['job']['id']}/").json()
+
+    def test_successful_job(self):
+        response = self.search()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['job']['status'], 'DONE')
+
+        job = self.poll(response)
+        self.assertEqual(job['status'], 'DONE')
+        self.assertEqual(len(job['results']), 3)
+        self.assertEqual(HsCodePrediction.objects.filter(user=self.user).count(), 3)
+
+    def test_fallback_result_fails_the_job(self):
+        # classify() returns None without an API key; the classifier then falls back
+        with mock.patch.object(FakeModelClient, 'classify', return_value=None):
+            response = self.search()
+        self.assertEqual(response.json()['job']['status'], 'FAILED')
+
+        job = self.poll(response)
+        self.assertEqual(job['status'], 'FAILED')
+        self.assertEqual(job['results'], [])
+        self.assertTrue(job['error'])
+        self.assertFalse(HsCodePrediction.objects.exists())
+
+    def test_full_queue(self):
+        self.queue_patcher.stop()
+        with override_settings(HS_CLASSIFICATION_JOBS={'MAX_WORKERS': 1, 'MAX_PENDING': 0}):
+            queue = ThreadPoolJobQueue()
+        with mock.patch('customs_api.ai_jobs._queue', queue):
+            response = self.search()
+        self.queue_patcher.start()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIsNone(response.json()['job'])
+        self.assertEqual(ClassificationJob.objects.get().status, 'FAILED')
+
+
+class SingleFlightTests(TestCase):
+    """
+    Identical concurrent lookups run the function once. Separate SingleFlight
+    instances stand in for separate worker processes.
+    """
+
+    def run_concurrently(self, flights, mode, lock_dir=None):
+        shared_cache = {}
+        started = threading.Event()
+        release = threading.Event()
+        executions = []
+        results = []
+
+        def lookup():
+            executions.append(1)
+            started.set()
+            release.wait(5)
+            shared_cache['key'] = ['result']
+            return ['result']
+
+        def caller(flight):
+            results.append(flight.do('key', lookup, recheck=lambda: shared_cache.get('key')))
+
+        config = {'MODE': mode, 'LOCK_DIR': lock_dir, 'TIMEOUT': 5}
+        with override_settings(HS_CLASSIFICATION_SINGLE_FLIGHT=config):
+            threads = [threading.Thread(target=caller, args=(flights[0],))]
+            threads[0].start()
+            started.wait(5)
+            threads += [threading.Thread(target=caller, args=(flight,)) for flight in flights[1:]]
+            for thread in threads[1:]:
+                thread.start()
+            # Give the followers time to block on the in-flight call or the lock
+            threading.Event().wait(0.2)
+            release.set()
+            for thread in threads:
+                thread.join(5)
+        return executions, results
+
+    def test_process_mode_coalesces_threads(self):
+        flight = SingleFlight()
+        executions, results = self.run_concurrently([flight] * 4, 'process')
+        self.assertEqual(len(executions), 1)
+        self.assertEqual(results, [['result']] * 4)
+        stats = flight.stats()
+        self.assertEqual((stats['calls'], stats['executions'], stats['coalesced']), (4, 1, 3))
+
+    def test_file_mode_coalesces_processes(self):
+        flights = [SingleFlight(), SingleFlight()]
+        with tempfile.TemporaryDirectory() as lock_dir:
+            executions, results = self.run_concurrently(flights, 'file', lock_dir)
+            self.assertEqual(len(executions), 1)
+            self.assertEqual(results, [['result']] * 2)
+            self.assertEqual(flights[1].stats()['lock_rechecks'], 1)
+
+            # Lock files are per stripe, not per key
+            for i in range(50):
+                with override_settings(HS_CLASSIFICATION_SINGLE_FLIGHT={'MODE': 'file', 'LOCK_DIR': lock_dir,
+                                                                        'LOCK_STRIPES': 4}):
+                    flights[0].do(f'key-{i}', lambda: ['result'])
+            self.assertLessEqual(len(os.listdir(lock_dir)), 5)
+
+    def test_db_mode_is_refused_on_sqlite(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with override_settings(HS_CLASSIFICATION_SINGLE_FLIGHT={'MODE': 'db'}):
+            with self.assertRaises(ImproperlyConfigured):
+                SingleFlight().do('key', lambda: ['result'])
+
+
+@override_settings(DASHBOARD_SNAPSHOTS=True)
+class DashboardSnapshotTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='broker', phone='+998900000003', password='secret')
+        self.created = 0
+
+    def create_declaration(self, status='QORALAMA', products=1):
+        self.created += 1
+        declaration = Declaration.objects.create(
+            id=f'S{self.created}', contract_number='C', invoice_date=date(2024, 1, 1),
+            partner_name='Partner', status=status, total_value=Decimal('100'), user=self.user
+        )
+        items = ProductItem.objects.bulk_create([
+            ProductItem(id=f'S{self.created}P{i}', name='Product', hs_code='0101210000', user=self.user)
+            for i in range(products)
+        ])
+        declaration.products.add(*items)
+        return declaration
+
+    def snapshot(self):
+        snapshot = DashboardSnapshot.objects.get(user=self.user)
+        return snapshot.total_declarations, snapshot.pending_declarations, snapshot.total_products
+
+    def test_snapshot_follows_committed_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_declaration(products=2)
+        self.assertEqual(self.snapshot(), (1, 1, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            declaration = self.create_declaration(status='TASDIQLANGAN', products=1)
+        self.assertEqual(self.snapshot(), (2, 1, 3))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            declaration.delete()
+        self.assertEqual(self.snapshot(), (1, 1, 3))
+
+    def test_rolled_back_change_does_not_block_later_refreshes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    self.create_declaration()
+                    raise RuntimeError('rollback')
+        self.assertFalse(DashboardSnapshot.objects.filter(user=self.user).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_declaration(products=2)
+        self.assertEqual(self.snapshot(), (1, 1, 2))
+
+    def test_deleting_the_user_does_not_recreate_the_snapshot(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_declaration()
+        user_id = self.user.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertFalse(User.objects.filter(pk=user_id).exists())
+        self.assertFalse(DashboardSnapshot.objects.filter(user_id=user_id).exists())
+
+    def test_since_counts_each_calculation_once(self):
+        old = self.create_declaration()
+        recent = self.create_declaration()
+        product = old.products.get()
+        recent.products.add(product)
+        CalculationResult.objects.create(product_item=product, customs_duty=Decimal('50'))
+        Declaration.objects.filter(pk=old.pk).update(created_at=datetime(2024, 1, 15, tzinfo=dt_timezone.utc))
+        Declaration.objects.filter(pk=recent.pk).update(created_at=datetime(2024, 3, 15, tzinfo=dt_timezone.utc))
+
+        months = compute_dashboard_summary(self.user.pk, since=datetime(2024, 3, 1, tzinfo=dt_timezone.utc))['months']
+        self.assertEqual(months, {'2024-03': {'value': 100.0, 'duty': 50.0}})
+
+
+class BulkExportTests(TransactionTestCase):
+    # The XML documents are rendered on pool threads, which need committed rows
+    def setUp(self):
+        self.user = User.objects.create_user(username='exporter', phone='+998900000004', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(3):
+            declaration = Declaration.objects.create(
+                id=f'X{i}', contract_number='C', invoice_date=date(2024, 1, 1),
+                partner_name='Partner', status='QORALAMA', total_value=Decimal('100'), user=self.user
+            )
+            declaration.products.add(ProductItem.objects.create(
+                id=f'X{i}P', name='Product', hs_code='0101210000', user=self.user
+            ))
+
+    def test_invalid_or_missing_filters_are_rejected(self):
+        url = '/api/declarations/export-xml/bulk/'
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.get(url, {'date_from': '15.01.2024'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'date_to': '2024-02-30'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'date_from': '2000-01-01', 'date_to': '2000-01-02'}).status_code, 404)
+
+    def test_export_streams_zip_and_reports_progress(self):
+        response = self.client.get('/api/declarations/export-xml/bulk/', {'ids': 'X0,X2', 'pretty': '0'})
+        self.assertEqual(response.status_code, 200)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), ['AI-DECL-X0.xml', 'AI-DECL-X2.xml'])
+
+        progress_url = f"/api/declarations/export-xml/bulk/{response['X-Export-Id']}/progress/"
+        progress = self.client.get(progress_url).json()
+        self.assertEqual((progress['total'], progress['done'], progress['status']), (2, 2, 'DONE'))
+
+        other = User.objects.create_user(username='other', phone='+998900000005', password='secret')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(progress_url).status_code, 404)
+
+    def test_closed_stream_is_reported_as_cancelled(self):
+        stream = generate_declarations_zip(['X0', 'X1', 'X2'], export_id='cancelled', user_id=self.user.id)
+        next(stream)
+        stream.close()
+        progress = get_export_progress('cancelled')
+        self.assertEqual((progress['done'], progress['status']), (1, 'CANCELLED'))
@@ -35,16 +35,21 @@ urlpatterns = [
     
     # Custom calculation endpoints
     path('calculate-customs-duties/', views.calculate_customs_duties_api, name='calculate-customs-duties'),
+    path('calculate-customs-duties/batch/', views.calculate_customs_duties_batch_api, name='calculate-customs-duties-batch'),
     path('perform-risk-analysis/', views.perform_risk_analysis_api, name='perform-risk-analysis'),
     
     # HS Code search and details
     path('search-hs-codes/', views.search_hs_codes_api, name='search-hs-codes'),
+    path('classification-jobs/<str:job_id>/', views.get_classification_job, name='classification-job'),
+    path('hs-classification-cache/stats/', views.get_hs_classification_cache_stats, name='hs-classification-cache-stats'),
     path('hs-code-details/<str:code>/', views.get_hs_code_details_api, name='get-hs-code-details'),
     
     # Declaration-specific endpoints
-    path('declarations/<int:declaration_id>/audit/', views.audit_declaration_api, name='audit-declaration'),
-    path('declarations/<int:declaration_id>/summary/', views.get_declaration_summary, name='declaration-summary'),
-    path('declarations/<int:declaration_id>/export-xml/', views.ExportXmlView.as_view(), name='export-declaration-xml'),
+    path('declarations/<str:declaration_id>/audit/', views.audit_declaration_api, name='audit-declaration'),
+    path('declarations/<str:declaration_id>/summary/', views.get_declaration_summary, name='declaration-summary'),
+    path('declarations/<str:declaration_id>/export-xml/', views.ExportXmlView.as_view(), name='export-declaration-xml'),
+    path('declarations/export-xml/bulk/', views.BulkExportXmlView.as_view(), name='bulk-export-declaration-xml'),
+    path('declarations/export-xml/bulk/<str:export_id>/progress/', views.get_bulk_export_progress, name='bulk-export-progress'),
     
     # Additional utility endpoints
     path('currency-rates/latest/', views.CurrencyRateViewSet.as_view({'get': 'list'}), name='latest-currency-rates'),
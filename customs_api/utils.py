@@ -1,83 +1,121 @@
-from decimal import Decimal
-from .models import HsCode, ProductItem, CurrencyRate
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from .models import HsCode, ProductItem
 import random
 import requests
-from datetime import datetime
+from datetime import date, datetime
+
+
+DEFAULT_EXCHANGE_RATE = Decimal('12850.00')  # USD default
+DUTY_AMOUNT_FIELDS = ('customs_duty', 'vat', 'customs_fee', 'excise', 'total')
+DUTY_RATE_FIELDS = ('duty_rate', 'vat_rate', 'excise_rate', 'customs_fee_rate')
+CENT = Decimal('0.01')
+
+
+def get_exchange_rate(currency, on_date=None):
+    """
+    Central Bank rate for a currency: the one in effect on `on_date`, or the latest
+    """
+    from .currency_rates import currency_rate_cache
+    
+    if on_date is None:
+        rate = currency_rate_cache.get_rate(currency)
+    else:
+        rate = currency_rate_cache.get_rate_on(currency, on_date)
+    # Default rate if not found
+    return rate if rate is not None else DEFAULT_EXCHANGE_RATE
+
+
+def get_rate_date(data):
+    """
+    Date whose exchange rate applies to a product line ('invoice_date', YYYY-MM-DD), None for the latest rate
+    """
+    value = data.get('invoice_date')
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def get_hs_code_rates(codes):
+    """
+    Duty, VAT and excise rates of the known HS codes among `codes` in a single query
+    """
+    rows = HsCode.objects.filter(code__in=codes).values_list('code', 'duty_rate', 'vat_rate', 'excise_rate')
+    return {
+        code: {'duty_rate': duty_rate, 'vat_rate': vat_rate, 'excise_rate': excise_rate}
+        for code, duty_rate, vat_rate, excise_rate in rows
+    }
 
 
 def calculate_customs_duties(data):
     """
     Calculate customs duties based on product data
     """
+    hs_code = data.get('hs_code', '')
+    amounts = compute_customs_duties(
+        data,
+        get_exchange_rate(data.get('currency', 'USD'), get_rate_date(data)),
+        get_hs_code_rates([hs_code]).get(hs_code)
+    )
+    
+    result = {field: float(amounts[field]) for field in DUTY_AMOUNT_FIELDS}
+    result['currency'] = 'UZS'
+    result.update({field: float(amounts[field]) for field in DUTY_RATE_FIELDS})
+    result['tariff_rule'] = amounts['tariff_rule']
+    result['applied_rules'] = amounts['applied_rules']
+    
+    return result
+
+
+def compute_customs_duties(data, ex_rate, base_rates=None):
+    """
+    Duty, excise, VAT and fee for one product line at a given exchange rate.
+    Rates come from the tariff rule table (see tariff.py) on top of the HS
+    code's own rates (base_rates); returns unrounded Decimals keyed by
+    DUTY_AMOUNT_FIELDS and DUTY_RATE_FIELDS plus the rules that fired.
+    """
+    from .tariff import tariff_engine
+    
     # Extract parameters
     hs_code = data.get('hs_code', '')
     price = Decimal(str(data.get('price', 0)))
-    currency = data.get('currency', 'USD')
-    origin = data.get('origin', 'OTHER')
-    has_certificate = data.get('has_certificate', False)
-    mode = data.get('mode', 'IM_40')
-    product_type = data.get('product_type', 'GENERAL')
     engine_volume = Decimal(str(data.get('engine_volume', 0)))
     manufacture_year = data.get('manufacture_year', datetime.now().year)
-    
-    # Get exchange rate
     try:
-        rate_obj = CurrencyRate.objects.filter(code=currency).latest('date')
-        ex_rate = Decimal(str(rate_obj.rate))
-    except CurrencyRate.DoesNotExist:
-        # Default rate if not found
-        ex_rate = Decimal('12850.00')  # USD default
+        age = datetime.now().year - int(manufacture_year)
+    except (TypeError, ValueError):
+        age = None
+    
+    context = {
+        'product_type': data.get('product_type', 'GENERAL'),
+        'mode': data.get('mode', 'IM_40'),
+        'origin': data.get('origin', 'OTHER'),
+        'has_certificate': data.get('has_certificate', False),
+        'engine_volume': engine_volume,
+        'age': age,
+    }
+    match = tariff_engine.lookup(hs_code, context, base_rates)
+    
+    duty_rate = match.duty_rate
+    vat_rate = match.vat_rate
+    excise_rate = match.excise_rate
+    customs_fee_rate = match.customs_fee_rate
     
     # Convert to UZS
     price_uzs = price * ex_rate
     
-    # Initialize rates
-    duty_rate = Decimal('10.00')  # Default 10%
-    vat_rate = Decimal('12.00')  # Default 12%
-    excise_rate = Decimal('0.00')  # Default 0%
-    customs_fee_rate = Decimal('0.20')  # 0.2%
-    
-    # Calculate duties based on product type and other factors
-    calculated_duty = Decimal('0.00')
-    calculated_excise = Decimal('0.00')
-    calculated_vat = Decimal('0.00')
-    calculated_fee = Decimal('0.00')
-    
-    # Special handling for automobiles
-    if product_type == 'AUTO':
-        current_year = datetime.now().year
-        age = current_year - manufacture_year
-        
-        # Electric vehicles
-        if hs_code.startswith('870380'):  # Electric cars
-            duty_rate = Decimal('0.00')
-            excise_rate = Decimal('0.00')
-            # VAT might also be 0 for individuals importing EVs
-            vat_rate = Decimal('0.00')
-        # Petrol/Diesel vehicles
-        else:
-            if age > 3:  # Old cars (>3 years) have higher rates
-                duty_rate = Decimal('40.00')  # Base ad valorem
-                # Specific rate calculation (example: $3 per cc)
-                specific_rate = engine_volume * Decimal('3.00')
-                calculated_duty = max(price_uzs * Decimal('0.40'), specific_rate * ex_rate)
-            else:  # New cars
-                if engine_volume < 1200:
-                    duty_rate = Decimal('15.00')
-                elif engine_volume > 3000:
-                    duty_rate = Decimal('30.00')
-                    excise_rate = Decimal('20.00')  # Luxury tax
-                else:
-                    duty_rate = Decimal('15.00')
-    
-    # Apply duty calculation if not already calculated
-    if calculated_duty == 0:
-        calculated_duty = price_uzs * (duty_rate / 100)
-    
-    # Special handling for CIS countries with ST-1 certificate
-    if origin == 'CIS' and has_certificate and mode == 'IM_40':
-        calculated_duty = Decimal('0.00')
-        duty_rate = Decimal('0.00')
+    # Ad valorem, specific (per cm3 of engine volume) or the greater of both
+    ad_valorem_duty = price_uzs * (duty_rate / 100)
+    specific_duty = engine_volume * match.specific_rate * ex_rate
+    if match.rate_type == 'SPECIFIC':
+        calculated_duty = specific_duty
+    elif match.rate_type == 'COMBINED':
+        calculated_duty = max(ad_valorem_duty, specific_duty)
+    else:
+        calculated_duty = ad_valorem_duty
     
     # Calculate excise (on base of price + duty)
     excise_base = price_uzs + calculated_duty
@@ -87,33 +125,89 @@ def calculate_customs_duties(data):
     vat_base = price_uzs + calculated_duty + calculated_excise
     calculated_vat = vat_base * (vat_rate / 100)
     
-    # Calculate customs fee (0.2% of customs value)
+    # Calculate customs fee (% of customs value)
     calculated_fee = price_uzs * (customs_fee_rate / 100)
     
-    # Export duties for EK-10 mode
-    if mode == 'EK_10':  # Export
-        calculated_duty = Decimal('0.00')
-        calculated_vat = Decimal('0.00')
-        calculated_excise = Decimal('0.00')
-        calculated_fee = price_uzs * Decimal('0.001')  # Lower fee for exports
-    
     # Calculate total
     total = calculated_duty + calculated_excise + calculated_vat + calculated_fee
     
-    result = {
-        'customs_duty': float(calculated_duty),
-        'vat': float(calculated_vat),
-        'customs_fee': float(calculated_fee),
-        'excise': float(calculated_excise),
-        'total': float(total),
-        'currency': 'UZS',
-        'duty_rate': float(duty_rate),
-        'vat_rate': float(vat_rate),
-        'excise_rate': float(excise_rate),
-        'customs_fee_rate': float(customs_fee_rate)
+    return {
+        'customs_duty': calculated_duty,
+        'vat': calculated_vat,
+        'customs_fee': calculated_fee,
+        'excise': calculated_excise,
+        'total': total,
+        'duty_rate': duty_rate,
+        'vat_rate': vat_rate,
+        'excise_rate': excise_rate,
+        'customs_fee_rate': customs_fee_rate,
+        'tariff_rule': match.rule,
+        'applied_rules': match.applied_rules
     }
-    
-    return result
+
+
+def calculate_customs_duties_batch(lines):
+    """
+    Calculate customs duties for many product lines in one pass.
+    Exchange rates and HS code rates are resolved once per distinct currency/code
+    (lines with an invoice_date use the rate in effect on that date, and
+    rate_date reports the date of the rate row used);
+    amounts are rounded to 0.01 UZS (ROUND_HALF_UP) per line and totals are
+    the exact sums of the rounded line amounts.
+    """
+    from .currency_rates import currency_rate_cache
+    
+    codes = {line.get('hs_code', '') for line in lines}
+    hs_code_rates = get_hs_code_rates(codes)
+    rate_entries = {}  # (currency, invoice date or None) -> (rate date, rate) or None
+    
+    totals = {field: Decimal('0.00') for field in DUTY_AMOUNT_FIELDS}
+    results = []
+    failed = 0
+    
+    for index, line in enumerate(lines):
+        currency = line.get('currency', 'USD')
+        try:
+            key = (currency, get_rate_date(line))
+            if key not in rate_entries:
+                # Latest or as-of lookup in the in-memory rate history, O(log n)
+                rate_entries[key] = currency_rate_cache.get_rate_entry(*key)
+            rate_entry = rate_entries[key]
+            ex_rate = rate_entry[1] if rate_entry is not None else DEFAULT_EXCHANGE_RATE
+            amounts = compute_customs_duties(line, ex_rate, hs_code_rates.get(line.get('hs_code', '')))
+        except InvalidOperation:
+            failed += 1
+            results.append({'index': index, 'id': line.get('id'), 'error': 'Invalid numeric value'})
+            continue
+        except (TypeError, ValueError) as e:
+            failed += 1
+            results.append({'index': index, 'id': line.get('id'), 'error': str(e)})
+            continue
+        
+        rounded = {
+            field: amounts[field].quantize(CENT, rounding=ROUND_HALF_UP)
+            for field in ('customs_duty', 'vat', 'customs_fee', 'excise')
+        }
+        rounded['total'] = rounded['customs_duty'] + rounded['excise'] + rounded['vat'] + rounded['customs_fee']
+        for field in DUTY_AMOUNT_FIELDS:
+            totals[field] += rounded[field]
+        
+        result = {'index': index, 'id': line.get('id'), 'hs_code': line.get('hs_code', '')}
+        result.update({field: float(rounded[field]) for field in DUTY_AMOUNT_FIELDS})
+        result['currency'] = 'UZS'
+        result.update({field: float(amounts[field]) for field in DUTY_RATE_FIELDS})
+        result['exchange_rate'] = float(ex_rate)
+        result['exchange_rate_found'] = rate_entry is not None
+        result['rate_date'] = rate_entry[0].isoformat() if rate_entry is not None else None
+        result['hs_code_found'] = result['hs_code'] in hs_code_rates
+        result['tariff_rule'] = amounts['tariff_rule']
+        result['applied_rules'] = amounts['applied_rules']
+        results.append(result)
+    
+    summary = {field: float(totals[field]) for field in DUTY_AMOUNT_FIELDS}
+    summary.update({'currency': 'UZS', 'line_count': len(lines), 'failed_count': failed})
+    
+    return {'lines': results, 'totals': summary}
 
 
 def perform_risk_analysis(data):
@@ -164,94 +258,100 @@ def perform_risk_analysis(data):
     return result
 
 
+# Generic classifications returned when the AI model is unavailable or fails
+FALLBACK_CLASSIFICATIONS = [
+    {'code': '9999999999', 'description': 'General merchandise', 'description_ru': 'Общие товары', 'confidence': 50, 'reasoning': 'Generic classification when specific code not found', 'sources': []},
+    {'code': '8471301000', 'description': 'Electronic equipment', 'description_ru': 'Электронное оборудование', 'confidence': 45, 'reasoning': 'Generic electronic classification', 'sources': []}
+]
+
+
 def search_hs_codes_semantic(query):
     """
     Search HS codes semantically
     First search in database, then fallback to AI if no results found
     """
-    from .models import HsCode
-    from django.db.models import Q
+    db_results = search_hs_codes_in_database(query)
     
-    # First, try to search in database
-    query_lower = query.lower()
-    db_results = []
+    # If we found results in database, return them
+    if db_results:
+        return db_results
+    
+    # If no database results, use AI/Gemini API as fallback
+    return classify_hs_code_with_ai(query)
+
+
+def search_hs_codes_in_database(query):
+    """
+    Search the HS code full-text index (BM25 ranked, best match first)
+    """
+    from .hs_search import search_hs_codes
     
-    # Search by description, keywords, and code
-    hs_codes = HsCode.objects.filter(
-        Q(description_uz__icontains=query_lower) |
-        Q(description_ru__icontains=query_lower) |
-        Q(code__icontains=query) |
-        Q(required_certs__icontains=query_lower)
-    )[:10]
+    db_results = []
+    matches = search_hs_codes(query, limit=10)
+    best_score = matches[0][1] if matches else 0
     
-    for hs_code in hs_codes:
+    for hs_code, score in matches:
+        # Scale relevance relative to the best hit into a 60-95 confidence band
+        relevance = score / best_score if best_score > 0 else 1
         db_results.append({
-            'code': hs_code.code,
-            'description': hs_code.description_uz,
-            'description_ru': hs_code.description_ru or hs_code.description_uz,
-            'confidence': 95.0,  # High confidence for DB matches
-            'reasoning': f'Matched from database: {hs_code.code}',
-            'sources': hs_code.sources or []
+            'code': hs_code['code'],
+            'description': hs_code['description_uz'],
+            'description_ru': hs_code['description_ru'] or hs_code['description_uz'],
+            'confidence': round(60 + 35 * relevance, 2),
+            'score': round(score, 4),
+            'reasoning': f'Matched from database: {hs_code["code"]}',
+            'sources': hs_code['sources']
         })
     
-    # If we found results in database, return them
-    if db_results:
-        return db_results
+    return db_results
+
+
+def classify_hs_code_with_ai(query):
+    """
+    Classify a product with the AI model, going through the classification cache.
+    Concurrent lookups of the same normalized query are coalesced into one model
+    call (single-flight). Failures are cached for a shorter time (negative caching)
+    and return the generic fallback classifications.
+    """
+    from .ai_cache import classification_cache
+    from .single_flight import single_flight
+    
+    cached = classification_cache.get(query)
+    if cached is not None:
+        return cached
+    
+    return single_flight.do(
+        classification_cache.make_key(query),
+        lambda: _classify_and_cache(query),
+        recheck=lambda: classification_cache.peek(query)
+    )
+
+
+def _classify_and_cache(query):
+    from .ai_cache import classification_cache
     
-    # If no database results, use AI/Gemini API as fallback
     try:
-        # Import here to avoid circular imports
-        import os
-        from google import genai
-        
-        # Check if Gemini API key is available
-        api_key = os.environ.get('GEMINI_API_KEY')
-        if not api_key:
-            # Return mock results if no API key
-            return [
-                {'code': '9999999999', 'description': 'General merchandise', 'description_ru': 'Общие товары', 'confidence': 50, 'reasoning': 'Generic classification when specific code not found', 'sources': []},
-                {'code': '8471301000', 'description': 'Electronic equipment', 'description_ru': 'Электронное оборудование', 'confidence': 45, 'reasoning': 'Generic electronic classification', 'sources': []}
-            ]
-        
-        # Call Gemini API
-        client = genai.GenerativeModel('gemini-3-pro-preview')
-        response = client.generate_content(
-            f'Rol: Butunjahon Bojxona Eksperti. Vazifa: "{query}" uchun eng aniq 10 xonali TIF TN kodlarini topish. '
-            f'Internetdan Butunjahon Bojxona Tashkiloti (WCO), Yevropa Ittifoqi TARIC bazasi va O\'zbekiston Bojxona stavkalarini tekshiring. '
-            f'Natijani JSON formatida qaytaring: [{{code, description, descriptionRu, confidence, reasoning}}].'
-        )
-        
-        # Parse response
-        import json
-        raw_text = response.text or "[]"
-        json_start = raw_text.find('[')
-        json_end = raw_text.rfind(']') + 1
-        if json_start != -1 and json_end > 0:
-            raw_text = raw_text[json_start:json_end]
-        
-        ai_results = json.loads(raw_text)
-        
-        # Format results
-        formatted_results = []
-        for r in ai_results[:10]:  # Limit to 10 results
-            formatted_results.append({
-                'code': r.get('code', ''),
-                'description': r.get('description', 'Tovar tavsifi'),
-                'description_ru': r.get('descriptionRu', r.get('description', 'Описание товара')),
-                'confidence': float(r.get('confidence', 70)),
-                'reasoning': r.get('reasoning', 'AI tahlili'),
-                'sources': r.get('sources', [])
-            })
-        
-        return formatted_results
-        
+        results = request_ai_classification(query)
     except Exception as e:
         print(f"AI search error: {e}")
-        # Return fallback results if AI fails
-        return [
-            {'code': '9999999999', 'description': 'General merchandise', 'description_ru': 'Общие товары', 'confidence': 50, 'reasoning': 'Generic classification when specific code not found', 'sources': []},
-            {'code': '8471301000', 'description': 'Electronic equipment', 'description_ru': 'Электронное оборудование', 'confidence': 45, 'reasoning': 'Generic electronic classification', 'sources': []}
-        ]
+        results = None
+    
+    if results is None:
+        classification_cache.set_failure(query, FALLBACK_CLASSIFICATIONS)
+        return FALLBACK_CLASSIFICATIONS
+    
+    classification_cache.set(query, results)
+    return results
+
+
+def request_ai_classification(query):
+    """
+    Ask the configured AI model client (Gemini by default) for HS code candidates
+    Returns None when the model is not configured, raises on API/parse errors
+    """
+    from .ai_clients import get_model_client
+    
+    return get_model_client().classify(query)
 
 
 def get_hs_code_details(code):
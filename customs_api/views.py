@@ -1,19 +1,21 @@
 from rest_framework import generics, status, viewsets
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.views import APIView
 from django.contrib.auth import authenticate
 from django.contrib.auth.hashers import make_password
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.db.models import Q, Count, Sum
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+import json
 from decimal import Decimal
-from datetime import datetime
 from .models import (
     User, HsCode, ClassificationRuling, OptimizationTip, ProductItem, ValidationIssue,
     Declaration, AuditResult, CalculationResult, HsCodePrediction, PriceRiskAnalysis,
     ChatMessage, DecisionTreeQuestion, IncotermRecommendation, TradeRouteOption, CurrencyRate,
-    HsCodePassport, UserTemplate, DocumentGeneration, ClassificationSearch
+    HsCodePassport, UserTemplate, DocumentGeneration, ClassificationSearch, ClassificationJob
 )
 from .serializers import (
     UserSerializer, HsCodeSerializer, ClassificationRulingSerializer, OptimizationTipSerializer,
@@ -21,9 +23,20 @@ from .serializers import (
     CalculationResultSerializer, HsCodePredictionSerializer, PriceRiskAnalysisSerializer,
     ChatMessageSerializer, DecisionTreeQuestionSerializer, IncotermRecommendationSerializer,
     TradeRouteOptionSerializer, CurrencyRateSerializer,
-    HsCodePassportSerializer, UserTemplateSerializer, DocumentGenerationSerializer, ClassificationSearchSerializer
+    HsCodePassportSerializer, UserTemplateSerializer, DocumentGenerationSerializer, ClassificationSearchSerializer,
+    ClassificationJobSerializer
 )
-from .utils import calculate_customs_duties, perform_risk_analysis, get_hs_code_details, search_hs_codes_semantic
+from .utils import (
+    calculate_customs_duties, perform_risk_analysis, get_hs_code_details, search_hs_codes_semantic,
+    search_hs_codes_in_database, calculate_customs_duties_batch
+)
+from .hs_search import ranked_hs_code_queryset
+from .prefetching import optimized_queryset
+from .pagination import UserCursorPagination
+from .compact import DECLARATION_ROWS, PRODUCT_ITEM_ROWS, wants_compact, compact_list_response
+from .dashboard import get_dashboard_summary, build_monthly_data
+from .xml_export import generate_declaration_xml
+from .currency_rates import currency_rate_cache
 
 from rest_framework.authtoken.models import Token
 
@@ -101,46 +114,14 @@ def get_dashboard_data(request):
     # Get recent HS code searches
     recent_searches = ClassificationSearch.objects.filter(user=user).order_by('-created_at')[:5]
     
-    # Get dashboard KPIs
-    total_declarations = Declaration.objects.filter(user=user).count()
-    total_products = ProductItem.objects.filter(user=user).count()
-    pending_declarations = Declaration.objects.filter(user=user, status='QORALAMA').count()
+    # Get dashboard KPIs and monthly value/duty totals (aggregate queries or per-user snapshot)
+    summary = get_dashboard_summary(user)
+    total_declarations = summary['kpis']['total_declarations']
+    total_products = summary['kpis']['total_products']
+    pending_declarations = summary['kpis']['pending_declarations']
     
     # Get financial data for chart (last 6 months)
-    from datetime import datetime, timedelta
-    six_months_ago = datetime.now() - timedelta(days=180)
-    monthly_data = []
-    
-    for i in range(6):
-        month_start = six_months_ago + timedelta(days=i*30)
-        month_end = month_start + timedelta(days=30)
-        
-        # Get declarations for this month
-        month_declarations = Declaration.objects.filter(
-            user=user,
-            created_at__gte=month_start,
-            created_at__lte=month_end
-        )
-        
-        # Calculate import value and duties
-        month_total_value = sum(float(d.total_value) for d in month_declarations)
-        
-        # Calculate duties from related products
-        month_duties = 0
-        for decl in month_declarations:
-            for product in decl.products.all():
-                if hasattr(product, 'calculation'):
-                    month_duties += float(product.calculation.customs_duty)
-        
-        # Month name for chart
-        month_name = month_start.strftime('%b')
-        
-        monthly_data.append({
-            'name': month_name,
-            'value': month_total_value,
-            'duty': month_duties,
-            'speed': 24 - i * 2  # Simulated speed improvement
-        })
+    monthly_data = build_monthly_data(summary['months'])
     
     # Get urgent tasks
     urgent_tasks = []
@@ -155,7 +136,7 @@ def get_dashboard_data(request):
         })
     
     # Get currency rates
-    latest_rates = CurrencyRate.objects.order_by('-date')[:4]
+    latest_rates = currency_rate_cache.latest_rows()[:4]
     
     dashboard_data = {
         'kpis': {
@@ -171,7 +152,7 @@ def get_dashboard_data(request):
             'searches': ClassificationSearchSerializer(recent_searches, many=True).data,
         },
         'urgent_tasks': urgent_tasks,
-        'currency_rates': CurrencyRateSerializer(latest_rates, many=True).data,
+        'currency_rates': latest_rates,
     }
     
     return Response(dashboard_data, status=status.HTTP_200_OK)
@@ -187,11 +168,8 @@ class HsCodeViewSet(viewsets.ModelViewSet):
         # Search by code or description
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(code__icontains=search) | 
-                Q(description_uz__icontains=search) | 
-                Q(description_ru__icontains=search)
-            )
+            # Ranked full-text search (best match first)
+            queryset = ranked_hs_code_queryset(queryset, search)
         return queryset
 
 
@@ -211,9 +189,16 @@ class ProductItemViewSet(viewsets.ModelViewSet):
     queryset = ProductItem.objects.all()
     serializer_class = ProductItemSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = UserCursorPagination
 
     def get_queryset(self):
-        return ProductItem.objects.filter(user=self.request.user)
+        return optimized_queryset(ProductItem.objects.filter(user=self.request.user), self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        # ?view=compact: flat rows without nested objects, built from values()
+        if wants_compact(request):
+            return compact_list_response(self, PRODUCT_ITEM_ROWS, ProductItem.objects.filter(user=request.user))
+        return super().list(request, *args, **kwargs)
 
 
 class ValidationIssueViewSet(viewsets.ModelViewSet):
@@ -226,9 +211,16 @@ class DeclarationViewSet(viewsets.ModelViewSet):
     queryset = Declaration.objects.all()
     serializer_class = DeclarationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = UserCursorPagination
 
     def get_queryset(self):
-        return Declaration.objects.filter(user=self.request.user)
+        return optimized_queryset(Declaration.objects.filter(user=self.request.user), self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        # ?view=compact: flat rows without nested objects, built from values()
+        if wants_compact(request):
+            return compact_list_response(self, DECLARATION_ROWS, Declaration.objects.filter(user=request.user))
+        return super().list(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -240,7 +232,7 @@ class AuditResultViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return AuditResult.objects.filter(declaration__user=self.request.user)
+        return optimized_queryset(AuditResult.objects.filter(declaration__user=self.request.user), self.get_serializer_class())
 
 
 class CalculationResultViewSet(viewsets.ModelViewSet):
@@ -256,6 +248,7 @@ class HsCodePredictionViewSet(viewsets.ModelViewSet):
     queryset = HsCodePrediction.objects.all()
     serializer_class = HsCodePredictionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = UserCursorPagination
 
     def get_queryset(self):
         return HsCodePrediction.objects.filter(user=self.request.user)
@@ -268,6 +261,8 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
     queryset = ChatMessage.objects.all()
     serializer_class = ChatMessageSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = UserCursorPagination
+    cursor_ordering = ('-timestamp', '-id')
 
     def get_queryset(self):
         return ChatMessage.objects.filter(user=self.request.user)
@@ -306,6 +301,14 @@ class CurrencyRateViewSet(viewsets.ReadOnlyModelViewSet):
             return CurrencyRate.objects.filter(date=latest_date.date)
         return CurrencyRate.objects.none()
 
+    def list(self, request, *args, **kwargs):
+        # Latest rates are served from the in-process rate cache
+        rates = currency_rate_cache.latest_rows()
+        page = self.paginate_queryset(rates)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(rates)
+
 
 
 class HsCodePassportViewSet(viewsets.ModelViewSet):
@@ -351,6 +354,7 @@ class ClassificationSearchViewSet(viewsets.ModelViewSet):
     queryset = ClassificationSearch.objects.all()
     serializer_class = ClassificationSearchSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = UserCursorPagination
 
     def get_queryset(self):
         return ClassificationSearch.objects.filter(user=self.request.user)
@@ -374,7 +378,8 @@ def calculate_customs_duties_api(request):
         'mode': 'string',
         'product_type': 'string',
         'engine_volume': 'decimal',
-        'manufacture_year': 'int'
+        'manufacture_year': 'int',
+        'invoice_date': 'YYYY-MM-DD (optional, rate in effect on that date; latest rate otherwise)'
     }
     """
     try:
@@ -384,6 +389,33 @@ def calculate_customs_duties_api(request):
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def calculate_customs_duties_batch_api(request):
+    """
+    Calculate customs duties for many product lines at once
+    Expected data: {
+        'lines': [{'id': 'optional', <same fields as calculate-customs-duties>}, ...]
+    }
+    Returns per-line results (lines that fail carry an 'error') and totals.
+    """
+    from django.conf import settings
+    
+    lines = request.data.get('lines') if isinstance(request.data, dict) else request.data
+    if not isinstance(lines, list) or not all(isinstance(line, dict) for line in lines):
+        return Response({'error': 'lines must be a list of objects'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    max_lines = getattr(settings, 'DUTY_BATCH_MAX_LINES', 10000)
+    if len(lines) > max_lines:
+        return Response({'error': f'At most {max_lines} lines per request'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        result = calculate_customs_duties_batch(lines)
+        return Response(result, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def perform_risk_analysis_api(request):
@@ -407,13 +439,20 @@ def perform_risk_analysis_api(request):
 def search_hs_codes_api(request):
     """
     Search HS codes semantically using AI
-    Query param: q (search query)
+    Query params: q (search query), async (1 to run the AI lookup as a background job)
+    
+    With async=1 the response is {'results': [...database hits...], 'job': {...}}.
+    When the database has no hits the AI lookup is queued and its results are
+    fetched from /api/classification-jobs/<id>/.
     """
     query = request.query_params.get('q', '')
     if not query:
         return Response({'error': 'Query parameter "q" is required'}, 
                        status=status.HTTP_400_BAD_REQUEST)
     
+    if request.query_params.get('async') in ('1', 'true'):
+        return search_hs_codes_async(request, query)
+    
     try:
         results = search_hs_codes_semantic(query)
         return Response(results, status=status.HTTP_200_OK)
@@ -421,6 +460,68 @@ def search_hs_codes_api(request):
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+def search_hs_codes_async(request, query):
+    """
+    Return database hits immediately and queue the AI lookup when there are none
+    """
+    from .ai_jobs import enqueue_classification_job, JobQueueFull
+    
+    try:
+        db_results = search_hs_codes_in_database(query)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if db_results:
+        return Response({'results': db_results, 'job': None}, status=status.HTTP_200_OK)
+    
+    try:
+        job = enqueue_classification_job(query, user=request.user)
+    except JobQueueFull as e:
+        return Response({'results': [], 'job': None, 'error': str(e)},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    
+    # A synchronous queue (ImmediateJobQueue) may have finished the job already
+    job.refresh_from_db(fields=['status'])
+    
+    return Response({
+        'results': [],
+        'job': {
+            'id': job.id,
+            'status': job.status,
+            'url': request.build_absolute_uri(f'/api/classification-jobs/{job.id}/')
+        }
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_classification_job(request, job_id):
+    """
+    Poll a background AI classification job
+    Jobs created by an authenticated user are only visible to that user
+    """
+    job = get_object_or_404(ClassificationJob, id=job_id)
+    if job.user_id and job.user_id != request.user.id:
+        return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    serializer = ClassificationJobSerializer(job)
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_hs_classification_cache_stats(request):
+    """
+    Hit/miss counters of the AI classification cache and single-flight
+    coalescing counters (the latter are per worker process)
+    """
+    from .ai_cache import classification_cache
+    from .single_flight import single_flight
+    stats = classification_cache.stats()
+    stats['single_flight'] = single_flight.stats()
+    return Response(stats, status=status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_hs_code_details_api(request, code):
@@ -487,28 +588,22 @@ def audit_declaration_api(request, declaration_id):
 def get_declaration_summary(request, declaration_id):
     """
     Get a summary of a declaration with all calculations
+    Query param: include=lines to also stream the per-product breakdown
     """
     declaration = get_object_or_404(Declaration, id=declaration_id, user=request.user)
     
-    total_customs_duty = sum(
-        product.calculation.customs_duty if hasattr(product, 'calculation') else 0
-        for product in declaration.products.all()
-    )
-    
-    total_vat = sum(
-        product.calculation.vat if hasattr(product, 'calculation') else 0
-        for product in declaration.products.all()
-    )
-    
-    total_excise = sum(
-        product.calculation.excise if hasattr(product, 'calculation') else 0
-        for product in declaration.products.all()
-    )
-    
-    total_fee = sum(
-        product.calculation.customs_fee if hasattr(product, 'calculation') else 0
-        for product in declaration.products.all()
+    # Totals and product count in a single aggregate (products LEFT JOIN calculations)
+    totals = declaration.products.aggregate(
+        product_count=Count('id'),
+        total_customs_duty=Sum('calculation__customs_duty'),
+        total_vat=Sum('calculation__vat'),
+        total_excise=Sum('calculation__excise'),
+        total_fee=Sum('calculation__customs_fee'),
     )
+    total_customs_duty = totals['total_customs_duty'] or 0
+    total_vat = totals['total_vat'] or 0
+    total_excise = totals['total_excise'] or 0
+    total_fee = totals['total_fee'] or 0
     
     summary = {
         'declaration_id': declaration.id,
@@ -521,103 +616,161 @@ def get_declaration_summary(request, declaration_id):
         'total_fee': float(total_fee),
         'total_payments': float(total_customs_duty + total_vat + total_excise + total_fee),
         'status': declaration.status,
-        'product_count': declaration.products.count()
+        'product_count': totals['product_count']
     }
     
+    if request.query_params.get('include') == 'lines':
+        return StreamingHttpResponse(
+            stream_declaration_summary(summary, declaration),
+            content_type='application/json'
+        )
+    
     return Response(summary, status=status.HTTP_200_OK)
 
 
+def stream_declaration_summary(summary, declaration):
+    """
+    Yield the summary as JSON with a "lines" array that is filled from a
+    server-side iterator, so large declarations are never held in memory
+    """
+    def number(value):
+        return float(value) if value is not None else None
+    
+    yield json.dumps(summary)[:-1] + ', "lines": ['
+    
+    lines = declaration.products.order_by('id').values_list(
+        'id', 'name', 'hs_code', 'price', 'currency',
+        'calculation__customs_duty', 'calculation__vat', 'calculation__excise',
+        'calculation__customs_fee', 'calculation__total'
+    ).iterator(chunk_size=500)
+    
+    for idx, (product_id, name, hs_code, price, currency, duty, vat, excise, fee, total) in enumerate(lines):
+        line = {
+            'product_id': product_id,
+            'name': name,
+            'hs_code': hs_code,
+            'price': number(price),
+            'currency': currency,
+            'customs_duty': number(duty),
+            'vat': number(vat),
+            'excise': number(excise),
+            'customs_fee': number(fee),
+            'total': number(total),
+        }
+        yield (',' if idx else '') + json.dumps(line)
+    
+    yield ']}'
+
+
 class ExportXmlView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, declaration_id):
         """
         Export declaration data in XML format for customs system
+        Query param: pretty=0 for compact output (indented by default)
         """
         declaration = get_object_or_404(Declaration, id=declaration_id, user=request.user)
+        pretty = request.query_params.get('pretty', '1') not in ('0', 'false')
         
-        # Generate XML content similar to frontend
-        import xml.etree.ElementTree as ET
-        from xml.dom import minidom
-        
-        root = ET.Element("GTDDocument")
-        root.set("xmlns", "http://www.customs.uz/gtd/2024")
-        
-        # Header
-        header = ET.SubElement(root, "Header")
-        doc_id = ET.SubElement(header, "DocumentID")
-        doc_id.text = declaration.id
-        export_date = ET.SubElement(header, "ExportDate")
-        export_date.text = datetime.now().isoformat()
-        software = ET.SubElement(header, "Software")
-        software.text = "AI-TradeAssist v2.0 (Autonomous)"
-        
-        # Declaration
-        decl = ET.SubElement(root, "Declaration")
+        # Stream the document as it is generated (products and calculations in one query)
+        response = StreamingHttpResponse(
+            generate_declaration_xml(declaration, pretty=pretty),
+            content_type='application/xml'
+        )
+        response['Content-Disposition'] = f'attachment; filename="AI-DECL-{declaration.id}.xml"'
+        return response
+
+
+class BulkExportXmlView(APIView):
+    """
+    Export many declarations as a ZIP archive of GTD XML files
+    
+    GET (query params) or POST (JSON body):
+        ids: list of declaration ids (or comma separated string)
+        date_from, date_to: YYYY-MM-DD, filters on the declaration creation date
+        status: declaration status
+        pretty: 0 for compact XML
+    The response carries an X-Export-Id header; progress of large batches is
+    available from /api/declarations/export-xml/bulk/<export_id>/progress/.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return self.export(request, request.query_params)
+
+    def post(self, request):
+        return self.export(request, request.data)
+
+    def export(self, request, params):
+        import uuid
+        from .xml_export import generate_declarations_zip, bulk_export_config
         
-        contract = ET.SubElement(decl, "Contract")
-        contract_num = ET.SubElement(contract, "Number")
-        contract_num.text = declaration.contract_number
-        contract_date = ET.SubElement(contract, "Date")
-        contract_date.text = str(declaration.invoice_date)
-        currency_code = ET.SubElement(contract, "CurrencyCode")
-        currency_code.text = declaration.currency
-        total_amount = ET.SubElement(contract, "TotalAmount")
-        total_amount.text = str(declaration.total_value)
-        partner = ET.SubElement(contract, "Partner")
-        partner.text = declaration.partner_name
+        declarations = Declaration.objects.filter(user=request.user)
         
-        # Goods List
-        goods_list = ET.SubElement(decl, "GoodsList")
-        for idx, product in enumerate(declaration.products.all(), 1):
-            good_item = ET.SubElement(goods_list, "GoodItem")
-            good_item.set("SerialNumber", str(idx))
-            
-            description = ET.SubElement(good_item, "Description")
-            description.text = f"{product.name} - {product.description or ''}"
-            hs_code_elem = ET.SubElement(good_item, "HSCode")
-            hs_code_elem.text = product.hs_code
-            weight_netto = ET.SubElement(good_item, "WeightNetto")
-            weight_netto.text = str(product.netto)
-            weight_brutto = ET.SubElement(good_item, "WeightBrutto")
-            weight_brutto.text = str(product.brutto)
-            invoice_value = ET.SubElement(good_item, "InvoiceValue")
-            invoice_value.text = str(product.price)
-            
-            # Add calculation if available
-            if hasattr(product, 'calculation'):
-                customs_value = ET.SubElement(good_item, "CustomsValue")
-                customs_value.text = str(product.calculation.total * 0.8)  # Approximation
-            
-            # Required certificates
-            req_certs = ET.SubElement(good_item, "RequiredCertificates")
-            for cert in product.required_certificates:
-                cert_type = ET.SubElement(req_certs, "CertificateType")
-                cert_type.text = cert
+        ids = params.get('ids')
+        if isinstance(ids, str):
+            ids = [i.strip() for i in ids.split(',') if i.strip()]
+        if ids:
+            declarations = declarations.filter(id__in=ids)
+        for param, lookup in (('date_from', 'created_at__date__gte'), ('date_to', 'created_at__date__lte')):
+            if not params.get(param):
+                continue
+            try:
+                day = parse_date(str(params.get(param)))
+            except ValueError:
+                day = None
+            if day is None:
+                return Response({'error': f'{param} must be a valid date (YYYY-MM-DD)'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            declarations = declarations.filter(**{lookup: day})
+        if params.get('status'):
+            declarations = declarations.filter(status=params.get('status'))
         
-        # Calculated Payments
-        calc_payments = ET.SubElement(decl, "CalculatedPayments")
-        total_payments = ET.SubElement(calc_payments, "TotalPayments")
-        total_payments.text = str(sum(
-            p.calculation.total if hasattr(p, 'calculation') else 0
-            for p in declaration.products.all()
-        ))
+        if not (ids or params.get('date_from') or params.get('date_to') or params.get('status')):
+            return Response({'error': 'Provide ids or a date_from/date_to/status filter'},
+                            status=status.HTTP_400_BAD_REQUEST)
         
-        # Convert to string with proper formatting
-        rough_string = ET.tostring(root, 'utf-8')
-        reparsed = minidom.parseString(rough_string)
-        xml_string = reparsed.toprettyxml(indent="  ")
+        try:
+            declaration_ids = list(declarations.order_by('created_at', 'id').values_list('id', flat=True))
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Remove extra blank lines
-        xml_string = '\n'.join([line for line in xml_string.split('\n') if line.strip()])
+        max_declarations = bulk_export_config()['MAX_DECLARATIONS']
+        if not declaration_ids:
+            return Response({'error': 'No declarations match the filter'}, status=status.HTTP_404_NOT_FOUND)
+        if len(declaration_ids) > max_declarations:
+            return Response({'error': f'At most {max_declarations} declarations can be exported at once'},
+                            status=status.HTTP_400_BAD_REQUEST)
         
-        # Return as XML response
-        from django.http import HttpResponse
-        response = HttpResponse(xml_string, content_type='application/xml')
-        response['Content-Disposition'] = f'attachment; filename="AI-DECL-{declaration.id}.xml"'
+        pretty = str(params.get('pretty', '1')) not in ('0', 'false')
+        export_id = uuid.uuid4().hex
+        response = StreamingHttpResponse(
+            generate_declarations_zip(declaration_ids, pretty=pretty, export_id=export_id, user_id=request.user.id),
+            content_type='application/zip'
+        )
+        response['Content-Disposition'] = f'attachment; filename="AI-DECL-export-{export_id[:8]}.zip"'
+        response['X-Export-Id'] = export_id
+        response['X-Export-Total'] = str(len(declaration_ids))
         return response
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_bulk_export_progress(request, export_id):
+    """
+    Progress of a bulk XML export: {'total', 'done', 'status', 'elapsed'}
+    """
+    from .xml_export import get_export_progress
+    
+    progress = get_export_progress(export_id)
+    if not progress or progress.get('user_id') != request.user.id:
+        return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    progress = {key: value for key, value in progress.items() if key != 'user_id'}
+    return Response(progress, status=status.HTTP_200_OK)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def store_hs_code_search(request):
@@ -0,0 +1,274 @@
+import io
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from xml.sax.saxutils import XMLGenerator
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+
+
+GTD_NAMESPACE = 'http://www.customs.uz/gtd/2024'
+SOFTWARE_NAME = 'AI-TradeAssist v2.0 (Autonomous)'
+
+# Flush the output buffer to the client once it grows past this many characters
+FLUSH_SIZE = 64 * 1024
+
+
+class _XmlWriter:
+    """
+    Thin wrapper around XMLGenerator that writes into an in-memory buffer
+    which the caller drains with flush(), optionally indenting elements
+    """
+
+    def __init__(self, pretty=True, indent='  '):
+        self.buffer = io.StringIO()
+        self.generator = XMLGenerator(self.buffer, encoding='utf-8', short_empty_elements=True)
+        self.pretty = pretty
+        self.indent = indent
+        self.open_elements = []  # has-children flag per open element
+
+    def _newline(self, depth):
+        if self.pretty:
+            self.generator.ignorableWhitespace('\n' + self.indent * depth)
+
+    def _child_written(self):
+        if self.open_elements:
+            self.open_elements[-1] = True
+            self._newline(len(self.open_elements))
+
+    def start_document(self):
+        self.generator.startDocument()
+
+    def start(self, name, attrs=None):
+        self._child_written()
+        self.generator.startElement(name, attrs or {})
+        self.open_elements.append(False)
+
+    def end(self, name):
+        # Empty elements are closed as <Name/>
+        if self.open_elements.pop():
+            self._newline(len(self.open_elements))
+        self.generator.endElement(name)
+
+    def leaf(self, name, text, attrs=None):
+        self._child_written()
+        self.generator.startElement(name, attrs or {})
+        if text is not None:
+            self.generator.characters(str(text))
+        self.generator.endElement(name)
+
+    def end_document(self):
+        self.generator.endDocument()
+        if self.pretty:
+            self.buffer.write('\n')
+
+    def pending(self):
+        return self.buffer.tell()
+
+    def flush(self):
+        data = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+
+def export_products(declaration):
+    """
+    Declaration products with their calculation fetched in the same query
+    """
+    return declaration.products.select_related('calculation')
+
+
+def generate_declaration_xml(declaration, products=None, pretty=True):
+    """
+    Yield the GTD XML document of a declaration in chunks.
+
+    Goods are written as they are read from the database and the payment total
+    is accumulated on the way, so products are iterated only once and the whole
+    document is never held in memory.
+    """
+    if products is None:
+        products = export_products(declaration)
+
+    writer = _XmlWriter(pretty=pretty)
+    writer.start_document()
+    writer.start('GTDDocument', {'xmlns': GTD_NAMESPACE})
+
+    # Header
+    writer.start('Header')
+    writer.leaf('DocumentID', declaration.id)
+    writer.leaf('ExportDate', datetime.now().isoformat())
+    writer.leaf('Software', SOFTWARE_NAME)
+    writer.end('Header')
+
+    # Declaration
+    writer.start('Declaration')
+    writer.start('Contract')
+    writer.leaf('Number', declaration.contract_number)
+    writer.leaf('Date', declaration.invoice_date)
+    writer.leaf('CurrencyCode', declaration.currency)
+    writer.leaf('TotalAmount', declaration.total_value)
+    writer.leaf('Partner', declaration.partner_name)
+    writer.end('Contract')
+
+    # Goods List
+    if hasattr(products, 'iterator'):
+        products = products.iterator(chunk_size=500)
+
+    total_payments = 0
+    writer.start('GoodsList')
+    for idx, product in enumerate(products, 1):
+        writer.start('GoodItem', {'SerialNumber': str(idx)})
+        writer.leaf('Description', f"{product.name} - {product.description or ''}")
+        writer.leaf('HSCode', product.hs_code)
+        writer.leaf('WeightNetto', product.netto)
+        writer.leaf('WeightBrutto', product.brutto)
+        writer.leaf('InvoiceValue', product.price)
+
+        # Add calculation if available
+        calculation = getattr(product, 'calculation', None)
+        if calculation is not None:
+            writer.leaf('CustomsValue', calculation.total * Decimal('0.8'))  # Approximation
+            total_payments += calculation.total
+
+        # Required certificates
+        writer.start('RequiredCertificates')
+        for cert in product.required_certificates or []:
+            writer.leaf('CertificateType', cert)
+        writer.end('RequiredCertificates')
+        writer.end('GoodItem')
+
+        if writer.pending() >= FLUSH_SIZE:
+            yield writer.flush()
+    writer.end('GoodsList')
+
+    # Calculated Payments
+    writer.start('CalculatedPayments')
+    writer.leaf('TotalPayments', total_payments)
+    writer.end('CalculatedPayments')
+
+    writer.end('Declaration')
+    writer.end('GTDDocument')
+    writer.end_document()
+    yield writer.flush()
+
+
+class _ZipSink:
+    """
+    Write-only, non-seekable file object for ZipFile: collects the archive
+    bytes until the streaming generator drains them
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def bulk_export_config():
+    return {'WORKERS': 4, 'MAX_DECLARATIONS': 5000, 'PROGRESS_TTL': 60 * 60, **getattr(settings, 'BULK_EXPORT', {})}
+
+
+def progress_cache_key(export_id):
+    return f'bulk-export:{export_id}'
+
+
+def get_export_progress(export_id):
+    return cache.get(progress_cache_key(export_id))
+
+
+def _render_declaration_xml(declaration_id, pretty):
+    """
+    Worker task: render one declaration's XML (runs on a pool thread with its own DB connection)
+    """
+    from .models import Declaration
+
+    close_old_connections()
+    try:
+        declaration = Declaration.objects.get(pk=declaration_id)
+        return declaration.id, ''.join(generate_declaration_xml(declaration, pretty=pretty)).encode('utf-8')
+    finally:
+        connection.close()
+
+
+def generate_declarations_zip(declaration_ids, pretty=True, export_id=None, user_id=None):
+    """
+    Yield a ZIP archive with one GTD XML file per declaration.
+
+    Documents are rendered on a thread pool with at most 2 x WORKERS documents
+    in flight, and every finished archive entry is handed to the client right
+    away, so memory stays bounded whatever the batch size. When export_id is
+    given, progress ({'total', 'done', 'status'}) is published in the cache;
+    the final status is DONE, FAILED or CANCELLED (response closed early).
+    """
+    config = bulk_export_config()
+    workers = config['WORKERS']
+    total = len(declaration_ids)
+    started = time.time()
+
+    def report(done, state):
+        if export_id:
+            cache.set(progress_cache_key(export_id), {
+                'user_id': user_id,
+                'total': total,
+                'done': done,
+                'status': state,
+                'elapsed': round(time.time() - started, 2),
+            }, config['PROGRESS_TTL'])
+
+    sink = _ZipSink()
+    done = 0
+    state = 'FAILED'
+    report(done, 'RUNNING')
+    try:
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive, \
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix='xml-export') as pool:
+            pending = deque()
+            ids = iter(declaration_ids)
+            while True:
+                # Keep the pool busy without rendering the whole batch ahead of the client
+                while len(pending) < workers * 2:
+                    declaration_id = next(ids, None)
+                    if declaration_id is None:
+                        break
+                    pending.append(pool.submit(_render_declaration_xml, declaration_id, pretty))
+                if not pending:
+                    break
+
+                declaration_id, document = pending.popleft().result()
+                info = zipfile.ZipInfo(f'AI-DECL-{declaration_id}.xml', date_time=time.localtime()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                archive.writestr(info, document)
+                done += 1
+                if done % 10 == 0 or done == total:
+                    report(done, 'RUNNING')
+                yield sink.drain()
+        # Central directory is written when the archive is closed
+        yield sink.drain()
+        state = 'DONE'
+    except GeneratorExit:
+        # The response was closed before the end (client disconnected)
+        state = 'CANCELLED'
+        raise
+    finally:
+        report(done, state)
@@ -4,6 +4,7 @@ Bu skript info.txt faylidan ma'lumotlarni o'qib,
 Django model orqali bazaga saqlaydi
 """
 
+import ast
 import csv
 import io
 from django.core.management.base import BaseCommand
@@ -89,8 +90,8 @@ def parse_info_txt(file_path):
             certs_str = parts[9].strip() if len(parts) > 9 else '[]'
             try:
                 # Sertifikatlar ro'yxatini olish
-                required_certs = eval(certs_str) if certs_str.startswith('[') else [certs_str]
-            except:
+                required_certs = ast.literal_eval(certs_str) if certs_str.startswith('[') else [certs_str]
+            except (ValueError, SyntaxError):
                 required_certs = []
             
             # Ma'lumotlarni saqlash
@@ -1,53 +1,40 @@
 import os
-import zlib
+import sys
 import re
 from pathlib import Path
 
+from pdf_tools import open_pdf, iter_streams, iter_decompressed_streams, count_object_types, find_all, decompress
+
 def decompress_stream(compressed_data):
     """Siqilgan streamni ochish"""
-    try:
-        # FlateDecode (zlib) siqishini ochish
-        decompressed = zlib.decompress(compressed_data)
-        return decompressed
-    except Exception as e:
-        print(f"Decompress xato: {e}")
-        return None
+    # FlateDecode (zlib) siqishini ochish
+    decompressed = decompress(compressed_data)
+    if decompressed is None:
+        print("Decompress xato: zlib ma'lumoti emas")
+    return decompressed
 
 def extract_and_decompress_streams(pdf_path):
     """PDFdan streamlarni chiqarish va ochish"""
     print("=== PDF Streamlarini Ochish ===")
     
-    with open(pdf_path, 'rb') as f:
-        data = f.read()
-    
-    # Streamlarni qidirish
-    stream_positions = []
-    for i in range(len(data) - 20):
-        if data[i:i+6] == b'stream':
-            stream_start = i + 6
-            # Stream tugashini topish
-            stream_end = data.find(b'endstream', stream_start)
-            if stream_end != -1:
-                stream_positions.append((stream_start, stream_end))
-    
-    print(f"Topilgan streamlar: {len(stream_positions)}")
-    
-    # Katta streamlarni tahlil qilish
-    large_streams = [(start, end) for start, end in stream_positions if (end - start) > 1000]
-    print(f"Katta streamlar (>1000 bytes): {len(large_streams)}")
-    
-    # Dastlabki 10 katta streamni ochish
-    for i, (start, end) in enumerate(large_streams[:10]):
-        stream_data = data[start:end]
-        print(f"\nStream {i+1} ({len(stream_data)} bytes):")
+    with open_pdf(pdf_path) as data:
+        streams = list(iter_streams(data))
+        print(f"Topilgan streamlar: {len(streams)}")
+        
+        # Katta streamlarni tahlil qilish
+        large_streams = [stream for stream in streams if stream.size > 1000]
+        print(f"Katta streamlar (>1000 bytes): {len(large_streams)}")
         
-        # Streamni ochish
-        decompressed = decompress_stream(stream_data)
-        if decompressed:
-            print(f"  Ochilgan hajmi: {len(decompressed)} bytes")
+        # Dastlabki 10 katta streamni ochish
+        for i, stream in enumerate(large_streams[:10]):
+            print(f"\nStream {i+1} ({stream.size} bytes):")
             
-            # Ochilgan matndan HS kodlarni qidirish
-            try:
+            # Streamni ochish
+            decompressed = decompress_stream(data[stream.start:stream.end])
+            if decompressed:
+                print(f"  Ochilgan hajmi: {len(decompressed)} bytes")
+                
+                # Ochilgan matndan HS kodlarni qidirish
                 text = decompressed.decode('utf-8', errors='ignore')
                 if len(text.strip()) > 100:
                     # HS kodlarni qidirish
@@ -76,62 +63,33 @@ def extract_and_decompress_streams(pdf_path):
                         print(f"  Matn sample: {text[:200]}...")
                 else:
                     print("  Qisqa matn")
-            except Exception as e:
-                print(f"  Decode xato: {e}")
-        else:
-            print("  Ochib bo'lmadi")
+            else:
+                print("  Ochib bo'lmadi")
 
-def search_for_compressed_hs_data(pdf_path):
+def search_for_compressed_hs_data(pdf_path, max_streams=None):
     """PDF ichidan siqilgan HS ma'lumotlarini qidirish"""
     print("\n=== Siqilgan HS Ma'lumotlarni Qidirish ===")
     
-    with open(pdf_path, 'rb') as f:
-        data = f.read()
-    
     # HS kodga o'xshash patternlarni siqilgan ma'lumotlardan qidirish
-    hs_patterns = [
-        rb'\d{10}',  # 10 xonali raqamlar
-        rb'\d{4}\s*\d{2}\s*\d{4}',  # HS formati
-        rb'HS\s*\d{10}',  # HS bilan
-        rb'TNVED\s*\d{10}',  # TNVED bilan
-    ]
-    
-    # Barcha streamlarni qidirish
-    stream_positions = []
-    for i in range(len(data) - 20):
-        if data[i:i+6] == b'stream':
-            stream_start = i + 6
-            stream_end = data.find(b'endstream', stream_start)
-            if stream_end != -1:
-                stream_positions.append((stream_start, stream_end))
-    
-    print(f"Jami streamlar: {len(stream_positions)}")
-    
-    # Har bir streamda qidirish
+    hs_patterns = re.compile(
+        rb'HS\s*\d{10}'  # HS bilan
+        rb'|TNVED\s*\d{10}'  # TNVED bilan
+        rb'|\d{4}\s*\d{2}\s*\d{4}',  # HS formati va 10 xonali raqamlar
+        re.IGNORECASE
+    )
+    
+    # Streamlar birma-bir ochiladi, xotirada faqat joriy stream turadi
     total_found = set()
-    for i, (start, end) in enumerate(stream_positions):
-        stream_data = data[start:end]
-        
-        # Streamni ochishga harakat qilish
-        decompressed = decompress_stream(stream_data)
-        if decompressed:
-            # Ochilgan ma'lumotdan qidirish
-            for pattern in hs_patterns:
-                try:
-                    matches = re.findall(pattern, decompressed, re.IGNORECASE)
-                    if matches:
-                        total_found.update(matches)
-                except:
-                    pass
-        
-        # Agar 100 ta streamdan keyin to'xtasak
-        if i > 100:
-            break
+    with open_pdf(pdf_path) as data:
+        for i, (stream, decompressed) in enumerate(iter_decompressed_streams(data)):
+            if max_streams is not None and i >= max_streams:
+                break
+            total_found.update(match.group() for match in hs_patterns.finditer(decompressed))
     
     if total_found:
         print(f"Topilgan HS kodlar: {len(total_found)}")
         for i, code in enumerate(sorted(total_found)[:20]):
-            print(f"  {i+1}. {code}")
+            print(f"  {i+1}. {code.decode('ascii', errors='ignore')}")
         if len(total_found) > 20:
             print(f"  ... va yana {len(total_found) - 20} ta")
         return total_found
@@ -139,48 +97,56 @@ def search_for_compressed_hs_data(pdf_path):
         print("HS kodlar topilmadi")
         return set()
 
+def recover_hs_codes(pdf_path, workers=None):
+    """Barcha streamlarni parallel ochib, matndan HS kodlarni tiklash"""
+    print("\n=== Barcha Streamlardan HS Kodlarni Tiklash ===")
+    
+    from pdf_extract import recover_pdf
+    
+    def progress(stats):
+        print(f"Ochilgan streamlar: {stats['streams']} (matnli: {stats['with_text']}, qisman: {stats['partial']})")
+    
+    records = list(recover_pdf(pdf_path, workers, progress))
+    if records:
+        print(f"Tiklangan HS kodlar: {len(records)}")
+        for i, record in enumerate(records[:20]):
+            print(f"  {i+1}. {record['code']} - {record['description_uz'][:60]}")
+        if len(records) > 20:
+            print(f"  ... va yana {len(records) - 20} ta")
+    else:
+        print("HS kodlar tiklanmadi")
+    return {record['code'] for record in records}
+
 def analyze_pdf_content_structure(pdf_path):
     """PDF tarkibini tuzilmasini tahlil qilish"""
     print("\n=== PDF Tarkib Tuzilmasini Tahlil Qilish ===")
     
-    with open(pdf_path, 'rb') as f:
-        data = f.read()
-    
-    # Ob'ekt turlarini aniqlash
-    object_types = {}
-    for i in range(len(data) - 50):
-        if data[i:i+6] == b'<<\n/':
-            # Ob'ekt boshlanishi
-            obj_end = data.find(b'\n>>', i, i + 200)
-            if obj_end != -1:
-                obj_header = data[i+3:obj_end].decode('ascii', errors='ignore')
-                lines = obj_header.split('\n')
-                for line in lines:
-                    if line.startswith('/Type'):
-                        obj_type = line.split()[1] if len(line.split()) > 1 else 'Unknown'
-                        object_types[obj_type] = object_types.get(obj_type, 0) + 1
-    
-    print("Ob'ekt turlari:")
-    for obj_type, count in sorted(object_types.items()):
-        print(f"  {obj_type}: {count}")
-    
-    # Font ob'ektlarini tahlil qilish
-    font_objects = []
-    for i in range(len(data) - 50):
-        if b'/Type /Font' in data[i:i+100]:
-            # Font ob'ektini topish
-            obj_start = data.rfind(b'\n', 0, i)
-            if obj_start != -1:
-                obj_line = data[obj_start+1:data.find(b'\n', i)].decode('ascii', errors='ignore')
-                if 'obj' in obj_line:
-                    font_objects.append(obj_line.strip())
+    with open_pdf(pdf_path) as data:
+        # Ob'ekt turlarini aniqlash
+        object_types = count_object_types(data)
+        
+        print("Ob'ekt turlari:")
+        for obj_type, count in sorted(object_types.items()):
+            print(f"  {obj_type}: {count}")
+        
+        # Font ob'ektlarini tahlil qilish
+        font_objects = []
+        for pos in find_all(data, b'/Type /Font'):
+            # Font ob'ekti sarlavhasi (n g obj) qatorini topish
+            obj_pos = data.rfind(b'obj', max(0, pos - 200), pos)
+            if obj_pos == -1:
+                continue
+            line_start = data.rfind(b'\n', 0, obj_pos) + 1
+            obj_line = data[line_start:obj_pos + 3].decode('ascii', errors='ignore').strip()
+            if obj_line and obj_line not in font_objects:
+                font_objects.append(obj_line)
     
     print(f"\nFont ob'ektlari: {len(font_objects)}")
     for i, font_obj in enumerate(font_objects[:10]):
         print(f"  {i+1}. {font_obj}")
 
 def main():
-    pdf_path = "TIF TN 2022 UZ.pdf"
+    pdf_path = sys.argv[1] if len(sys.argv) > 1 else "TIF TN 2022 UZ.pdf"
     
     if not os.path.exists(pdf_path):
         print(f"Fayl topilmadi: {pdf_path}")
@@ -193,9 +159,9 @@ def main():
         # Streamlarni ochish
         found_codes = extract_and_decompress_streams(pdf_path)
         
-        # Agar kodlar topilmasa, chuqur qidiruv
+        # Agar kodlar topilmasa, barcha streamlar parallel ochiladi
         if not found_codes:
-            found_codes = search_for_compressed_hs_data(pdf_path)
+            found_codes = recover_hs_codes(pdf_path)
         
         # Tarkib tuzilmasini tahlil qilish
         analyze_pdf_content_structure(pdf_path)
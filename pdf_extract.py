@@ -0,0 +1,334 @@
+"""
+TIF TN PDF fayldan HS kodlarni parallel ajratib olish
+Sahifalar bo'laklarga bo'linib, jarayonlar hovuzida o'qiladi; natija
+JSON Lines faylga yoziladi (python manage.py import_hs_codes hs_codes.jsonl)
+
+    python pdf_extract.py "TIF TN 2022 UZ.pdf" -o hs_codes.jsonl --workers 8
+
+Har bir sahifa natijasi checkpoint bazasiga yoziladi: qayta ishga
+tushirilganda tayyor sahifalar o'tkazib yuboriladi, PDF ning yangi
+tahririda esa faqat mazmuni o'zgargan sahifalar qayta o'qiladi.
+
+Buzilgan PDF uchun --recover: xref va sahifa daraxtisiz barcha streamlar
+parallel ochiladi va matn operatorlaridan HS kodlar tiklanadi.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+# One anchored pattern per line: the code (10 digits as XXXX XX XXX X, or
+# 8 digits as XXXX XX XX, with or without spaces) followed by the description
+HS_LINE_RE = re.compile(r'^\s*(\d{4} ?\d{2} ?\d{3} ?\d|\d{4} ?\d{2} ?\d{2})(?![\d])\s*(.*)$')
+CLEAN_RE = re.compile(r'[^\w\s\.\,\-\(\)%;:]')
+SPACES_RE = re.compile(r'\s+')
+HEADER_KEYWORDS = ('TARIF', 'NOMENKLATURA', 'TAVSIF', 'CHAPTER', 'SECTION', 'SANASI', 'ТИФ', 'ТАШҚИ', 'МУНДАРИЖА')
+
+DEFAULT_SHARD_SIZE = 20
+DEFAULT_CHECKPOINT_PATH = 'pdf_extract_checkpoints.sqlite3'
+
+
+def clean_text(text):
+    """Matnni tozalash: ortiqcha belgilar va bo'sh joylar"""
+    return SPACES_RE.sub(' ', CLEAN_RE.sub(' ', text)).strip()
+
+
+def is_header_line(text):
+    upper = text.upper()
+    return any(keyword in upper for keyword in HEADER_KEYWORDS)
+
+
+def iter_line_records(lines, page_number=None, source='PDF extraction'):
+    """
+    Yield HS code records from text lines. Each line is matched once against
+    HS_LINE_RE; a code alone on its line takes the next non-code line as its
+    description (the TIF TN layout).
+    """
+    pending = None
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        match = HS_LINE_RE.match(line)
+        if match is None:
+            if pending is not None and not is_header_line(line):
+                description = clean_text(line)
+                if len(description) > 2:
+                    pending['description_uz'] = description
+                    yield pending
+                    pending = None
+            continue
+
+        code = match.group(1).replace(' ', '')
+        description = clean_text(match.group(2))
+        record = {'code': code, 'description_uz': description, 'page_number': page_number,
+                  'sources': [source]}
+        if len(description) > 2:
+            yield record
+            pending = None
+        else:
+            pending = record
+
+
+def extract_page_records(page_number, text):
+    """
+    HS code records of one page's text
+    """
+    return list(iter_line_records(text.splitlines(), page_number))
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CheckpointStore:
+    """
+    SQLite file with the extraction state:
+        document_pages - content-stream hash of every page, keyed by (PDF hash, page number)
+        page_records   - extracted records, keyed by page content hash
+    Records are keyed by content rather than page number, so a revised PDF
+    reuses every page whose content streams did not change, even if it moved.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS document_pages (
+                pdf_hash TEXT NOT NULL,
+                page_number INTEGER NOT NULL,
+                page_hash TEXT NOT NULL,
+                PRIMARY KEY (pdf_hash, page_number)
+            );
+            CREATE TABLE IF NOT EXISTS page_records (
+                page_hash TEXT PRIMARY KEY,
+                records TEXT NOT NULL,
+                extracted_at REAL NOT NULL
+            );
+        """)
+
+    def page_hashes(self, pdf_hash):
+        rows = self.connection.execute(
+            'SELECT page_number, page_hash FROM document_pages WHERE pdf_hash = ?', (pdf_hash,)
+        )
+        return dict(rows)
+
+    def save_page_hashes(self, pdf_hash, hashes):
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO document_pages (pdf_hash, page_number, page_hash) VALUES (?, ?, ?)',
+                [(pdf_hash, page_number, page_hash) for page_number, page_hash in hashes.items()]
+            )
+
+    def extracted_hashes(self):
+        return {row[0] for row in self.connection.execute('SELECT page_hash FROM page_records')}
+
+    def save_records(self, page_records):
+        """
+        page_records: [(page_hash, records)]; committed at once so a crash loses at most one shard
+        """
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO page_records (page_hash, records, extracted_at) VALUES (?, ?, ?)',
+                [(page_hash, json.dumps(records, ensure_ascii=False), now) for page_hash, records in page_records]
+            )
+
+    def records(self, page_hash):
+        row = self.connection.execute('SELECT records FROM page_records WHERE page_hash = ?', (page_hash,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def close(self):
+        self.connection.close()
+
+
+def chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def hash_pages(pdf_path, page_numbers):
+    """
+    Worker: SHA-1 of the decoded content streams of the given pages (1-based)
+    """
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        return {number: hashlib.sha1(doc.load_page(number - 1).read_contents()).hexdigest() for number in page_numbers}
+
+
+def extract_pages(pdf_path, page_numbers):
+    """
+    Worker: open the PDF in this process and extract the given pages (1-based)
+    """
+    import fitz  # PyMuPDF
+
+    results = []
+    with fitz.open(pdf_path) as doc:
+        for number in page_numbers:
+            results.append((number, extract_page_records(number, doc.load_page(number - 1).get_text())))
+    return results
+
+
+def page_count(pdf_path):
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+
+def extract_pdf(pdf_path, workers=None, shard_size=DEFAULT_SHARD_SIZE, checkpoint_path=None, since_page=1,
+                force=False, progress=None):
+    """
+    Yield the HS code records of the PDF from `since_page` on, in page order.
+
+    Pages are processed in shards on a process pool. With a checkpoint store,
+    pages whose content hash already has records are skipped (unless `force`)
+    and every finished shard is saved right away, so an interrupted run
+    resumes where it stopped. Output order is by page and the first occurrence
+    of a code wins, so it does not depend on the worker count or on which
+    pages came from the checkpoint.
+    """
+    workers = workers or os.cpu_count() or 1
+    pages = list(range(max(1, since_page), page_count(pdf_path) + 1))
+    store = CheckpointStore(checkpoint_path) if checkpoint_path else None
+    results = {}
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            if store is not None:
+                pdf_hash = file_hash(pdf_path)
+                hashes = store.page_hashes(pdf_hash)
+                missing = [number for number in pages if number not in hashes]
+                if missing:
+                    futures = [pool.submit(hash_pages, pdf_path, shard) for shard in chunks(missing, shard_size * 5)]
+                    computed = {}
+                    for future in futures:
+                        computed.update(future.result())
+                    store.save_page_hashes(pdf_hash, computed)
+                    hashes.update(computed)
+                done = set() if force else store.extracted_hashes()
+                todo = [number for number in pages if hashes[number] not in done]
+            else:
+                todo = pages
+
+            if progress:
+                progress(len(pages), len(pages) - len(todo))
+
+            futures = [pool.submit(extract_pages, pdf_path, shard) for shard in chunks(todo, shard_size)]
+            for future in as_completed(futures):
+                shard_results = future.result()
+                if store is not None:
+                    store.save_records([(hashes[number], records) for number, records in shard_results])
+                else:
+                    results.update(shard_results)
+
+        seen = set()
+        for number in pages:
+            if store is not None:
+                # Pages reused from an earlier revision may have moved
+                records = [dict(record, page_number=number) for record in store.records(hashes[number])]
+            else:
+                records = results.pop(number, [])
+            for record in records:
+                if record['code'] in seen:
+                    continue
+                seen.add(record['code'])
+                yield record
+    finally:
+        if store is not None:
+            store.close()
+
+
+def recover_pdf(pdf_path, workers=None, progress=None):
+    """
+    Yield the HS code records of a damaged PDF that PyMuPDF cannot open.
+
+    Every text stream is decompressed and decoded on a process pool
+    (pdf_tools.recover_text) and the recovered lines are fed, in file order,
+    to the same line parser as the normal mode. Page numbers are unknown
+    there, so records carry None. progress(stats) is called at the end with
+    the stream counts.
+    """
+    from pdf_tools import recover_text
+
+    stats = {'streams': 0, 'with_text': 0, 'partial': 0}
+
+    def lines():
+        for stream, stream_lines, complete in recover_text(pdf_path, workers):
+            stats['streams'] += 1
+            stats['with_text'] += bool(stream_lines)
+            stats['partial'] += not complete
+            yield from stream_lines
+
+    seen = set()
+    for record in iter_line_records(lines(), source='PDF recovery'):
+        if record['code'] in seen:
+            continue
+        seen.add(record['code'])
+        yield record
+    if progress:
+        progress(stats)
+
+
+def write_jsonl(records, output_path):
+    count = 0
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TIF TN PDF dan HS kodlarni parallel ajratib olish")
+    parser.add_argument('pdf_path', nargs='?', default='TIF TN 2022 UZ.pdf')
+    parser.add_argument('-o', '--output', default='hs_codes.jsonl')
+    parser.add_argument('--workers', type=int, default=None, help='Jarayonlar soni (default: CPU soni)')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help='Bir vazifadagi sahifalar soni')
+    parser.add_argument('--since-page', type=int, default=1, help='Shu sahifadan boshlab o\'qish')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_PATH, help='Checkpoint bazasi fayli')
+    parser.add_argument('--no-checkpoint', action='store_true', help='Checkpointsiz, hamma sahifani o\'qish')
+    parser.add_argument('--force', action='store_true', help='Tayyor sahifalarni ham qayta o\'qish')
+    parser.add_argument('--recover', action='store_true',
+                        help='Buzilgan PDF: barcha streamlarni ochib, matnni to\'g\'ridan-to\'g\'ri tiklash')
+    args = parser.parse_args()
+
+    def progress(total, cached):
+        print(f"{total} ta sahifa: {cached} tasi checkpointdan, {total - cached} tasi o'qiladi")
+
+    def recovery_progress(stats):
+        print(f"{stats['streams']} ta stream ochildi: {stats['with_text']} tasida matn, "
+              f"{stats['partial']} tasi qisman tiklandi")
+
+    started = time.time()
+    if args.recover:
+        count = write_jsonl(recover_pdf(args.pdf_path, args.workers, recovery_progress), args.output)
+        print(f"{count} ta HS kod {time.time() - started:.1f} soniyada tiklandi")
+        print(f"Natijalar {args.output} fayliga saqlandi")
+        return
+
+    records = extract_pdf(
+        args.pdf_path,
+        args.workers,
+        max(1, args.shard_size),
+        checkpoint_path=None if args.no_checkpoint else args.checkpoint,
+        since_page=args.since_page,
+        force=args.force,
+        progress=progress,
+    )
+    count = write_jsonl(records, args.output)
+    print(f"{count} ta HS kod {time.time() - started:.1f} soniyada topildi")
+    print(f"Natijalar {args.output} fayliga saqlandi")
+
+
+if __name__ == "__main__":
+    main()
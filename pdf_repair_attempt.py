@@ -117,6 +117,23 @@ def search_for_hs_codes_in_text(text):
         print("HS kodlar topilmadi")
         return set()
 
+def recover_from_streams(pdf_path, output_path="hs_codes_recovered.jsonl"):
+    """Tiklab bo'lmagan PDFdan HS kodlarni streamlar orqali tiklash"""
+    print("\n=== Streamlardan Tiklash ===")
+    
+    from pdf_extract import recover_pdf, write_jsonl
+    
+    def progress(stats):
+        print(f"Ochilgan streamlar: {stats['streams']} (matnli: {stats['with_text']}, qisman: {stats['partial']})")
+    
+    count = write_jsonl(recover_pdf(pdf_path, progress=progress), output_path)
+    if count:
+        print(f"{count} ta HS kod tiklandi: {output_path}")
+        print(f"Bazaga yuklash: python manage.py import_hs_codes {output_path}")
+    else:
+        print("Streamlardan HS kodlar tiklanmadi")
+    return count
+
 def main():
     pdf_path = "TIF TN 2022 UZ.pdf"
     
@@ -144,10 +161,13 @@ def main():
                     print("\nHS kodlar topilmadi, lekin PDF tiklandi")
             else:
                 print("\nPDF tiklandi, lekin matn chiqarib bo'lmadi")
+                recover_from_streams(pdf_path)
         else:
             print("\nPDF tiklandi, lekin hali ham to'g'ri emas")
+            recover_from_streams(pdf_path)
     else:
         print("\nPDFni tiklab bo'lmadi")
+        recover_from_streams(pdf_path)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,350 @@
+"""
+PDF faylni past darajada (bayt bo'yicha) tahlil qilish uchun umumiy vositalar
+Fayl mmap orqali ochiladi, qidiruv bytes.find/re.finditer bilan qilinadi va
+FlateDecode streamlari generator orqali birma-bir ochiladi, shuning uchun
+katta (100MB+) va buzilgan PDF lar ham tez va kam xotira bilan tahlil qilinadi.
+"""
+
+import mmap
+import re
+import zlib
+from contextlib import contextmanager
+
+
+# 'stream' keyword followed by its end of line, but not the tail of 'endstream'
+STREAM_RE = re.compile(rb'(?<!end)stream\r?\n')
+ENDSTREAM = b'endstream'
+OBJ_RE = re.compile(rb'(\d+)\s+(\d+)\s+obj\b')
+OBJ_HEADER_RE = re.compile(rb'(\d+)\s+(\d+)\s+obj$')
+LENGTH_RE = re.compile(rb'/Length\s+(\d+)(?!\s+\d+\s+R)')
+STARTXREF_RE = re.compile(rb'startxref\s+(\d+)')
+TYPE_RE = re.compile(rb'/Type\s*/(\w+)')
+
+# How far back from a stream keyword its object header / dictionary is looked for
+DICTIONARY_WINDOW = 4096
+
+
+@contextmanager
+def open_pdf(path):
+    """
+    Read-only memory map of a PDF (an empty bytes object for empty files)
+    """
+    with open(path, 'rb') as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            yield b''
+            return
+        try:
+            yield buffer
+        finally:
+            buffer.close()
+
+
+def find_all(buffer, token, start=0):
+    """
+    Yield every offset of `token` in the buffer
+    """
+    position = buffer.find(token, start)
+    while position != -1:
+        yield position
+        position = buffer.find(token, position + 1)
+
+
+def startxref_offsets(buffer):
+    """
+    (position, offset) of every startxref entry
+    """
+    return [(match.start(), int(match.group(1))) for match in STARTXREF_RE.finditer(buffer)]
+
+
+def object_headers(buffer):
+    """
+    Yield (position, object number, generation) of every 'n g obj' header
+    """
+    for match in OBJ_RE.finditer(buffer):
+        yield match.start(), int(match.group(1)), int(match.group(2))
+
+
+def count_object_types(buffer):
+    counts = {}
+    for match in TYPE_RE.finditer(buffer):
+        name = match.group(1).decode('ascii', errors='ignore')
+        counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+class PdfStream:
+    """
+    Location of one stream: its data is buffer[start:end], its dictionary the
+    bytes between the object header and the 'stream' keyword
+    """
+
+    __slots__ = ('obj_num', 'gen', 'offset', 'start', 'end', 'dictionary')
+
+    def __init__(self, obj_num, gen, offset, start, end, dictionary):
+        self.obj_num = obj_num
+        self.gen = gen
+        self.offset = offset
+        self.start = start
+        self.end = end
+        self.dictionary = dictionary
+
+    @property
+    def size(self):
+        return self.end - self.start
+
+    @property
+    def is_flate(self):
+        return b'/FlateDecode' in self.dictionary or b'/Fl ' in self.dictionary
+
+    def __repr__(self):
+        return f'<PdfStream {self.obj_num} {self.gen} obj @{self.offset} {self.size} bytes>'
+
+
+def iter_streams(buffer):
+    """
+    Yield a PdfStream for every stream in the buffer, in file order.
+    A direct /Length is trusted when 'endstream' follows it; otherwise (broken
+    or indirect lengths) the stream ends at the next 'endstream'.
+    """
+    for match in STREAM_RE.finditer(buffer):
+        start = match.end()
+        window_start = max(0, match.start() - DICTIONARY_WINDOW)
+        # Nearest 'obj' keyword before the stream; only its own line is run through the regex
+        header = None
+        keyword = buffer.rfind(b'obj', window_start, match.start())
+        if keyword != -1 and buffer[keyword - 3:keyword] != b'end':
+            header = OBJ_HEADER_RE.search(buffer[max(window_start, keyword - 24):keyword + 3])
+        if header is not None:
+            obj_num, gen = int(header.group(1)), int(header.group(2))
+            dictionary = bytes(buffer[keyword + 3:match.start()])
+        else:
+            obj_num, gen = None, None
+            dictionary = bytes(buffer[window_start:match.start()])
+
+        end = -1
+        length = LENGTH_RE.search(dictionary)
+        if length is not None:
+            candidate = start + int(length.group(1))
+            if buffer[candidate:candidate + 20].lstrip(b'\r\n ').startswith(ENDSTREAM):
+                end = candidate
+        if end == -1:
+            end = buffer.find(ENDSTREAM, start)
+            if end == -1:
+                end = len(buffer)  # Truncated file
+            # The end of line before 'endstream' is not part of the data
+            while end > start and buffer[end - 1:end] in (b'\n', b'\r'):
+                end -= 1
+
+        yield PdfStream(obj_num, gen, match.start(), start, end, dictionary)
+
+
+def decompress(data):
+    """
+    zlib-decompress FlateDecode data, None if it is not valid
+    """
+    try:
+        return zlib.decompress(data)
+    except zlib.error:
+        return None
+
+
+def iter_decompressed_streams(buffer, min_size=0, flate_only=True):
+    """
+    Lazily yield (PdfStream, decompressed bytes) for the streams that decompress.
+    Only one stream's data is held in memory at a time.
+    """
+    for stream in iter_streams(buffer):
+        if stream.size < min_size or (flate_only and not stream.is_flate):
+            continue
+        data = decompress(buffer[stream.start:stream.end])
+        if data is not None:
+            yield stream, data
+
+
+def decompress_partial(data, chunk_size=16 * 1024):
+    """
+    Decompress FlateDecode data as far as it is valid: (bytes, complete).
+    The data is fed to a zlib.decompressobj in chunks, so a truncated or
+    corrupted stream still returns everything before the damage.
+    """
+    decompressor = zlib.decompressobj()
+    output = []
+    try:
+        for position in range(0, len(data), chunk_size):
+            output.append(decompressor.decompress(data[position:position + chunk_size]))
+            if decompressor.eof:
+                break
+        output.append(decompressor.flush())
+    except zlib.error:
+        pass
+    return b''.join(output), decompressor.eof
+
+
+# Content stream tokens needed for text: strings, arrays, names, numbers, operators
+TEXT_TOKEN_RE = re.compile(
+    rb'\((?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*\)'  # literal string, one level of nested parentheses
+    rb'|<[0-9A-Fa-f\s]*>'  # hex string
+    rb'|[\[\]]'
+    rb'|/[^\s/\[\]()<>{}%]*'  # name
+    rb'|[+-]?(?:\d+\.?\d*|\.\d+)'  # number
+    rb"|[A-Za-z'\"*]+",  # operator
+    re.S
+)
+ESCAPE_RE = re.compile(rb'\\([0-7]{1,3}|\r\n|[\r\n]|.)', re.S)
+ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+
+# Text rows closer than this (in text space units) are joined into one line
+LINE_TOLERANCE = 1.0
+
+
+def _unescape(match):
+    value = match.group(1)
+    if value[:1].isdigit():
+        return bytes([int(value, 8) & 0xFF])
+    if value in (b'\r\n', b'\r', b'\n'):
+        return b''  # Line continuation
+    return ESCAPES.get(value, value)
+
+
+def decode_pdf_string(token):
+    """
+    Text of a literal '(...)' or hex '<...>' string token. UTF-16 strings are
+    recognised by their BOM, anything else is read as Latin-1; strings of
+    Type0 (CID) fonts cannot be decoded without the font's ToUnicode map.
+    """
+    if token[:1] == b'(':
+        raw = ESCAPE_RE.sub(_unescape, token[1:-1])
+    else:
+        digits = re.sub(rb'\s', b'', token[1:-1])
+        if len(digits) % 2:
+            digits += b'0'
+        raw = bytes.fromhex(digits.decode('ascii'))
+    if raw.startswith(b'\xfe\xff'):
+        return raw[2:].decode('utf-16-be', errors='ignore')
+    return raw.decode('latin-1')
+
+
+def iter_text_lines(content):
+    """
+    Yield the text lines shown by a (decompressed) content stream.
+    Tj/TJ/'/" strings are collected in order; a change of the text row (Tm,
+    Td/TD, T*) starts a new line, so segments placed on one row - a code and
+    its description - end up on the same line.
+    """
+    if b'T' not in content:  # No text operators at all (images, fonts)
+        return
+    line = []
+    line_y = None
+    y = 0.0
+    gap = False
+    operands = []
+    array = None
+
+    def show(text):
+        nonlocal line, line_y, gap
+        if line_y is not None and abs(y - line_y) > LINE_TOLERANCE:
+            yield ''.join(line).strip()
+            line = []
+            gap = False
+        if gap and line:
+            line.append(' ')
+        gap = False
+        line_y = y
+        line.append(text)
+
+    for match in TEXT_TOKEN_RE.finditer(content):
+        token = match.group()
+        first = token[:1]
+        if first in b'(<':
+            text = decode_pdf_string(token)
+            if array is not None:
+                array.append(text)
+            else:
+                operands.append(text)
+        elif first == b'[':
+            array = []
+        elif first == b']':
+            if array is not None:
+                operands.append(array)
+            array = None
+        elif first == b'/':
+            operands.append(None)
+        elif first.isdigit() or first in b'+-.':
+            number = float(token)
+            if array is not None:
+                array.append(number)
+            else:
+                operands.append(number)
+        else:
+            if token == b'BT':
+                y = 0.0
+            elif token == b'Tm' and len(operands) >= 6 and isinstance(operands[5], float):
+                y = operands[5]
+                gap = True
+            elif token in (b'Td', b'TD') and len(operands) >= 2 and isinstance(operands[1], float):
+                y += operands[1]
+                gap = True
+            elif token in (b'T*', b"'", b'"'):
+                y -= 2 * LINE_TOLERANCE
+            if token in (b'Tj', b"'", b'"') and operands and isinstance(operands[-1], str):
+                yield from show(operands[-1])
+            elif token == b'TJ' and operands and isinstance(operands[-1], list):
+                # Large negative kerning (in thousandths of an em) is a word space
+                yield from show(''.join(
+                    item if isinstance(item, str) else ' ' if item < -200 else ''
+                    for item in operands[-1]
+                ))
+            operands = []
+            array = None
+    if line:
+        yield ''.join(line).strip()
+
+
+def _text_stream(dictionary):
+    # Images, embedded fonts, xref and object streams never hold page text
+    return not any(key in dictionary for key in (
+        b'/Image', b'/Length1', b'/Length2', b'/FontFile', b'/Type1C', b'/CIDFontType0C', b'/OpenType',
+        b'/XRef', b'/ObjStm', b'/DCTDecode', b'/JPXDecode', b'/CCITTFaxDecode', b'/JBIG2Decode',
+    ))
+
+
+def recover_stream_shard(pdf_path, shard):
+    """
+    Worker: decompress the given (index, start, end, flate) streams of the file
+    and decode their text. Returns [(index, lines, complete)].
+    """
+    results = []
+    with open_pdf(pdf_path) as buffer:
+        for index, start, end, flate in shard:
+            if flate:
+                content, complete = decompress_partial(buffer[start:end])
+            else:
+                content, complete = buffer[start:end], True
+            results.append((index, list(iter_text_lines(content)), complete))
+    return results
+
+
+def recover_text(pdf_path, workers=None, shard_size=200):
+    """
+    Recovery mode for damaged PDFs: decompress every page-text candidate stream
+    on a process pool and decode its text operators, without relying on the
+    xref table or page tree. Yields (PdfStream, lines, complete) in file order;
+    `complete` is False for streams that were cut off or corrupted, whose lines
+    are what could be recovered before the damage.
+    """
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+
+    with open_pdf(pdf_path) as buffer:
+        streams = [stream for stream in iter_streams(buffer) if _text_stream(stream.dictionary)]
+    tasks = [(index, stream.start, stream.end, stream.is_flate) for index, stream in enumerate(streams)]
+    shards = [tasks[i:i + shard_size] for i in range(0, len(tasks), shard_size)]
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        futures = [pool.submit(recover_stream_shard, pdf_path, shard) for shard in shards]
+        # Shards are collected in submission order, so output follows the file
+        for future in futures:
+            for index, lines, complete in future.result():
+                yield streams[index], lines, complete
@@ -128,4 +128,95 @@ AUTHENTICATION_BACKENDS = [
 
 # Media files
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# HS code full-text search backend: 'auto' picks SQLite FTS5 or PostgreSQL
+# tsvector from the database engine; 'memory' uses the in-process index
+HS_CODE_SEARCH_BACKEND = 'auto'
+HS_CODE_SEARCH_MAX_RESULTS = 500
+
+# Caches
+# The 'hs_classifications' cache stores AI (Gemini) HS code classifications.
+# HS_CLASSIFICATION_CACHE_BACKEND: 'locmem' (per-process LRU), 'file' or 'sqlite'
+# (shared between workers; run `python manage.py createcachetable` for 'sqlite').
+HS_CLASSIFICATION_CACHE_BACKEND = os.environ.get('HS_CLASSIFICATION_CACHE_BACKEND', 'locmem')
+HS_CLASSIFICATION_CACHE_OPTIONS = {
+    'MAX_ENTRIES': int(os.environ.get('HS_CLASSIFICATION_CACHE_MAX_ENTRIES', 5000)),
+    'CULL_FREQUENCY': 10,  # Evict 1/10 of the entries when full
+}
+
+if HS_CLASSIFICATION_CACHE_BACKEND == 'file':
+    HS_CLASSIFICATION_CACHE_CONFIG = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'hs_classifications',
+    }
+elif HS_CLASSIFICATION_CACHE_BACKEND == 'sqlite':
+    HS_CLASSIFICATION_CACHE_CONFIG = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'hs_classification_cache',
+    }
+else:
+    HS_CLASSIFICATION_CACHE_CONFIG = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'hs-classifications',
+    }
+
+CACHES = {
+    # 'default' also carries the tariff rule and currency rate version stamps that
+    # tell other workers to reload; LocMemCache is per process, so deployments with
+    # several workers need a shared backend here (Redis, Memcached, database)
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'hs_classifications': {
+        **HS_CLASSIFICATION_CACHE_CONFIG,
+        'TIMEOUT': None,  # Per-entry TTLs are set by HS_CLASSIFICATION_CACHE
+        'OPTIONS': HS_CLASSIFICATION_CACHE_OPTIONS,
+    },
+}
+
+HS_CLASSIFICATION_CACHE = {
+    'ALIAS': 'hs_classifications',
+    'TTL': int(os.environ.get('HS_CLASSIFICATION_CACHE_TTL', 60 * 60 * 24)),  # 24 hours
+    'NEGATIVE_TTL': int(os.environ.get('HS_CLASSIFICATION_CACHE_NEGATIVE_TTL', 60 * 5)),  # 5 minutes
+}
+
+# AI model client (dotted path). Use 'customs_api.ai_clients.FakeModelClient'
+# to run without network access / API key.
+AI_MODEL_CLIENT = os.environ.get('AI_MODEL_CLIENT', 'customs_api.ai_clients.GeminiClient')
+
+# Background AI classification jobs (/api/search-hs-codes/?async=1)
+HS_CLASSIFICATION_JOBS = {
+    'QUEUE': 'customs_api.ai_jobs.ThreadPoolJobQueue',  # or 'customs_api.ai_jobs.ImmediateJobQueue'
+    'MAX_WORKERS': 4,
+    'MAX_PENDING': 100,
+}
+
+# Single-flight deduplication of identical concurrent AI lookups.
+# MODE: 'process' (threads of one worker), 'file' (all workers on a host)
+# or 'db' (all hosts; row lock, needs PostgreSQL/MySQL, refused on SQLite)
+HS_CLASSIFICATION_SINGLE_FLIGHT = {
+    'MODE': os.environ.get('HS_CLASSIFICATION_SINGLE_FLIGHT_MODE', 'process'),
+    'LOCK_DIR': BASE_DIR / 'cache' / 'locks',
+    'LOCK_STRIPES': 256,  # Number of lock files (file mode) / lock rows (db mode) keys are hashed onto
+    'TIMEOUT': 60,  # Seconds a waiting caller waits for the in-flight lookup
+}
+
+# Serve dashboard KPIs from the per-user DashboardSnapshot table, recomputed for
+# the user after each committed declaration/product/calculation change, instead
+# of aggregating on each request
+DASHBOARD_SNAPSHOTS = True
+
+# Bulk XML export (/api/declarations/export-xml/bulk/). Progress is published in
+# the 'default' cache, so point it to a shared backend when running several workers.
+BULK_EXPORT = {
+    'WORKERS': 4,
+    'MAX_DECLARATIONS': 5000,
+    'PROGRESS_TTL': 60 * 60,
+}
+
+# Central Bank of Uzbekistan JSON rate feed used by `manage.py sync_currency_rates`
+CBU_RATES_URL = os.environ.get('CBU_RATES_URL', 'https://cbu.uz/uz/arkhiv-kursov-valyut/json/')
+
+# Maximum number of product lines accepted by /api/calculate-customs-duties/batch/
+DUTY_BATCH_MAX_LINES = 10000